@@ -0,0 +1,112 @@
+"""
+Streaming audio decoding.
+
+Audio is decoded through an ffmpeg pipe (or soundfile + soxr when ffmpeg is
+not installed) into mono float32 blocks at the target sample rate, so
+resampling happens once and block-wise processing such as denoising (see
+denoise.py) needs memory for one block only. load_audio() returns the whole
+recording as the in-memory array Whisper takes.
+"""
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000  # Whisper's input rate
+BLOCK_SECONDS = float(os.getenv("AUDIO_BLOCK_SECONDS", "30"))
+
+
+def _read_exact(pipe, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = pipe.read(size - len(data))
+        if not chunk:
+            break
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _ffmpeg_blocks(filepath, sr, block_samples):
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error", "-i", filepath,
+        "-f", "f32le", "-ac", "1", "-ar", str(sr), "-"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = _read_exact(proc.stdout, block_samples * 4)
+            usable = len(data) - len(data) % 4
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=np.float32)
+            if len(data) < block_samples * 4:
+                break
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {filepath}: {proc.stderr.read().decode(errors='replace')}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+def _soundfile_blocks(filepath, sr, block_samples):
+    import soundfile as sf
+
+    with sf.SoundFile(filepath) as f:
+        resampler = None
+        if f.samplerate != sr:
+            import soxr
+            resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype="float32")
+        in_block = max(1, int(block_samples * f.samplerate / sr))
+        while True:
+            data = f.read(in_block, dtype="float32", always_2d=True)
+            last = len(data) < in_block
+            mono = data.mean(axis=1).astype(np.float32)
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono, last=last)
+            if len(mono):
+                yield mono
+            if last:
+                break
+
+
+def stream_audio(filepath, sr=TARGET_SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    """Yield mono float32 blocks of about `block_seconds` at sample rate `sr`"""
+    block_samples = max(1, int(block_seconds * sr))
+    if shutil.which("ffmpeg"):
+        return _ffmpeg_blocks(filepath, sr, block_samples)
+    return _soundfile_blocks(filepath, sr, block_samples)
+
+
+def load_audio(filepath, denoise=None, sr=TARGET_SAMPLE_RATE, timings=None):
+    """Decode (and resample) a file once into a mono float32 array at `sr`, optionally denoised on the way.
+
+    `denoise` is a method of denoise.py or None. Seconds spent decoding and
+    denoising are added to `timings` under "decode" and "denoise".
+    """
+    from denoise import Denoiser
+
+    denoiser = Denoiser(denoise, sr) if denoise else None
+    parts = []
+    denoise_seconds = 0.0
+    started = time.perf_counter()
+    for block in stream_audio(filepath, sr):
+        if denoiser is not None:
+            block_started = time.perf_counter()
+            block = denoiser.feed(block)
+            denoise_seconds += time.perf_counter() - block_started
+        parts.append(block)
+    if denoiser is not None:
+        block_started = time.perf_counter()
+        parts.append(denoiser.flush())
+        denoise_seconds += time.perf_counter() - block_started
+    audio = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+
+    if timings is not None:
+        timings["decode"] = timings.get("decode", 0.0) + time.perf_counter() - started - denoise_seconds
+        if denoiser is not None:
+            timings["denoise"] = timings.get("denoise", 0.0) + denoise_seconds
+    return audio
@@ -0,0 +1,201 @@
+"""
+Chunked, parallel transcription for long recordings.
+
+The audio is split near silence every `chunk_seconds`, each chunk (with a
+small overlap into the previous one) is transcribed in a process pool, and
+the per-chunk segments are shifted back onto the original timeline and
+stitched, dropping words repeated in the overlaps.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from jobs import JOB_WORKERS
+from models import MODEL_MEMORY_BUDGET_MB
+
+SAMPLE_RATE = 16000  # Whisper's input rate (audio.load_audio resamples to it)
+CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "120"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_OVERLAP", "1.0"))
+SILENCE_SEARCH_SECONDS = float(os.getenv("TRANSCRIBE_SILENCE_SEARCH", "10"))
+# Every job worker may run a chunked job at once, so each gets its share of the cores
+CORES_PER_JOB_WORKER = max(1, (os.cpu_count() or 1) // max(1, JOB_WORKERS))
+MAX_PARALLELISM = int(os.getenv("TRANSCRIBE_MAX_PARALLELISM", str(CORES_PER_JOB_WORKER)))
+# Longest run of words compared when removing duplicates at a chunk boundary
+MAX_OVERLAP_WORDS = 12
+
+_executor = None
+_executor_key = None
+
+# Set in each pool process by _init_chunk_worker
+_chunk_model = None
+
+
+def find_split_points(audio, sr=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS,
+                      search_seconds=SILENCE_SEARCH_SECONDS, frame_seconds=0.02):
+    """Return sample indices to split at: the quietest frame within
+    `search_seconds` of every `chunk_seconds` mark."""
+    frame = max(1, int(sr * frame_seconds))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+    energy = np.square(audio[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+
+    chunk_frames = max(1, int(chunk_seconds / frame_seconds))
+    search_frames = int(search_seconds / frame_seconds)
+    points = []
+    pos = 0
+    while n_frames - pos > chunk_frames + search_frames:
+        target = pos + chunk_frames
+        lo = max(pos + chunk_frames // 2, target - search_frames)
+        hi = min(n_frames, target + search_frames + 1)
+        split = lo + int(np.argmin(energy[lo:hi]))
+        points.append(split * frame + frame // 2)
+        pos = split
+    return points
+
+
+def split_audio(audio, sr=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """Split audio into (offset_seconds, samples) chunks at silence boundaries.
+
+    Every chunk after the first starts `overlap_seconds` before its split
+    point so words cut at the boundary are heard in full by one of the chunks.
+    """
+    bounds = [0] + find_split_points(audio, sr, chunk_seconds) + [len(audio)]
+    overlap = int(overlap_seconds * sr)
+    chunks = []
+    for i in range(len(bounds) - 1):
+        start = bounds[i] if i == 0 else max(0, bounds[i] - overlap)
+        chunks.append((start / sr, audio[start:bounds[i + 1]]))
+    return chunks
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _overlap_length(previous_words, words):
+    """Length of the longest tail of `previous_words` repeated at the head of `words`"""
+    prev = [_normalize(w) for w in previous_words[-MAX_OVERLAP_WORDS:]]
+    cur = [_normalize(w) for w in words[:MAX_OVERLAP_WORDS]]
+    for k in range(min(len(prev), len(cur)), 0, -1):
+        if prev[-k:] == cur[:k]:
+            return k
+    return 0
+
+
+def stitch_segments(chunk_results):
+    """Merge per-chunk segments onto one timeline.
+
+    `chunk_results` is a list of (offset_seconds, segments) in chunk order,
+    where segment times are relative to the chunk. Segments lying entirely
+    inside the already-covered overlap are dropped, and words repeated at the
+    start of a straddling segment are trimmed.
+    """
+    stitched = []
+    for offset, segments in chunk_results:
+        covered_until = stitched[-1]["end"] if stitched else 0.0
+        for segment in segments:
+            start = (segment.get("start") or 0.0) + offset
+            end = (segment.get("end") or 0.0) + offset
+            text = (segment.get("text") or "").strip()
+
+            if stitched and end <= covered_until:
+                continue
+            if stitched and start < covered_until:
+                words = text.split()
+                words = words[_overlap_length(stitched[-1]["text"].split(), words):]
+                text = " ".join(words)
+                start = covered_until
+            if not text:
+                continue
+
+            stitched.append({"start": round(start, 3), "end": round(end, 3), "text": " " + text})
+            covered_until = end
+    return stitched
+
+
+def _init_chunk_worker(model_name, threads):
+    global _chunk_model
+    import torch
+    from models import registry
+    # Keep processes x threads within this job worker's share of the cores (see pool_size)
+    torch.set_num_threads(threads)
+    _chunk_model = registry.get("whisper", model_name)
+
+
+def _transcribe_chunk(samples):
+    from transcription import extract_segments
+    result = _chunk_model.transcribe(samples.astype(np.float32))
+    return extract_segments(result)
+
+
+def pool_size(model_name, parallelism, memory_budget_mb=MODEL_MEMORY_BUDGET_MB):
+    """Return (processes, torch threads per process) for a chunk pool.
+
+    Every pool process loads its own copy of the model, outside this
+    process's registry, so the copies are counted against this job worker's
+    MODEL_MEMORY_BUDGET_MB, and the processes share CORES_PER_JOB_WORKER.
+    """
+    from models import registry
+    processes = max(1, min(int(parallelism), MAX_PARALLELISM))
+    model_mb = registry.size_mb("whisper", model_name)
+    if memory_budget_mb > 0 and model_mb > 0:
+        processes = max(1, min(processes, int(memory_budget_mb // model_mb)))
+    return processes, max(1, CORES_PER_JOB_WORKER // processes)
+
+
+def _get_executor(model_name, parallelism):
+    """Reuse one pool (and its loaded models) across jobs in this process"""
+    global _executor, _executor_key
+    processes, threads = pool_size(model_name, parallelism)
+    key = (model_name, processes)
+    if _executor is None or _executor_key != key:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_chunk_worker,
+            initargs=(model_name, threads)
+        )
+        _executor_key = key
+    return _executor
+
+
+def _drop_executor(executor):
+    """Forget a broken pool so the next job starts a new one"""
+    global _executor, _executor_key
+    if _executor is executor:
+        _executor, _executor_key = None, None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def transcribe_chunked(audio, model_name, chunk_seconds=CHUNK_SECONDS, parallelism=MAX_PARALLELISM, progress=None):
+    """Transcribe long 16 kHz audio chunk by chunk across a process pool; returns (text, segments)"""
+    progress = progress or (lambda value, stage=None: None)
+    chunks = split_audio(audio, SAMPLE_RATE, chunk_seconds)
+
+    executor = _get_executor(model_name, parallelism)
+    futures = []
+    results = []
+    try:
+        futures = [executor.submit(_transcribe_chunk, samples) for _, samples in chunks]
+        for i, ((offset, _), future) in enumerate(zip(chunks, futures)):
+            results.append((offset, future.result()))
+            progress(0.3 + 0.6 * (i + 1) / len(chunks), "transcribing")
+    except BrokenProcessPool:
+        # A pool process died (e.g. killed when out of memory); the pool cannot be used again
+        _drop_executor(executor)
+        raise
+    finally:
+        # After a failed chunk the job fails: do not keep the pool busy with the rest
+        for future in futures:
+            future.cancel()
+
+    segments = stitch_segments(results)
+    text = "".join(segment["text"] for segment in segments).strip()
+    return text, segments
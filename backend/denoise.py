@@ -0,0 +1,205 @@
+"""
+Streaming STFT noise reduction in NumPy.
+
+Audio is processed as it is decoded: every block of samples fed to a
+Denoiser is cut into windowed frames (Hann, DENOISE_N_FFT samples every
+DENOISE_HOP), transformed with one batched FFT, multiplied by a gain per
+time-frequency bin, transformed back and overlap-added. Only the last
+n_fft - hop samples are carried over to the next block, so memory does not
+grow with the length of the recording and block edges leave no seams.
+
+Two gain functions are available (DENOISE_METHOD, or per request):
+
+  gate        spectral gating: bins whose level is below a per-frequency
+              threshold (mean + DENOISE_N_STD standard deviations of the dB
+              level in the quietest frames) are attenuated, with the mask
+              smoothed over time and frequency. Follows noise that changes
+              over the recording.
+  stationary  Wiener gain against one noise spectrum estimated from the
+              quietest frames. Cheaper, for steady hum and hiss.
+
+Attenuation is limited to DENOISE_FLOOR (a gain, 0.05 = -26 dB) to avoid
+musical noise.
+"""
+import os
+
+import numpy as np
+
+DENOISE_METHOD = os.getenv("DENOISE_METHOD", "gate")
+DENOISE_N_FFT = int(os.getenv("DENOISE_N_FFT", "512"))
+DENOISE_HOP = int(os.getenv("DENOISE_HOP", "128"))
+DENOISE_FLOOR = float(os.getenv("DENOISE_FLOOR", "0.05"))
+DENOISE_N_STD = float(os.getenv("DENOISE_N_STD", "1.5"))
+# Noise is estimated from the quietest NOISE_PERCENTILE % of the frames in the
+# last NOISE_HISTORY_SECONDS (or in the current block, when it is longer)
+NOISE_PERCENTILE = 20
+NOISE_HISTORY_SECONDS = 10
+# Gate mask smoothing; smoothing much wider than ~100 Hz blurs the harmonics of voiced speech
+MASK_SMOOTH_HZ = 100
+MASK_SMOOTH_MS = 50
+
+_EPS = 1e-10
+
+
+def _quiet_frames(power):
+    energy = power.sum(axis=1)
+    return power[energy <= np.percentile(energy, NOISE_PERCENTILE)]
+
+
+def _smooth(x, size, axis):
+    """Moving average of `size` along `axis` (edges repeated)"""
+    if size <= 1:
+        return x
+    x = np.moveaxis(x, axis, 0)
+    padded = np.pad(x, [(size // 2, size - 1 - size // 2)] + [(0, 0)] * (x.ndim - 1), mode="edge")
+    summed = np.concatenate([np.zeros((1,) + x.shape[1:], dtype=np.float32), np.cumsum(padded, axis=0)])
+    return np.moveaxis((summed[size:] - summed[:-size]) / size, 0, axis)
+
+
+class SpectralGate:
+    """Gate bins below a noise threshold per frequency"""
+
+    def __init__(self, sr, n_fft, hop, floor=DENOISE_FLOOR, n_std=DENOISE_N_STD):
+        self.floor = floor
+        self.n_std = n_std
+        self.freq_smooth = max(1, int(round(MASK_SMOOTH_HZ / (sr / n_fft))))
+        self.time_smooth = max(1, int(round(MASK_SMOOTH_MS / 1000 * sr / hop)))
+        self.threshold = None
+
+    def update(self, noise):
+        db = 10 * np.log10(noise + _EPS)
+        self.threshold = db.mean(axis=0) + self.n_std * db.std(axis=0)
+
+    def gain(self, power):
+        mask = (10 * np.log10(power + _EPS) > self.threshold).astype(np.float32)
+        mask = _smooth(_smooth(mask, self.time_smooth, 0), self.freq_smooth, 1)
+        return self.floor + (1 - self.floor) * mask
+
+
+class StationaryNoise:
+    """Wiener gain against the average noise spectrum"""
+
+    def __init__(self, sr, n_fft, hop, floor=DENOISE_FLOOR):
+        self.floor = floor
+        self.noise = None
+
+    def update(self, noise):
+        self.noise = noise.mean(axis=0)
+
+    def gain(self, power):
+        snr = np.maximum(power / (self.noise + _EPS) - 1, 0)
+        return np.maximum(snr / (snr + 1), self.floor)
+
+
+METHODS = {"gate": SpectralGate, "stationary": StationaryNoise}
+
+
+def resolve_method(value):
+    """Denoising method for a request option or job payload value ("true", "gate", False, ...), or None"""
+    if value is None or value is False or str(value).lower() in ("", "false", "0", "none"):
+        return None
+    if value is True or str(value).lower() in ("true", "1"):
+        return DENOISE_METHOD
+    if value not in METHODS:
+        raise ValueError(f"denoise must be true, false or one of {', '.join(METHODS)}")
+    return value
+
+
+class Denoiser:
+    """Streaming denoiser: feed() blocks, then flush(); the output has the input's length.
+
+    With `min_history_seconds`, audio passes through unchanged until that much
+    has been fed, so small blocks at the start of a live stream (often all
+    speech) are not taken for the noise.
+    """
+
+    def __init__(self, method=DENOISE_METHOD, sr=16000, n_fft=DENOISE_N_FFT, hop=DENOISE_HOP,
+                 min_history_seconds=0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown denoising method {method!r}")
+        if n_fft % hop:
+            raise ValueError("DENOISE_N_FFT must be a multiple of DENOISE_HOP")
+        self.method = method
+        self.n_fft = n_fft
+        self.hop = hop
+        self.mask = METHODS[method](sr, n_fft, hop)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+        self._overlaps = n_fft // hop
+        self._history_frames = int(NOISE_HISTORY_SECONDS * sr / hop)
+        self._history = np.empty((0, n_fft // 2 + 1), dtype=np.float32)
+        self._min_history_frames = int(min_history_seconds * sr / hop)
+        # Sum of the squared analysis x synthesis windows over the frames covering a sample
+        self._norm = np.square(self.window).reshape(self._overlaps, hop).sum(axis=0)
+        # Leading zeros so the first samples are covered by as many frames as any other
+        self._pad = n_fft - hop
+        self._buffer = np.zeros(self._pad, dtype=np.float32)
+        self._tail = np.zeros(self._pad, dtype=np.float32)
+        self._frames = 0
+        self._fed = 0
+        self._emitted = 0
+
+    def _process(self, real_end, last=False):
+        """Run every complete frame in the buffer; returns the samples no later frame overlaps"""
+        n = (len(self._buffer) - self.n_fft) // self.hop + 1
+        if n <= 0:
+            return np.empty(0, dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer, self.n_fft)[::self.hop][:n]
+        spectrum = np.fft.rfft(frames * self.window, axis=1)
+        power = np.square(spectrum.real) + np.square(spectrum.imag)
+
+        # Estimate noise on frames made only of real audio (not the zero padding at either end)
+        first = self._frames
+        lo = max(0, self._overlaps - 1 - first)
+        hi = min(n, (real_end - self.n_fft) // self.hop + 1 - first)
+        if hi > lo:
+            recent = np.concatenate([self._history, power[lo:hi].astype(np.float32)])
+            self._history = recent[-max(self._history_frames, hi - lo):]
+        if last or len(self._history) >= self._min_history_frames:
+            self.mask.update(_quiet_frames(self._history if len(self._history) else power))
+            spectrum *= self.mask.gain(power)
+
+        frames = np.fft.irfft(spectrum, n=self.n_fft, axis=1).astype(np.float32) * self.window
+        # Overlap-add: hop-sized piece r of frame i lands at output row i + r
+        pieces = frames.reshape(n, self._overlaps, self.hop)
+        out = np.zeros((n + self._overlaps - 1, self.hop), dtype=np.float32)
+        for r in range(self._overlaps):
+            out[r:r + n] += pieces[:, r]
+        out = out.reshape(-1)
+        out[:self._pad] += self._tail
+
+        done = out[:n * self.hop] / np.tile(self._norm, n)
+        self._tail = out[n * self.hop:]
+        self._buffer = self._buffer[n * self.hop:]
+        self._frames += n
+
+        skip = max(0, self._pad - (self._frames - n) * self.hop)
+        return done[skip:]
+
+    def feed(self, block):
+        """Denoise the next block of samples; returns the samples completed so far"""
+        self._buffer = np.concatenate([self._buffer, np.asarray(block, dtype=np.float32)])
+        self._fed += len(block)
+        # The buffer starts at frame self._frames and holds only real audio up to its end
+        out = self._process(self._frames * self.hop + len(self._buffer))
+        self._emitted += len(out)
+        return out
+
+    def flush(self):
+        """Denoise the rest of the stream"""
+        real_end = self._frames * self.hop + len(self._buffer)
+        self._buffer = np.concatenate([self._buffer, np.zeros(self.n_fft, dtype=np.float32)])
+        out = self._process(real_end, last=True)[:self._fed - self._emitted]
+        self._emitted += len(out)
+        return out
+
+
+def denoise_blocks(blocks, method=DENOISE_METHOD, sr=16000):
+    """Denoise a stream of sample blocks, yielding denoised blocks"""
+    denoiser = Denoiser(method, sr)
+    for block in blocks:
+        out = denoiser.feed(block)
+        if len(out):
+            yield out
+    out = denoiser.flush()
+    if len(out):
+        yield out
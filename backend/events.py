@@ -0,0 +1,154 @@
+"""
+Buffered audit log and metrics pipeline.
+
+log_action / track_metric put their documents on a bounded in-memory queue
+instead of writing to storage on the request path. A background thread
+drains the queue with one batch write per collection whenever
+EVENT_FLUSH_SIZE events are pending or EVENT_FLUSH_INTERVAL_MS has passed.
+Pending events are flushed when the process exits.
+
+When the queue is full, EVENT_OVERFLOW_POLICY decides what happens:
+  drop_newest  the new event is dropped (default; requests never wait)
+  drop_oldest  the oldest pending event is dropped to make room
+  block        the caller waits up to EVENT_BLOCK_TIMEOUT_MS, then drops
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "10000"))
+EVENT_FLUSH_SIZE = int(os.getenv("EVENT_FLUSH_SIZE", "500"))
+EVENT_FLUSH_INTERVAL_MS = int(os.getenv("EVENT_FLUSH_INTERVAL_MS", "1000"))
+EVENT_OVERFLOW_POLICY = os.getenv("EVENT_OVERFLOW_POLICY", "drop_newest")
+EVENT_BLOCK_TIMEOUT_MS = int(os.getenv("EVENT_BLOCK_TIMEOUT_MS", "100"))
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class EventPipeline:
+    """Bounded queue of (collection, document) pairs written in batches by a flusher thread.
+
+    writers maps each collection name to a function that stores a list of documents.
+    """
+
+    def __init__(self, writers, max_size=EVENT_QUEUE_SIZE, flush_size=EVENT_FLUSH_SIZE,
+                 flush_interval_ms=EVENT_FLUSH_INTERVAL_MS, overflow_policy=EVENT_OVERFLOW_POLICY,
+                 block_timeout_ms=EVENT_BLOCK_TIMEOUT_MS):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"EVENT_OVERFLOW_POLICY must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.writers = writers
+        self.max_size = max_size
+        self.flush_size = max(1, min(flush_size, max_size))
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000.0
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._stats = {
+            "emitted": 0, "written": 0, "dropped": 0, "write_errors": 0,
+            "flushes": 0, "flush_seconds": 0.0, "max_flush_seconds": 0.0, "max_delay_seconds": 0.0
+        }
+        atexit.register(self.stop)
+
+    def _ensure_started(self):
+        # Started lazily so a forked server process gets its own flusher
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="event-flusher", daemon=True)
+            self._thread.start()
+
+    def emit(self, collection, document):
+        """Queue a document for insertion; returns False if it was dropped"""
+        with self._cond:
+            if self._stopping:
+                self._stats["dropped"] += 1
+                return False
+            self._ensure_started()
+            if len(self._events) >= self.max_size:
+                if self.overflow_policy == "drop_oldest":
+                    self._events.popleft()
+                    self._stats["dropped"] += 1
+                elif self.overflow_policy != "block" or not self._cond.wait_for(
+                        lambda: len(self._events) < self.max_size, timeout=self.block_timeout):
+                    self._stats["dropped"] += 1
+                    return False
+            self._events.append((collection, document, time.monotonic()))
+            self._stats["emitted"] += 1
+            if len(self._events) >= self.flush_size:
+                self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._events) >= self.flush_size,
+                    timeout=self.flush_interval
+                )
+                if self._stopping:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of events written"""
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._events)
+                self._events.clear()
+                # Wake callers blocked on a full queue
+                self._cond.notify_all()
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            oldest = min(queued_at for _, _, queued_at in batch)
+            by_collection = {}
+            for collection, document, _ in batch:
+                by_collection.setdefault(collection, []).append(document)
+
+            written = 0
+            failed = 0
+            for collection, documents in by_collection.items():
+                try:
+                    self.writers[collection](documents)
+                    written += len(documents)
+                except Exception as e:
+                    failed += len(documents)
+                    print(f"Warning: could not write {len(documents)} {collection} events: {e}")
+
+            elapsed = time.perf_counter() - started
+            with self._cond:
+                self._stats["written"] += written
+                self._stats["dropped"] += failed
+                self._stats["write_errors"] += 1 if failed else 0
+                self._stats["flushes"] += 1
+                self._stats["flush_seconds"] += elapsed
+                self._stats["max_flush_seconds"] = max(self._stats["max_flush_seconds"], elapsed)
+                self._stats["max_delay_seconds"] = max(self._stats["max_delay_seconds"], time.monotonic() - oldest)
+            return written
+
+    def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._events)
+        flushes = stats["flushes"]
+        flush_seconds = stats.pop("flush_seconds")
+        stats["avg_flush_ms"] = round(flush_seconds / flushes * 1000, 2) if flushes else 0.0
+        stats["max_flush_ms"] = round(stats.pop("max_flush_seconds") * 1000, 2)
+        stats["max_delay_ms"] = round(stats.pop("max_delay_seconds") * 1000, 2)
+        stats["max_size"] = self.max_size
+        stats["overflow_policy"] = self.overflow_policy
+        return stats
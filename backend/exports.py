@@ -0,0 +1,492 @@
+"""
+Export of transcriptions as DOCX and PDF.
+
+Rendered files are cached on disk under EXPORT_CACHE_DIR, keyed by
+(transcription id, revision, format, template). The storage layer bumps a
+transcription's revision whenever it is updated (summary, key items, ...),
+so a changed transcription is simply rendered again; older revisions are
+deleted when the new one is stored, and the whole cache is kept under
+EXPORT_CACHE_MAX_BYTES by evicting the least recently used files. The cache
+directory is shared by all API processes.
+
+DOCX files are built from a template loaded once per process
+(EXPORT_DOCX_TEMPLATE, e.g. a letterhead; python-docx's default otherwise).
+PDFs are written by a small native renderer using the standard Helvetica
+fonts: pages are produced and streamed to the client one at a time, so long
+transcripts never sit in memory as a whole.
+
+zip_stream() streams many exports as one ZIP archive.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import zipfile
+import zlib
+from datetime import datetime
+from io import BytesIO
+
+from metrics import STAGE_SECONDS
+
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join("uploads", "export_cache"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EXPORT_DOCX_TEMPLATE = os.getenv("EXPORT_DOCX_TEMPLATE", "")
+EXPORT_BULK_MAX = int(os.getenv("EXPORT_BULK_MAX", "100"))
+EXPORT_FORMATS = ("docx", "pdf")
+# Bump when the layout of rendered files changes, to retire cached ones
+RENDERER_VERSION = 1
+
+MIMETYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+READ_CHUNK = 64 * 1024
+
+
+# ===========================
+# CONTENT
+# ===========================
+
+def _timestamp(segment):
+    return f"[{segment.get('start') or 0:.2f}s - {segment.get('end') or 0:.2f}s] {segment.get('text') or ''}"
+
+
+def _key_item_line(item):
+    assignee = item.get('assignee') or ''
+    status = item.get('status') or 'open'
+    return f"[{status}] " + (f"{assignee}: " if assignee else "") + (item.get('text') or '')
+
+
+def _created_at(transcription):
+    created_at = transcription.get('created_at')
+    return created_at.strftime('%Y-%m-%d %H:%M:%S') if isinstance(created_at, datetime) else str(created_at or '')
+
+
+def _blocks(transcription):
+    """The document as (kind, text) blocks, in order; shared by both formats"""
+    yield "title", "Meeting Minutes"
+    yield "text", f"Meeting: {transcription.get('filename') or ''}"
+    yield "text", f"Date: {_created_at(transcription)}"
+    yield "space", ""
+
+    if transcription.get('summary'):
+        yield "heading", "Summary"
+        yield "text", transcription['summary']
+        yield "space", ""
+
+    yield "heading", "Full Transcription"
+    yield "text", transcription.get('transcription') or ''
+
+    if transcription.get('segments'):
+        yield "heading", "Segments with Timestamps"
+        for segment in transcription['segments']:
+            yield "text", _timestamp(segment)
+
+    if transcription.get('bullet_points'):
+        yield "heading", "Key Points"
+        for point in transcription['bullet_points']:
+            yield "bullet", point
+
+    if transcription.get('key_items'):
+        yield "heading", "Decisions & Action Items"
+        for item in transcription['key_items']:
+            yield "text", _key_item_line(item)
+
+
+# ===========================
+# DOCX
+# ===========================
+
+class DocxTemplate:
+    """A DOCX template read once and instantiated from memory for every export"""
+
+    def __init__(self, path=EXPORT_DOCX_TEMPLATE):
+        self.path = path
+        self._bytes = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._bytes is None:
+                if self.path:
+                    with open(self.path, "rb") as f:
+                        self._bytes = f.read()
+                    self._fingerprint = hashlib.sha256(self._bytes).hexdigest()[:12]
+                else:
+                    from docx import Document
+                    buffer = BytesIO()
+                    Document().save(buffer)
+                    self._bytes = buffer.getvalue()
+                    # The saved default differs per process (ZIP timestamps); it is the same template though
+                    self._fingerprint = "default"
+        return self._bytes
+
+    def fingerprint(self):
+        self._load()
+        return self._fingerprint
+
+    def new_document(self):
+        from docx import Document
+        return Document(BytesIO(self._load()))
+
+
+def render_docx(transcription, template):
+    """The export as DOCX; yields the file as a single chunk"""
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from docx.shared import Pt
+
+    doc = template.new_document()
+    for kind, text in _blocks(transcription):
+        if kind == "title":
+            title = doc.add_paragraph()
+            title_run = title.add_run(text)
+            title_run.font.size = Pt(24)
+            title_run.font.bold = True
+            title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        elif kind == "heading":
+            doc.add_heading(text, level=2)
+        elif kind == "bullet":
+            doc.add_paragraph(text, style='List Bullet')
+        else:
+            doc.add_paragraph(text)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    yield buffer.getvalue()
+
+
+# ===========================
+# PDF
+# ===========================
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, in points
+MARGIN = 56
+# Helvetica advance widths (1/1000 em) for ASCII 32-126, from the standard AFM
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+# (font resource, size, leading, space before); bold text is measured 10% wider
+_STYLES = {
+    "title": ("F2", 20, 28, 0),
+    "heading": ("F2", 13, 18, 10),
+    "text": ("F1", 10, 14, 0),
+    "bullet": ("F1", 10, 14, 0),
+    "space": ("F1", 10, 8, 0),
+}
+
+
+def _encode(text):
+    """PDF string literal bytes for text in WinAnsiEncoding (unsupported characters become '?')"""
+    raw = text.replace("\t", "    ").encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _text_width(text, font, size):
+    units = 0
+    for ch in text:
+        code = ord(ch)
+        units += _HELVETICA_WIDTHS[code - 32] if 32 <= code <= 126 else 556
+    return units * size / 1000.0 * (1.1 if font == "F2" else 1.0)
+
+
+def _wrap(text, font, size, width):
+    """Split text into lines no wider than width (very long words are broken)"""
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if _text_width(candidate, font, size) <= width:
+                line = candidate
+                continue
+            if line:
+                yield line
+            while _text_width(word, font, size) > width:
+                cut = len(word) - 1
+                while cut > 1 and _text_width(word[:cut], font, size) > width:
+                    cut -= 1
+                yield word[:cut]
+                word = word[cut:]
+            line = word
+        yield line
+
+
+def _pages(transcription):
+    """Content streams of the pages, produced one page at a time"""
+    width = PAGE_WIDTH - 2 * MARGIN
+    ops = []
+    y = PAGE_HEIGHT - MARGIN
+    page = 1
+
+    def finish():
+        footer = f"Page {page}"
+        x = (PAGE_WIDTH - _text_width(footer, "F1", 8)) / 2
+        ops.append(b"BT /F1 8 Tf %.2f %.2f Td (%s) Tj ET" % (x, MARGIN / 2, _encode(footer)))
+        return b"\n".join(ops)
+
+    for kind, text in _blocks(transcription):
+        font, size, leading, space_before = _STYLES[kind]
+        indent = 12 if kind == "bullet" else 0
+        first = True
+        for line in _wrap(text, font, size, width - indent) if text else [""]:
+            step = leading + (space_before if first else 0)
+            if y - step < MARGIN:
+                yield finish()
+                ops = []
+                y = PAGE_HEIGHT - MARGIN
+                page += 1
+                step = leading
+            y -= step
+            if line:
+                x = MARGIN + indent
+                if kind == "title":
+                    x = (PAGE_WIDTH - _text_width(line, font, size)) / 2
+                if kind == "bullet" and first:
+                    ops.append(b"BT /F1 %d Tf %.2f %.2f Td (\x95) Tj ET" % (size, MARGIN, y))
+                ops.append(b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (font.encode(), size, x, y, _encode(line)))
+            first = False
+    yield finish()
+
+
+def render_pdf(transcription):
+    """The export as PDF, yielded object by object (one page per content stream)"""
+    offsets = {}
+    position = 0
+
+    def emit(data, number=None):
+        nonlocal position
+        if number is not None:
+            offsets[number] = position
+            data = b"%d 0 obj\n" % number + data + b"\nendobj\n"
+        position += len(data)
+        return data
+
+    title = _encode(f"Meeting Minutes - {transcription.get('filename') or ''}")
+    yield emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield emit(b"<< /Type /Catalog /Pages 2 0 R >>", 1)
+    yield emit(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>", 3)
+    yield emit(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>", 4)
+    yield emit(b"<< /Title (%s) /Producer (MinuteMinds) /CreationDate (D:%s) >>"
+               % (title, datetime.utcnow().strftime("%Y%m%d%H%M%SZ").encode()), 5)
+
+    # The page tree (object 2) is written last, once all pages are known
+    kids = []
+    number = 6
+    for content in _pages(transcription):
+        compressed = zlib.compress(content)
+        yield emit(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(compressed) + compressed + b"\nendstream",
+                   number)
+        yield emit(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                   b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                   % (PAGE_WIDTH, PAGE_HEIGHT, number), number + 1)
+        kids.append(b"%d 0 R" % (number + 1))
+        number += 2
+    yield emit(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids)), 2)
+
+    xref = position
+    entries = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % offsets[n] for n in range(1, number)]
+    yield emit(b"xref\n0 %d\n" % number + b"".join(entries)
+               + b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (number, xref))
+
+
+# ===========================
+# CACHE AND ENGINE
+# ===========================
+
+class ExportCache:
+    """Size-bounded LRU directory of rendered exports shared by all processes"""
+
+    def __init__(self, directory=EXPORT_CACHE_DIR, max_bytes=EXPORT_CACHE_MAX_BYTES):
+        # Absolute, since Flask's send_file resolves relative paths against the app root
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evictions": 0}
+
+    @staticmethod
+    def _name(transcription_id):
+        return re.sub(r"[^A-Za-z0-9_-]", "_", str(transcription_id))
+
+    def _path(self, key):
+        transcription_id, revision, variant, fmt = key
+        return os.path.join(self.directory, f"{self._name(transcription_id)}.{revision}.{variant}.{fmt}")
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def get(self, key):
+        """Path of the cached file, or None"""
+        path = self._path(key)
+        try:
+            # mtime is the LRU clock
+            os.utime(path)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return path
+
+    def write_through(self, key, chunks):
+        """Yield chunks while writing them to the cache; the file is kept only if all chunks were produced"""
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._count("stored")
+        self._drop_other_revisions(key)
+        self._evict()
+
+    def _drop_other_revisions(self, key):
+        prefix = self._name(key[0]) + "."
+        keep = os.path.basename(self._path(key))
+        for entry in os.scandir(self.directory):
+            if not entry.name.startswith(prefix) or entry.name == keep or entry.name.endswith(".tmp"):
+                continue
+            # <id>.<revision>.<variant>.<format>: older revisions, or this format with another template
+            parts = entry.name.split(".")
+            if len(parts) == 4 and (parts[1] != str(key[1]) or parts[3] == key[3]):
+                self._remove(entry.path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            self._remove(path)
+            self._count("evictions")
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, transcription_id):
+        prefix = self._name(transcription_id) + "."
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(prefix) and not entry.name.endswith(".tmp"):
+                self._remove(entry.path)
+
+    def stats(self):
+        entries = 0
+        size = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                entries += 1
+                size += entry.stat().st_size
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["entries"] = entries
+        stats["bytes"] = size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+class _ZipSink:
+    """Write-only, non-seekable buffer that zipfile writes into and zip_stream drains"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportEngine:
+    """Renders exports through the cache"""
+
+    def __init__(self, cache=None, template=None):
+        self.cache = cache or ExportCache()
+        self.template = template or DocxTemplate()
+
+    def key(self, transcription_id, revision, fmt):
+        variant = f"v{RENDERER_VERSION}"
+        if fmt == "docx":
+            variant += "-" + self.template.fingerprint()
+        return str(transcription_id), int(revision or 0), variant, fmt
+
+    def lookup(self, transcription_id, revision, fmt):
+        """Path of the cached export, or None"""
+        return self.cache.get(self.key(transcription_id, revision, fmt))
+
+    def render(self, transcription, fmt):
+        """Render an export (and cache it as it streams); yields bytes"""
+        chunks = render_pdf(transcription) if fmt == "pdf" else render_docx(transcription, self.template)
+        chunks = STAGE_SECONDS.time_iter(chunks, pipeline="export", stage=fmt)
+        return self.cache.write_through(self.key(transcription["_id"], transcription.get("revision"), fmt), chunks)
+
+    def chunks(self, transcription_id, revision, fmt, load):
+        """An export as bytes chunks, from the cache or rendered from load()"""
+        path = self.lookup(transcription_id, revision, fmt)
+        if path is None:
+            yield from self.render(load(), fmt)
+            return
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+
+    def zip_stream(self, entries, fmt, load):
+        """Stream a ZIP of exports; entries are (transcription id, revision, name in the archive).
+
+        load(transcription_id) returns the full transcription when it has to be rendered.
+        """
+        sink = _ZipSink()
+        # The exports are compressed already (DOCX is a ZIP, PDF pages are deflated)
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+            for transcription_id, revision, name in entries:
+                info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+                info.external_attr = 0o644 << 16
+                with archive.open(info, "w") as member:
+                    for chunk in self.chunks(transcription_id, revision, fmt, lambda: load(transcription_id)):
+                        member.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+        yield sink.drain()
+
+    def stats(self):
+        return dict(self.cache.stats(), template=self.template.path or "default")
+
+
+def download_name(transcription, fmt):
+    """Attachment file name for an export"""
+    stem = os.path.splitext(os.path.basename(transcription.get("filename") or "minutes"))[0]
+    stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", stem).strip("_") or "minutes"
+    return f"minutes_{stem}_{transcription['_id']}.{fmt}"
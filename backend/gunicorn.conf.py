@@ -0,0 +1,96 @@
+"""
+Gunicorn configuration for serving the API in production.
+
+Run from the repository root (the same working directory as
+`python backend/app.py`, so uploads/ and the SQLite files stay in place):
+  gunicorn -c backend/gunicorn.conf.py wsgi:app
+
+Process model
+  The master imports the app once (preload_app), so the HTTP workers share
+  the imported code, then forks WEB_CONCURRENCY workers with GUNICORN_THREADS
+  threads each. No ML model is ever loaded in the master:
+  - Uploaded recordings are transcribed by the job worker processes
+    (jobs.py), which the master starts once, before forking, with the "spawn"
+    start method, so they share nothing with the HTTP workers. Set
+    JOB_WORKERS=0 to run them elsewhere with `python backend/jobs.py`.
+  - Live streams (/transcribe/stream) need an answer every few seconds, so
+    they run Whisper in the HTTP worker serving them: a worker loads its own
+    Whisper copy with its first stream and serves at most STREAM_MAX_SESSIONS
+    streams at once (0 turns live transcription off).
+  - The summarizer and spaCy are loaded by each HTTP worker after the fork,
+    on first use or at boot via MODEL_PRELOAD, so every HTTP worker holds its
+    own copy.
+  - Database clients opened while preloading are replaced after the fork.
+  Preloading is quick (see app.py): MongoDB is not waited for, and the
+  indexes are created by a background thread (see storage.py), so the
+  workers serve / before MongoDB answers and /health reports when it does.
+
+Shutdown (SIGTERM)
+  HTTP workers stop accepting connections, get GUNICORN_GRACEFUL_TIMEOUT
+  seconds to finish in-flight requests and flush their buffered logs and
+  metrics. The master then asks the job workers to finish their current job
+  and waits up to JOB_STOP_TIMEOUT seconds; jobs still running after that are
+  requeued at the next start. Give the container (docker stop -t /
+  stop_grace_period) more time than both timeouts together.
+
+Sizing
+  I/O-bound endpoints (auth, lists, search, uploads, admin, job polling)
+  mostly wait on the database, the disk or the network and release the GIL,
+  so they scale with threads: keep WEB_CONCURRENCY low (2, more only for
+  redundancy or above ~16 cores) and raise GUNICORN_THREADS (8-16).
+  CPU-bound work has its own pools, sized per host, not per request:
+  - transcription: JOB_WORKERS processes; about cores / torch threads per
+    worker, or one per GPU
+  - live streams: each holds one HTTP worker thread for its whole duration
+    and runs Whisper in that worker, so keep STREAM_MAX_SESSIONS well below
+    GUNICORN_THREADS and budget one Whisper model per HTTP worker
+    (WEB_CONCURRENCY copies in all, counted in MODEL_MEMORY_BUDGET_MB) on top
+    of the job workers' cores and memory
+  - summarization / key items: run in the HTTP workers; each loaded model
+    costs memory (MODEL_MEMORY_BUDGET_MB) per worker and torch uses all cores
+    by default, so with several workers set OMP_NUM_THREADS to about
+    cores / WEB_CONCURRENCY
+  - bcrypt: PASSWORD_WORKERS threads per HTTP worker; about
+    cores / WEB_CONCURRENCY
+  In-process caches (users, roles) are per HTTP worker; deletions and role
+  changes made through the API reach the other workers on their next
+  request (see user_cache.py).
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Threads serve I/O-bound requests; the gthread heartbeat does not depend on
+# request duration, so long summarizations do not get workers killed
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+# Modules are imported as top-level modules from backend/
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Off by default: a recycled worker has to load its models again
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+
+
+def when_ready(server):
+    import services
+    services.worker_pool.start()
+
+
+def post_fork(server, worker):
+    import services
+    services.init_process()
+
+
+def worker_exit(server, worker):
+    import services
+    services.event_pipeline.stop()
+
+
+def on_exit(server):
+    import services
+    services.shutdown()
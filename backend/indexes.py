@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+MongoDB index management.
+
+Every index the app's queries rely on is declared here and created once at
+startup (ensure_indexes), or ahead of a deploy with:
+  python backend/indexes.py [--mongo mongodb://...] [--explain]
+
+explain_queries() runs explain() on the app's hot queries and reports which
+index each one uses, warning about collection scans; it backs the
+/admin/indexes diagnostics endpoint.
+"""
+import argparse
+import json
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+INDEXES = {
+    "users": [
+        # login / registration lookups
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "transcriptions": [
+        # per-user listing, newest first, keyset pagination
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_at"),
+    ],
+    "logs": [
+        # admin log view, newest first
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+        # admin log view filtered by action, and login counts
+        IndexModel([("action", ASCENDING), ("timestamp", DESCENDING)], name="action_timestamp"),
+    ],
+    "analytics": [
+        # recent metrics window
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+        IndexModel([("type", ASCENDING), ("timestamp", DESCENDING)], name="type_timestamp"),
+    ],
+    "analytics_rollups": [
+        # one document per bucket; also serves range queries and top users
+        IndexModel([("granularity", ASCENDING), ("type", ASCENDING), ("user_id", ASCENDING), ("bucket", ASCENDING)],
+                   name="bucket_key", unique=True),
+        IndexModel([("granularity", ASCENDING), ("user_id", ASCENDING), ("bucket", ASCENDING)], name="user_bucket"),
+        # minute and hour buckets expire (see rollups.RETENTION_DAYS)
+        IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0),
+    ],
+}
+
+_SAMPLE_ID = "000000000000000000000000"
+
+# (description, collection, filter, sort) for the queries the app runs most
+DIAGNOSTIC_QUERIES = [
+    ("login by email", "users", {"email": "user@example.com"}, None),
+    ("list transcriptions", "transcriptions", {"user_id": _SAMPLE_ID}, [("created_at", -1), ("_id", -1)]),
+    ("admin logs", "logs", {}, [("timestamp", -1)]),
+    ("admin logs by action", "logs", {"action": "user_login"}, [("timestamp", -1)]),
+    ("analytics series", "analytics_rollups",
+     {"granularity": "hour", "user_id": "*", "bucket": {"$gte": datetime(1970, 1, 1)}}, [("bucket", 1)]),
+]
+
+
+def ensure_indexes(db):
+    """Create all declared indexes (idempotent); returns a per-index status report"""
+    report = []
+    for collection, models in INDEXES.items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                db[collection].create_indexes([model])
+                report.append({"collection": collection, "name": name, "status": "ok"})
+            except Exception as e:
+                print(f"Warning: could not create index {collection}.{name}: {e}")
+                report.append({"collection": collection, "name": name, "status": "error", "error": str(e)})
+    return report
+
+
+def _plan_stages(plan, stages=None):
+    """Flatten a winning plan into a list of (stage, index name) tuples"""
+    stages = [] if stages is None else stages
+    stages.append((plan.get("stage"), plan.get("indexName")))
+    for child in [plan.get("inputStage")] + list(plan.get("inputStages", [])):
+        if child:
+            _plan_stages(child, stages)
+    return stages
+
+
+def explain_queries(db):
+    """Explain the app's hot queries; flags any that fall back to a collection scan"""
+    results = []
+    for description, collection, query, sort in DIAGNOSTIC_QUERIES:
+        entry = {"query": description, "collection": collection}
+        try:
+            cursor = db[collection].find(query).limit(20)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain()["queryPlanner"]["winningPlan"]
+            # Sharded / newer servers nest the plan under queryPlan
+            plan = plan.get("queryPlan", plan)
+            stages = _plan_stages(plan)
+            entry["stages"] = [stage for stage, _ in stages]
+            entry["indexes"] = sorted({name for _, name in stages if name})
+            entry["collection_scan"] = "COLLSCAN" in entry["stages"]
+            if entry["collection_scan"]:
+                entry["warning"] = "Query does a collection scan; is an index missing?"
+        except Exception as e:
+            entry["error"] = str(e)
+            entry["warning"] = "Query could not be explained"
+        results.append(entry)
+    return results
+
+
+def index_usage(db):
+    """Per-index operation counts since server start ($indexStats)"""
+    usage = {}
+    for collection in INDEXES:
+        try:
+            usage[collection] = {
+                stat["name"]: stat["accesses"]["ops"]
+                for stat in db[collection].aggregate([{"$indexStats": {}}])
+            }
+        except Exception as e:
+            usage[collection] = {"error": str(e)}
+    return usage
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    from storage import MONGO_DB_NAME, MONGO_URL
+
+    parser = argparse.ArgumentParser(description="Create MinuteMinds MongoDB indexes")
+    parser.add_argument("--mongo", default=MONGO_URL, help="MongoDB URI")
+    parser.add_argument("--db", default=MONGO_DB_NAME, help="Database name (default: MONGO_DB_NAME)")
+    parser.add_argument("--explain", action="store_true", help="Also explain the app's hot queries")
+    args = parser.parse_args()
+
+    database = MongoClient(args.mongo)[args.db]
+    for item in ensure_indexes(database):
+        print(f"{item['collection']}.{item['name']}: {item['status']}" + (f" ({item['error']})" if "error" in item else ""))
+    if args.explain:
+        print(json.dumps(explain_queries(database), indent=2))
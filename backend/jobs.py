@@ -0,0 +1,301 @@
+"""
+Persistent background job queue.
+
+Jobs are stored in a local SQLite database so that queued work survives a
+restart, and are drained by a pool of worker processes. Each worker process
+keeps its own state (e.g. a loaded Whisper model) for the lifetime of the pool.
+
+Run a standalone pool (without the API) with:
+  python backend/jobs.py
+"""
+import atexit
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+import metrics
+
+JOBS_DB = os.getenv("JOBS_DB", os.path.join("uploads", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_STOP_TIMEOUT = float(os.getenv("JOB_STOP_TIMEOUT", "30"))
+# "spawn" keeps torch/CUDA state and open DB connections out of the workers
+JOB_START_METHOD = os.getenv("JOB_START_METHOD", "spawn")
+
+# Job kind -> "module:function" handler, resolved inside each worker process
+JOB_HANDLERS = {
+    "transcribe": "transcription:run_transcription_job",
+    "backfill_key_items": "key_items:run_backfill_job",
+}
+# "module:function" hooks run once when a worker process starts (e.g. model warm-up)
+JOB_WORKER_INIT = ["transcription:init_worker"]
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    stage TEXT,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+JOB_SECONDS = metrics.Histogram(
+    "job_seconds", "Job run time by kind and outcome", ("kind", "outcome"), buckets=metrics.STAGE_BUCKETS
+)
+JOB_WAIT_SECONDS = metrics.Histogram(
+    "job_wait_seconds", "Time jobs spent queued before a worker took them", ("kind",), buckets=metrics.STAGE_BUCKETS
+)
+
+
+class JobQueue:
+    """SQLite-backed FIFO job queue shared by the API and the worker processes"""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit transactions
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, kind, payload, user_id=None):
+        """Add a job and return its id"""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, str(user_id) if user_id else None, json.dumps(payload), QUEUED, _now())
+            )
+        return job_id
+
+    def claim(self, worker):
+        """Atomically take the oldest queued job, or return None if the queue is empty"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1, "
+                "progress = 0, stage = NULL WHERE id = ?",
+                (RUNNING, worker, _now(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def set_progress(self, job_id, progress, stage=None):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ?, stage = ? WHERE id = ?", (progress, stage, job_id))
+
+    def complete(self, job_id, result):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, stage = NULL, result = ?, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result), _now(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, str(error), _now(), job_id)
+            )
+
+    def get(self, job_id):
+        """Return a job as a dict (payload/result decoded), or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def requeue_interrupted(self):
+        """Put jobs left running by a previous shutdown back on the queue.
+
+        Jobs that have already been attempted JOB_MAX_ATTEMPTS times are failed
+        instead, so a job that crashes its worker cannot loop forever.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND attempts >= ?",
+                (FAILED, "Job interrupted too many times", _now(), RUNNING, JOB_MAX_ATTEMPTS)
+            )
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, progress = 0, stage = NULL WHERE status = ?",
+                (QUEUED, RUNNING)
+            )
+        return cursor.rowcount
+
+    def depth(self):
+        """Number of jobs waiting to be picked up"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+
+def _resolve_handler(spec):
+    module_name, func_name = spec.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _worker_main(db_path, handlers, name, stop_event):
+    """Worker process loop: claim a job, run its handler, record the outcome"""
+    # Ctrl-C reaches the whole process group; let the parent drain us via stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    queue = JobQueue(db_path)
+    resolved = {}
+    metrics.start()
+    for spec in JOB_WORKER_INIT:
+        try:
+            _resolve_handler(spec)()
+        except Exception:
+            traceback.print_exc()
+
+    while not stop_event.is_set():
+        job = queue.claim(name)
+        if job is None:
+            stop_event.wait(JOB_POLL_INTERVAL)
+            continue
+
+        waited = datetime.fromisoformat(job["started_at"]) - datetime.fromisoformat(job["created_at"])
+        JOB_WAIT_SECONDS.observe(waited.total_seconds(), kind=job["kind"])
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            if job["kind"] not in resolved:
+                resolved[job["kind"]] = _resolve_handler(handlers[job["kind"]])
+            handler = resolved[job["kind"]]
+
+            def progress(value, stage=None, job_id=job["id"]):
+                queue.set_progress(job_id, value, stage)
+
+            result = handler(job, progress)
+            queue.complete(job["id"], result)
+            outcome = "done"
+        except Exception as e:
+            traceback.print_exc()
+            queue.fail(job["id"], e)
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=job["kind"], outcome=outcome)
+
+
+class WorkerPool:
+    """Fixed-size pool of worker processes draining a JobQueue"""
+
+    def __init__(self, queue, handlers=None, size=JOB_WORKERS):
+        self.queue = queue
+        self.handlers = handlers or JOB_HANDLERS
+        self.size = size
+        self._ctx = multiprocessing.get_context(JOB_START_METHOD)
+        self._stop_event = None
+        self._processes = []
+
+    def start(self):
+        if self._processes or self.size <= 0:
+            return
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"Requeued {requeued} interrupted job(s)")
+
+        self._stop_event = self._ctx.Event()
+        host = socket.gethostname()
+        for i in range(self.size):
+            name = f"{host}:{os.getpid()}:worker-{i}"
+            # Not daemonic: workers may start their own process pools (see chunking.py)
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(self.queue.path, self.handlers, name, self._stop_event),
+                name=name
+            )
+            process.start()
+            self._processes.append(process)
+        atexit.register(self.stop)
+        os.register_at_fork(after_in_child=self._forget)
+
+    def stop(self, timeout=JOB_STOP_TIMEOUT):
+        """Ask workers to exit once their current job finishes and wait for them.
+
+        Workers still busy after `timeout` seconds are terminated; their jobs
+        are requeued on the next start.
+        """
+        if not self._processes:
+            return
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+
+    def _forget(self):
+        """In a process forked from the pool's owner (e.g. a gunicorn HTTP worker): the workers are not ours"""
+        for process in self._processes:
+            # Otherwise multiprocessing tries to join them when this process exits
+            multiprocessing.process._children.discard(process)
+        self._processes = []
+
+    def alive(self):
+        return sum(1 for p in self._processes if p.is_alive())
+
+
+if __name__ == "__main__":
+    # docker stop sends SIGTERM; drain like on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    pool = WorkerPool(JobQueue())
+    pool.start()
+    print(f"Job worker pool running with {pool.size} worker(s) on {pool.queue.path}")
+    try:
+        while pool.alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,137 @@
+"""
+Rule-based extraction of decisions and action items.
+
+Text is split into paragraphs and run through spaCy's nlp.pipe, with the
+pipeline trimmed to what the heuristics use (sentence boundaries and named
+entities; see models._load_spacy). Many transcripts can be processed in one
+call, optionally across several processes, which is what the admin key item
+backfill job does.
+"""
+import os
+import re
+import time
+
+from metrics import STAGE_SECONDS
+from models import SPACY_MODEL, registry
+
+KEY_ITEMS_BATCH_SIZE = int(os.getenv("KEY_ITEMS_BATCH_SIZE", "64"))
+KEY_ITEMS_N_PROCESS = int(os.getenv("KEY_ITEMS_N_PROCESS", "1"))
+# Paragraphs longer than this are split at sentence ends before parsing
+PARAGRAPH_MAX_CHARS = int(os.getenv("KEY_ITEMS_PARAGRAPH_CHARS", "2000"))
+
+KEYWORDS = ["action:", "action item", "todo", "to do", "will", "should", "agree", "decide", "decision"]
+# One pass over the sentence instead of one substring search per keyword
+_KEYWORD_PATTERN = re.compile("|".join(re.escape(k) for k in KEYWORDS))
+# Surface forms whose lemma is "will" ("we'll", "won't"); no lemmatizer needed
+_WILL_FORMS = {"will", "'ll", "’ll", "wo"}
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def get_nlp():
+    """spaCy pipeline from the model registry, or None when spaCy or the model is missing"""
+    try:
+        return registry.get("spacy")
+    except Exception as e:
+        print(f"spaCy model {SPACY_MODEL} not loaded ({e}); run 'python -m spacy download {SPACY_MODEL}' to enable key item extraction")
+        return None
+
+
+def split_paragraphs(text, max_chars=PARAGRAPH_MAX_CHARS):
+    """Split text into paragraphs of at most about max_chars, breaking at sentence ends"""
+    paragraphs = []
+    for block in _PARAGRAPH_BREAK.split(text or ""):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            paragraphs.append(block)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(block):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                paragraphs.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            paragraphs.append(current)
+    return paragraphs
+
+
+def items_from_doc(doc):
+    """Apply the action item / decision heuristics to a parsed doc"""
+    items = []
+    for sent in doc.sents:
+        s_text = sent.text.strip()
+        lowered = s_text.lower()
+        if _KEYWORD_PATTERN.search(lowered):
+            # try to extract assignee and task
+            assignee = next((ent.text for ent in sent.ents if ent.label_ in ("PERSON", "ORG")), None)
+            items.append({"text": s_text, "assignee": assignee, "status": "open"})
+        elif any(token.lower_ in _WILL_FORMS for token in sent):
+            # pattern: "<Person>'ll <verb> ..."
+            assignee = next((ent.text for ent in sent.ents if ent.label_ == "PERSON"), None)
+            items.append({"text": s_text, "assignee": assignee, "status": "open"})
+    return items
+
+
+def extract_key_items_bulk(texts, n_process=KEY_ITEMS_N_PROCESS, batch_size=KEY_ITEMS_BATCH_SIZE):
+    """Extract key items from many texts at once; returns one list of items per text"""
+    results = [[] for _ in texts]
+    nlp = get_nlp()
+    if not nlp:
+        return results
+
+    paragraphs = ((paragraph, i) for i, text in enumerate(texts) for paragraph in split_paragraphs(text))
+    for doc, i in nlp.pipe(paragraphs, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        results[i].extend(items_from_doc(doc))
+    return results
+
+
+def extract_key_items_from_text(text):
+    """Simple rule-based extraction of action items and decisions using spaCy when available."""
+    with STAGE_SECONDS.time(pipeline="key_items", stage="extract"):
+        return extract_key_items_bulk([text], n_process=1)[0]
+
+
+def run_backfill_job(job, progress):
+    """Job handler: (re)extract key items across the transcriptions collection"""
+    from transcription import get_storage
+
+    payload = job["payload"]
+    batch_docs = int(payload.get("batch_docs") or 200)
+    n_process = int(payload.get("n_process") or KEY_ITEMS_N_PROCESS)
+    only_missing = payload.get("only_missing", True)
+
+    transcriptions = get_storage().transcriptions
+    total = transcriptions.count(missing_key_items=only_missing)
+    started = time.perf_counter()
+    processed = 0
+    extracted = 0
+
+    def flush(batch):
+        nonlocal processed, extracted
+        results = extract_key_items_bulk([d.get("transcription") or "" for d in batch], n_process=n_process)
+        transcriptions.update_many([(d["_id"], {"key_items": items}) for d, items in zip(batch, results)])
+        processed += len(batch)
+        extracted += sum(len(items) for items in results)
+        progress(processed / total if total else 1.0, "extracting")
+
+    batch = []
+    for doc in transcriptions.iter_all(["transcription"], missing_key_items=only_missing, batch_size=batch_docs):
+        batch.append(doc)
+        if len(batch) >= batch_docs:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "processed": processed,
+        "key_items": extracted,
+        "seconds": round(elapsed, 2),
+        "docs_per_sec": round(processed / elapsed, 2) if elapsed else 0.0
+    }
@@ -0,0 +1,342 @@
+"""
+Process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in memory in every process that
+records them (HTTP workers, job workers). Each process writes a snapshot to
+METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and when it exits, and
+GET /metrics merges the snapshots that are still fresh:
+
+  counters, histograms  summed over processes
+  gauges                summed over processes (memory, queue sizes, ...)
+  scrape gauges         computed by the scraping process only, for values
+                        that are the same everywhere (e.g. job queue depth)
+
+A process that stops writing snapshots is forgotten after
+METRICS_STALE_SECONDS, so counters may drop when a worker restarts, which
+Prometheus treats as a counter reset.
+"""
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join("uploads", "metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+METRICS_STALE_SECONDS = float(os.getenv("METRICS_STALE_SECONDS", str(max(15.0, 3 * METRICS_FLUSH_INTERVAL))))
+
+PREFIX = "minuteminds_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; requests and storage calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Seconds; pipeline stages, up to Whisper over a long meeting
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), registry=None):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes the labels {', '.join(self.labels) or '(none)'}")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def describe(self):
+        return {"kind": self.kind, "help": self.help, "labels": list(self.labels)}
+
+    def collect(self):
+        """{label values: value} for this process"""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        # New lock too: after a fork, another thread of the parent may have held the old one
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down.
+
+    With `function`, the value is read when the metric is collected: a
+    number, or {label values tuple: number} for a labelled gauge. Scrape
+    gauges (`scrape=True`) are only collected by the process serving
+    /metrics.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None, scrape=False, registry=None):
+        super().__init__(name, help, labels, registry)
+        self.function = function
+        self.scrape = scrape
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self):
+        if self.function is None:
+            return super().collect()
+        try:
+            value = self.function()
+        except Exception as e:
+            print(f"Warning: could not collect metric {self.name}: {e}")
+            return {}
+        if isinstance(value, dict):
+            return {tuple(str(v) for v in key): v for key, v in value.items()}
+        return {(): value}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def describe(self):
+        return dict(super().describe(), buckets=list(self.buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            # Non-cumulative bucket counts (the last one is +Inf), sum
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def time_iter(self, iterable, **labels):
+        """Yield from `iterable`, observing the time spent producing items (not consuming them)"""
+        items = iter(iterable)
+        spent = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - started
+                yield item
+        finally:
+            self.observe(spent, **labels)
+
+    def collect(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+
+class Registry:
+    """The metrics of a process, and their snapshots on disk"""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL,
+                 stale_seconds=METRICS_STALE_SECONDS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.stale_seconds = stale_seconds
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def reset(self):
+        """Forget this process's values (a forked child starts from zero)"""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+        self._started_pid = None
+
+    def _path(self, pid=None):
+        return os.path.join(self.directory, f"{socket.gethostname()}-{pid or os.getpid()}.json")
+
+    def snapshot(self, scrape=False):
+        """Metadata and values of every metric in this process"""
+        snapshot = {}
+        for name, metric in list(self._metrics.items()):
+            if getattr(metric, "scrape", False) and not scrape:
+                continue
+            values = metric.collect()
+            if values:
+                snapshot[name] = dict(metric.describe(), values=[[list(k), v] for k, v in values.items()])
+        return snapshot
+
+    def flush(self):
+        """Write this process's snapshot for the other processes' /metrics"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path()
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Warning: could not write metrics snapshot: {e}")
+
+    def start(self):
+        """Flush snapshots in the background (once per process)"""
+        if self._started_pid == os.getpid():
+            return
+        self._started_pid = os.getpid()
+
+        def run(pid):
+            while os.getpid() == pid:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        threading.Thread(target=run, args=(os.getpid(),), name="metrics-flusher", daemon=True).start()
+        self.flush()
+
+    def _others(self):
+        """Fresh snapshots of the other processes; stale ones are removed"""
+        own = os.path.basename(self._path())
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        snapshots = []
+        now = time.time()
+        for name in names:
+            if not name.endswith(".json") or name == own:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.stale_seconds:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """This process's metrics merged with the other processes' snapshots"""
+        merged = {}
+        for snapshot in [self.snapshot(scrape=True)] + self._others():
+            for name, metric in snapshot.items():
+                if name not in merged:
+                    # Snapshots of other processes may hold metrics this one never registered
+                    known = self._metrics.get(name)
+                    merged[name] = dict(known.describe() if known else metric, values={})
+                values = merged[name]["values"]
+                for key, value in metric["values"]:
+                    key = tuple(key)
+                    if metric["kind"] != "histogram":
+                        values[key] = values.get(key, 0) + value
+                    elif key in values:
+                        counts, total = values[key]
+                        values[key] = ([a + b for a, b in zip(counts, value[0])], total + value[1])
+                    else:
+                        values[key] = (list(value[0]), value[1])
+        return merged
+
+    def render(self):
+        """The text exposition of collect()"""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape(metric['help'], quotes=False)}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            labels = metric["labels"]
+            for key, value in sorted(metric["values"].items()):
+                pairs = list(zip(labels, key))
+                if metric["kind"] != "histogram":
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(metric["buckets"]) + ["+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value, quotes=True):
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+# Per-process registry
+REGISTRY = Registry()
+start = REGISTRY.start
+render = REGISTRY.render
+
+
+
+@atexit.register
+def _flush_at_exit():
+    if REGISTRY._started_pid == os.getpid():
+        REGISTRY.flush()
+
+
+# A forked worker inherits its parent's values: start it from zero
+os.register_at_fork(after_in_child=REGISTRY.reset)
+
+# Metrics shared by several modules
+STAGE_SECONDS = Histogram(
+    "stage_seconds", "Duration of pipeline stages", ("pipeline", "stage"), buckets=STAGE_BUCKETS
+)
+STORAGE_SECONDS = Histogram(
+    "storage_call_seconds", "Duration of storage repository calls", ("backend", "repository", "operation")
+)
+STORAGE_ERRORS = Counter(
+    "storage_call_errors_total", "Storage repository calls that raised", ("backend", "repository", "operation")
+)
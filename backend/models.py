@@ -0,0 +1,265 @@
+"""
+Registry for the ML models (Whisper, the summarization pipeline, spaCy).
+
+Models are loaded on first use (or warmed up at startup via MODEL_PRELOAD),
+at most once per process even when several requests ask for the same model
+concurrently, and kept in LRU order. When the estimated memory of the loaded
+models exceeds MODEL_MEMORY_BUDGET_MB, least recently used models that are
+not currently in use are unloaded.
+
+Each process has its own registry: the API process holds the NLP models
+(and Whisper once it serves a live stream) and every job worker holds the
+Whisper models it needs.
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_ALLOWED_MODELS = [
+    m.strip() for m in os.getenv("WHISPER_ALLOWED_MODELS", "tiny,base,small").split(",") if m.strip()
+]
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "facebook/bart-large-cnn")
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+# Approximate resident size of each Whisper model (fp32 weights plus runtime), before one is loaded
+WHISPER_MODEL_MB = {"tiny": 200, "base": 350, "small": 1000, "medium": 3000, "large": 6000, "turbo": 3200}
+# Comma-separated kind[:name] list loaded in the background at startup, e.g. "whisper:base,spacy"
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "")
+
+
+def _load_whisper(name):
+    import whisper
+    return whisper.load_model(name)
+
+
+def _load_summarizer(name):
+    from transformers import pipeline
+    return pipeline("summarization", model=name)
+
+
+def _load_spacy(name):
+    """Load spaCy with only what key item extraction uses: sentences and entities"""
+    import spacy
+    nlp = spacy.load(name, exclude=["tagger", "attribute_ruler", "lemmatizer"])
+    # The statistical sentence recognizer is much cheaper than the dependency parser
+    if "senter" in nlp.component_names and "parser" in nlp.pipe_names:
+        nlp.disable_pipe("parser")
+        nlp.enable_pipe("senter")
+    elif "parser" not in nlp.pipe_names and "senter" not in nlp.pipe_names:
+        nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def rss_bytes():
+    """Current resident set size (Linux), or 0 when unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _parameter_bytes(obj):
+    module = obj if hasattr(obj, "parameters") else getattr(obj, "model", None)
+    if module is None or not hasattr(module, "parameters"):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in module.parameters())
+    except Exception:
+        return 0
+
+
+class _Entry:
+    def __init__(self, model, size, load_seconds):
+        self.model = model
+        self.size = size
+        self.load_seconds = load_seconds
+        self.last_used = time.time()
+        self.in_use = 0
+
+
+class ModelRegistry:
+    """Thread-safe, memory-bounded cache of loaded models"""
+
+    def __init__(self, memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._kinds = {}
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def register(self, kind, loader, default, allowed=None):
+        """Declare a model kind; `allowed` limits which names may be requested"""
+        self._kinds[kind] = {"loader": loader, "default": default, "allowed": list(allowed or [default])}
+
+    def resolve(self, kind, name=None):
+        """Return the model name to use, or raise ValueError if it is not allowed"""
+        if kind not in self._kinds:
+            raise ValueError(f"Unknown model kind '{kind}'")
+        spec = self._kinds[kind]
+        name = name or spec["default"]
+        if name not in spec["allowed"]:
+            raise ValueError(f"Model '{name}' is not allowed for {kind}; choose one of {', '.join(spec['allowed'])}")
+        return name
+
+    def allowed(self, kind):
+        return list(self._kinds[kind]["allowed"])
+
+    def _acquire(self, key):
+        """Mark a loaded model as in use; caller holds self._lock"""
+        entry = self._models.get(key)
+        if entry is not None:
+            self._models.move_to_end(key)
+            entry.last_used = time.time()
+            entry.in_use += 1
+        return entry
+
+    def _acquire_or_load(self, kind, name):
+        name = self.resolve(kind, name)
+        key = (kind, name)
+        with self._lock:
+            entry = self._acquire(key)
+            if entry is not None:
+                return key, entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and reuse it
+        with load_lock:
+            with self._lock:
+                entry = self._acquire(key)
+                if entry is not None:
+                    return key, entry
+
+            rss_before = rss_bytes()
+            started = time.perf_counter()
+            model = self._kinds[kind]["loader"](name)
+            load_seconds = time.perf_counter() - started
+            size = _parameter_bytes(model) or max(0, rss_bytes() - rss_before)
+
+            with self._lock:
+                entry = _Entry(model, size, load_seconds)
+                entry.in_use = 1
+                self._models[key] = entry
+                self._evict()
+        print(f"Loaded {kind} model '{name}' in {load_seconds:.1f}s (~{size // (1024 * 1024)} MB)")
+        return key, entry
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+            self._evict()
+
+    @contextmanager
+    def use(self, kind, name=None):
+        """Context manager yielding a loaded model that cannot be unloaded while in use"""
+        key, entry = self._acquire_or_load(kind, name)
+        try:
+            yield entry.model
+        finally:
+            self._release(key)
+
+    def get(self, kind, name=None):
+        """Return a loaded model (loading it if needed) without pinning it"""
+        key, entry = self._acquire_or_load(kind, name)
+        self._release(key)
+        return entry.model
+
+    def _evict(self):
+        """Unload idle models in LRU order until within budget; caller holds self._lock"""
+        if self.memory_budget_bytes <= 0:
+            return
+        total = sum(e.size for e in self._models.values())
+        evicted = 0
+        for key in list(self._models):
+            if total <= self.memory_budget_bytes:
+                break
+            entry = self._models[key]
+            if entry.in_use > 0 or len(self._models) == 1:
+                continue
+            del self._models[key]
+            total -= entry.size
+            evicted += 1
+            print(f"Unloaded idle {key[0]} model '{key[1]}' to stay within the model memory budget")
+        if evicted:
+            gc.collect()
+
+    def size_mb(self, kind, name=None):
+        """Memory of a model: measured if it is loaded here, estimated otherwise (0 if unknown)"""
+        name = name or self._kinds[kind]["default"]
+        with self._lock:
+            entry = self._models.get((kind, name))
+        if entry is not None and entry.size:
+            return entry.size / (1024 * 1024)
+        if kind == "whisper":
+            return WHISPER_MODEL_MB.get(name.split(".")[0].split("-")[0], 0)
+        return 0
+
+    def unload(self, kind, name=None):
+        """Drop a model if it is loaded and idle; returns True if it was unloaded"""
+        key = (kind, name or self._kinds[kind]["default"])
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or entry.in_use > 0:
+                return False
+            del self._models[key]
+        gc.collect()
+        return True
+
+    def warm_up(self, specs=MODEL_PRELOAD, background=True):
+        """Load models listed as "kind[:name],..." now, in a background thread by default"""
+        wanted = []
+        for spec in specs.split(",") if isinstance(specs, str) else specs:
+            spec = spec.strip()
+            if spec:
+                kind, _, name = spec.partition(":")
+                wanted.append((kind, name or None))
+
+        def load_all():
+            for kind, name in wanted:
+                try:
+                    self.get(kind, name)
+                except Exception as e:
+                    print(f"Could not preload {kind} model {name or ''}: {e}")
+
+        if not wanted:
+            return None
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            loaded = [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "memory_mb": round(e.size / (1024 * 1024), 1),
+                    "load_seconds": round(e.load_seconds, 2),
+                    "in_use": e.in_use,
+                    "idle_seconds": round(time.time() - e.last_used, 1)
+                }
+                for (kind, name), e in reversed(self._models.items())
+            ]
+        return {
+            "loaded": loaded,
+            "memory_mb": round(sum(m["memory_mb"] for m in loaded), 1),
+            "budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1),
+            "allowed": {kind: spec["allowed"] for kind, spec in self._kinds.items()}
+        }
+
+
+# Per-process registry used by the app and the job workers
+registry = ModelRegistry()
+registry.register("whisper", _load_whisper, WHISPER_MODEL, sorted(set(WHISPER_ALLOWED_MODELS) | {WHISPER_MODEL}))
+registry.register("summarizer", _load_summarizer, SUMMARIZER_MODEL)
+registry.register("spacy", _load_spacy, SPACY_MODEL)
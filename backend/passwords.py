@@ -0,0 +1,121 @@
+"""
+Password hashing off the request threads.
+
+bcrypt hashing and checking run on a small dedicated thread pool (bcrypt
+releases the GIL, so the pool uses up to PASSWORD_WORKERS cores). At most
+PASSWORD_MAX_PENDING operations may be queued or running; beyond that
+PasswordHasherBusy is raised so the API can answer 429 instead of piling up
+requests behind a login spike.
+
+BCRYPT_ROUNDS is the target work factor. needs_rehash() tells whether a
+stored hash uses a different cost, so it can be upgraded at the next login.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from metrics import STAGE_SECONDS
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 8)))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password operations are already pending"""
+
+
+def hash_cost(hashed):
+    """Work factor of a bcrypt hash ("$2b$12$..." -> 12), or None if it cannot be parsed"""
+    if isinstance(hashed, str):
+        hashed = hashed.encode("utf-8")
+    try:
+        return int(hashed.split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt hashpw / checkpw"""
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_WORKERS, max_pending=PASSWORD_MAX_PENDING):
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats = {"hashed": 0, "checked": 0, "rejected": 0, "rehashed": 0, "seconds": 0.0}
+
+    def _submit(self, kind, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise PasswordHasherBusy("Too many password operations in progress; retry shortly")
+
+        def run():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                STAGE_SECONDS.observe(elapsed, pipeline="auth", stage=kind)
+                with self._lock:
+                    self._stats[kind] += 1
+                    self._stats["seconds"] += elapsed
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def hash(self, password):
+        """bcrypt hash of a password at the target cost; raises PasswordHasherBusy when saturated"""
+        return self._submit("hashed", self._hashpw, password).result()
+
+    def verify(self, password, hashed):
+        """Check a password against a stored hash; raises PasswordHasherBusy when saturated"""
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return self._submit("checked", bcrypt.checkpw, password.encode("utf-8"), hashed).result()
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def rehash_later(self, password, on_done):
+        """Hash a password at the target cost in the background and pass the hash to on_done.
+
+        Skipped (returns False) when the pool is saturated; it is retried at the next login.
+        """
+        try:
+            future = self._submit("rehashed", self._hashpw, password)
+        except PasswordHasherBusy:
+            return False
+
+        def done(f):
+            try:
+                on_done(f.result())
+            except Exception as e:
+                print(f"Warning: could not upgrade password hash: {e}")
+
+        future.add_done_callback(done)
+        return True
+
+    def _hashpw(self, password):
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        operations = stats["hashed"] + stats["checked"] + stats["rehashed"]
+        seconds = stats.pop("seconds")
+        stats["avg_ms"] = round(seconds / operations * 1000, 2) if operations else 0.0
+        # BoundedSemaphore has no public counter; _value is the number of free slots
+        stats["pending"] = self.max_pending - self._slots._value
+        stats["max_pending"] = self.max_pending
+        stats["rounds"] = self.rounds
+        return stats
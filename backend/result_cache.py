@@ -0,0 +1,137 @@
+"""
+Content-addressed cache of transcription results.
+
+Entries are keyed by (audio hash, Whisper model, denoising method, VAD) and stored in
+a local SQLite database shared by the API and the job workers. The cache is
+bounded by the total size of the stored results; least recently used entries
+are evicted first. Hit/miss/eviction counters are kept alongside the entries.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+CACHE_DB = os.getenv("TRANSCRIPTION_CACHE_DB", os.path.join("uploads", "transcription_cache.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    audio_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    denoise TEXT NOT NULL,
+    transcription TEXT NOT NULL,
+    segments TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    last_access TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def make_key(audio_hash, model_name, denoise, vad=False):
+    """`denoise` is a denoising method name or None"""
+    return f"{audio_hash}:{model_name}:{denoise or 0}" + (":vad" if vad else "")
+
+
+class TranscriptionCache:
+    """Size-bounded LRU cache of transcription results"""
+
+    def __init__(self, path=CACHE_DB, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _incr(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def get(self, key, count=True):
+        """Return {"transcription", "segments"} for a key, or None; counts the hit or miss unless count=False
+
+        Re-checks of a key that was already looked up (e.g. by a job queued
+        after a miss) pass count=False so hit_rate counts each upload once.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT transcription, segments FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                if count:
+                    self._incr(conn, "misses")
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (_now(), key))
+            if count:
+                self._incr(conn, "hits")
+        return {"transcription": row["transcription"], "segments": json.loads(row["segments"])}
+
+    def put(self, key, audio_hash, model_name, denoise, transcription, segments):
+        """Store a result and evict least recently used entries beyond max_bytes"""
+        segments_json = json.dumps(segments)
+        size = len(transcription.encode("utf-8")) + len(segments_json)
+        now = _now()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(key, audio_hash, model, denoise, transcription, segments, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, audio_hash, model_name, denoise or "", transcription, segments_json, size, now, now)
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for row in conn.execute("SELECT key, size FROM results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM results WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            evicted += 1
+        self._incr(conn, "evictions", evicted)
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            counters = {row["name"]: row["value"] for row in conn.execute("SELECT name, value FROM counters")}
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
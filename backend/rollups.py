@@ -0,0 +1,179 @@
+"""
+Pre-aggregated analytics rollups.
+
+Every metric written through track_metric is also counted into per-minute,
+per-hour and per-day buckets, by metric type, both per user and across all
+users (user_id "*"). Each bucket keeps count, sum, min and max of the metric
+values, so dashboards read a few hundred small documents instead of every
+raw metric. Minute and hour buckets expire after ROLLUP_MINUTE_RETENTION_DAYS
+and ROLLUP_HOUR_RETENTION_DAYS (TTL index); day buckets are kept.
+
+Rebuild the rollups from the raw analytics metrics with:
+  python backend/rollups.py --rebuild [--backend mongo|sqlite]
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+ROLLUPS_COLLECTION = "analytics_rollups"
+ALL_USERS = "*"
+GRANULARITIES = ("minute", "hour", "day")
+RETENTION_DAYS = {
+    "minute": int(os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "7")),
+    "hour": int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "90")),
+    "day": None
+}
+
+
+def bucket_start(ts, granularity):
+    """Truncate a timestamp to the start of its bucket"""
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+
+def pick_granularity(start, end):
+    """Finest granularity that keeps a time range to a chartable number of points"""
+    span = end - start
+    if span <= timedelta(hours=6):
+        return "minute"
+    if span <= timedelta(days=14):
+        return "hour"
+    return "day"
+
+
+def compute_increments(metrics):
+    """Coalesce metrics into {(granularity, bucket, type, user_id): [count, sum, min, max]}"""
+    increments = {}
+    for metric in metrics:
+        value = metric.get("value") or 0
+        users = [ALL_USERS] + ([metric["user_id"]] if metric.get("user_id") else [])
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(metric["timestamp"], granularity)
+            for user_id in users:
+                key = (granularity, bucket, metric["type"], user_id)
+                current = increments.get(key)
+                if current is None:
+                    increments[key] = [1, value, value, value]
+                else:
+                    current[0] += 1
+                    current[1] += value
+                    current[2] = min(current[2], value)
+                    current[3] = max(current[3], value)
+    return increments
+
+
+class AnalyticsRollups:
+    """Incrementally maintained metric counters by time bucket, metric type and user"""
+
+    def __init__(self, db):
+        self.collection = db[ROLLUPS_COLLECTION]
+
+    def apply(self, metrics):
+        """Fold raw metric documents into the rollups (one bulk upsert per call)"""
+        from pymongo import UpdateOne
+        increments = compute_increments(metrics)
+        if not increments:
+            return 0
+
+        operations = []
+        for (granularity, bucket, metric_type, user_id), (count, total, low, high) in increments.items():
+            update = {
+                "$inc": {"count": count, "sum": total},
+                "$min": {"min": low},
+                "$max": {"max": high}
+            }
+            if RETENTION_DAYS[granularity]:
+                update["$setOnInsert"] = {"expires_at": bucket + timedelta(days=RETENTION_DAYS[granularity])}
+            operations.append(UpdateOne(
+                {"granularity": granularity, "type": metric_type, "user_id": user_id, "bucket": bucket},
+                update,
+                upsert=True
+            ))
+        self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def query(self, start, end, granularity, types=None, user_id=ALL_USERS):
+        """Time series per metric type: {type: [{bucket, count, sum, min, max}, ...]}"""
+        query = {
+            "granularity": granularity,
+            "user_id": user_id,
+            "bucket": {"$gte": bucket_start(start, granularity), "$lt": end}
+        }
+        if types:
+            query["type"] = {"$in": list(types)}
+        series = {}
+        projection = {"_id": 0, "type": 1, "bucket": 1, "count": 1, "sum": 1, "min": 1, "max": 1}
+        for doc in self.collection.find(query, projection).sort("bucket", 1):
+            series.setdefault(doc.pop("type"), []).append(doc)
+        return series
+
+    def totals(self, start=None, end=None, types=None, user_id=ALL_USERS):
+        """{type: {count, sum}} over a range, from day buckets (all time when start is None)"""
+        match = {"granularity": "day", "user_id": user_id}
+        if start or end:
+            match["bucket"] = {}
+            if start:
+                match["bucket"]["$gte"] = bucket_start(start, "day")
+            if end:
+                match["bucket"]["$lt"] = end
+        if types:
+            match["type"] = {"$in": list(types)}
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$type", "count": {"$sum": "$count"}, "sum": {"$sum": "$sum"}}}
+        ]
+        return {row["_id"]: {"count": row["count"], "sum": row["sum"]} for row in self.collection.aggregate(pipeline)}
+
+    def top_users(self, metric_type, start=None, end=None, limit=10):
+        """Users with the most events of a metric type, from day buckets"""
+        match = {"granularity": "day", "type": metric_type, "user_id": {"$ne": ALL_USERS}}
+        if start or end:
+            match["bucket"] = {}
+            if start:
+                match["bucket"]["$gte"] = bucket_start(start, "day")
+            if end:
+                match["bucket"]["$lt"] = end
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$user_id", "count": {"$sum": "$count"}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def rebuild(self, raw_collection, batch_size=5000):
+        """Recompute all rollups from raw metric documents; returns the number of metrics read"""
+        self.collection.delete_many({})
+        batch = []
+        count = 0
+        for metric in raw_collection.find({}, {"_id": 0}).batch_size(batch_size):
+            batch.append(metric)
+            if len(batch) >= batch_size:
+                self.apply(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.apply(batch)
+            count += len(batch)
+        return count
+
+
+if __name__ == "__main__":
+    from storage import STORAGE_BACKEND, STORAGE_BACKENDS, open_storage
+
+    parser = argparse.ArgumentParser(description="Manage MinuteMinds analytics rollups")
+    parser.add_argument("--backend", default=STORAGE_BACKEND, choices=STORAGE_BACKENDS, help="Storage backend")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute rollups from the raw analytics metrics")
+    args = parser.parse_args()
+
+    storage = open_storage(args.backend)
+    if args.rebuild:
+        started = datetime.utcnow()
+        read = storage.analytics.rebuild_rollups()
+        print(f"Rebuilt rollups from {read} metrics in {(datetime.utcnow() - started).total_seconds():.1f}s")
+    print(storage.analytics.totals())
@@ -0,0 +1,93 @@
+"""
+HTTP routes, one blueprint per feature area (registered by app.create_app):
+
+  auth            /register, /login, /verify-token
+  transcribe      /transcribe, /jobs/<id>
+  stream          /transcribe/stream (WebSocket)
+  transcriptions  lists, search, export, summaries, key items, translation
+  admin           /admin/*
+  system          /, /health, /metrics
+
+The blueprints share the process-wide services in services.py. Views that
+need numpy or the ML models import them when they run, so importing the
+blueprints stays cheap (see the startup case in benchmarks/run.py).
+"""
+from functools import wraps
+
+import jwt
+from flask import current_app, jsonify, request
+
+from services import user_cache
+
+
+def register_blueprints(app):
+    from routes import admin, auth, stream, system, transcribe, transcriptions
+    for module in (auth, transcribe, stream, transcriptions, admin, system):
+        app.register_blueprint(module.bp)
+
+
+# ===========================
+# AUTHENTICATION MIDDLEWARE
+# ===========================
+
+def token_required(f):
+    """Decorator to protect routes that require authentication"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = None
+
+        # Check for token in headers
+        if 'Authorization' in request.headers:
+            auth_header = request.headers['Authorization']
+            try:
+                token = auth_header.split(" ")[1]
+            except IndexError:
+                return jsonify({"error": "Invalid token format"}), 401
+
+        if not token:
+            return jsonify({"error": "Token is missing"}), 401
+
+        try:
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            current_user_id = data['user_id']
+        except jwt.ExpiredSignatureError:
+            return jsonify({"error": "Token has expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+
+        return f(current_user_id, *args, **kwargs)
+
+    return decorated
+
+def admin_required(f):
+    """Decorator to check if user is admin"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = None
+
+        if 'Authorization' in request.headers:
+            auth_header = request.headers['Authorization']
+            try:
+                token = auth_header.split(" ")[1]
+            except IndexError:
+                return jsonify({"error": "Invalid token format"}), 401
+
+        if not token:
+            return jsonify({"error": "Token is missing"}), 401
+
+        try:
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            current_user_id = data['user_id']
+
+            # Check if user is admin (cached; see user_cache.py)
+            if user_cache.role(data) != "admin":
+                return jsonify({"error": "Admin access required"}), 403
+
+        except jwt.ExpiredSignatureError:
+            return jsonify({"error": "Token has expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+
+        return f(current_user_id, *args, **kwargs)
+
+    return decorated
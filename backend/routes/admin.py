@@ -0,0 +1,231 @@
+"""
+Admin dashboard: users and roles, logs, analytics and service counters (admin only).
+"""
+from datetime import datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+
+from models import registry as model_registry
+from rollups import ALL_USERS, GRANULARITIES, pick_granularity
+from routes import admin_required
+from services import (export_engine, event_pipeline, job_queue, log_action, password_hasher, storage,
+                      transcription_cache, translator, user_cache)
+from summarization import engine as summarization_engine
+
+bp = Blueprint("admin", __name__)
+
+
+# ===========================
+# ADMIN ROUTES (NEW FEATURES - AD-11, AD-12, Sprint 2 #3)
+# ===========================
+
+@bp.route("/admin/users", methods=["GET"])
+@admin_required
+def get_all_users(current_user_id):
+    """Get all users (admin only)"""
+    users = storage.users.list()
+    
+    for u in users:
+        u['created_at'] = u['created_at'].isoformat()
+    
+    log_action("admin_view_users", current_user_id)
+    
+    return jsonify({"users": users}), 200
+
+
+@bp.route("/admin/users/<user_id>", methods=["DELETE"])
+@admin_required
+def delete_user(current_user_id, user_id):
+    """Delete a user (admin only)"""
+    try:
+        if user_id == str(current_user_id):
+            return jsonify({"error": "Cannot delete yourself"}), 400
+        
+        if not storage.users.delete(user_id):
+            return jsonify({"error": "User not found"}), 404
+        
+        user_cache.invalidate(user_id)
+        log_action("admin_delete_user", current_user_id, {"deleted_user_id": user_id})
+        
+        return jsonify({"message": "User deleted successfully"}), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/admin/users/<user_id>/role", methods=["PUT"])
+@admin_required
+def update_user_role(current_user_id, user_id):
+    """Change a user's role (admin only)"""
+    try:
+        role = (request.get_json(silent=True) or {}).get("role", "").lower()
+        if role not in ["user", "admin"]:
+            return jsonify({"error": "Role must be 'user' or 'admin'"}), 400
+        
+        if user_id == str(current_user_id):
+            return jsonify({"error": "Cannot change your own role"}), 400
+        
+        if not storage.users.update(user_id, {"role": role}):
+            return jsonify({"error": "User not found"}), 404
+        
+        # Also stops trusting role claims in this user's existing tokens
+        user_cache.invalidate(user_id)
+        log_action("admin_update_role", current_user_id, {"user_id": user_id, "role": role})
+        
+        return jsonify({"message": "Role updated successfully", "role": role}), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/admin/logs", methods=["GET"])
+@admin_required
+def get_logs(current_user_id):
+    """Get system logs (admin only)"""
+    limit = int(request.args.get("limit", 100))
+    action_filter = request.args.get("action", None)
+    
+    logs = storage.logs.recent(limit, action_filter)
+    
+    for log in logs:
+        log['timestamp'] = log['timestamp'].isoformat()
+    
+    log_action("admin_view_logs", current_user_id)
+    
+    return jsonify({"logs": logs}), 200
+
+
+@bp.route("/admin/cache", methods=["GET"])
+@admin_required
+def get_cache_stats(current_user_id):
+    """Get transcription cache size and hit/miss counters (admin only)"""
+    return jsonify({"transcription_cache": transcription_cache.stats()}), 200
+
+
+@bp.route("/admin/indexes", methods=["GET"])
+@admin_required
+def get_index_diagnostics(current_user_id):
+    """Explain the hot queries and report index usage and missing indexes (admin only)"""
+    diagnostics = storage.diagnostics()
+    queries = diagnostics["queries"]
+    return jsonify({
+        "backend": storage.name,
+        "queries": queries,
+        "usage": diagnostics["usage"],
+        "warnings": [f"{q['query']}: {q['warning']}" for q in queries if q.get("warning")]
+    }), 200
+
+
+@bp.route("/admin/auth-cache", methods=["GET"])
+@admin_required
+def get_auth_cache_stats(current_user_id):
+    """Get user cache size and hit rate (admin only)"""
+    return jsonify({"user_cache": user_cache.stats()}), 200
+
+
+@bp.route("/admin/passwords", methods=["GET"])
+@admin_required
+def get_password_stats(current_user_id):
+    """Get password hashing pool counters (admin only)"""
+    return jsonify({"passwords": password_hasher.stats()}), 200
+
+
+@bp.route("/admin/exports", methods=["GET"])
+@admin_required
+def get_export_stats(current_user_id):
+    """Get export cache size and hit rate (admin only)"""
+    return jsonify({"exports": export_engine.stats()}), 200
+
+
+@bp.route("/admin/translation", methods=["GET"])
+@admin_required
+def get_translation_stats(current_user_id):
+    """Get translation client counters: requests, errors, cache hit rate, latency (admin only)"""
+    return jsonify({"translation": translator.stats()}), 200
+
+
+@bp.route("/admin/events", methods=["GET"])
+@admin_required
+def get_event_stats(current_user_id):
+    """Get audit log / metrics pipeline counters: queue depth, drops, flush latency (admin only)"""
+    return jsonify({"events": event_pipeline.stats()}), 200
+
+
+@bp.route("/admin/key-items/backfill", methods=["POST"])
+@admin_required
+def backfill_key_items(current_user_id):
+    """Queue a job that extracts key items across all transcriptions (admin only)
+
+    JSON body (all optional): only_missing (default true), n_process, batch_docs.
+    Progress is available from /jobs/<job_id>.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        payload = {
+            "only_missing": bool(data.get("only_missing", True)),
+            "n_process": int(data["n_process"]) if data.get("n_process") else None,
+            "batch_docs": int(data["batch_docs"]) if data.get("batch_docs") else None
+        }
+    except (TypeError, ValueError):
+        return jsonify({"error": "n_process and batch_docs must be integers"}), 400
+
+    job_id = job_queue.enqueue("backfill_key_items", payload, user_id=current_user_id)
+    log_action("admin_backfill_key_items", current_user_id, dict(payload, job_id=job_id))
+
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+
+@bp.route("/admin/models", methods=["GET"])
+@admin_required
+def get_model_stats(current_user_id):
+    """Get models loaded in this API process, the model memory budget and summarization throughput (admin only)"""
+    return jsonify(dict(model_registry.stats(), summarization=summarization_engine.stats())), 200
+
+
+@bp.route("/admin/analytics", methods=["GET"])
+@admin_required
+def get_analytics(current_user_id):
+    """Get system analytics from the pre-aggregated rollups (admin only)
+
+    Query parameters (all optional): start / end (ISO timestamps, default the
+    last 7 days), granularity (minute, hour or day; picked from the range when
+    omitted), types (comma-separated metric types), user_id.
+    """
+    try:
+        end = datetime.fromisoformat(request.args["end"]) if request.args.get("end") else datetime.utcnow()
+        start = datetime.fromisoformat(request.args["start"]) if request.args.get("start") else end - timedelta(days=7)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 timestamps"}), 400
+    if start >= end:
+        return jsonify({"error": "start must be before end"}), 400
+    
+    granularity = request.args.get("granularity") or pick_granularity(start, end)
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    types = [t for t in request.args.get("types", "").split(",") if t] or None
+    user_id = request.args.get("user_id") or ALL_USERS
+    
+    try:
+        total_users = storage.users.count()
+        total_transcriptions = storage.transcriptions.count()
+        all_time = storage.analytics.totals(types=["login_count"])
+        
+        series = storage.analytics.series(start, end, granularity, types=types, user_id=user_id)
+        for points in series.values():
+            for point in points:
+                point['bucket'] = point['bucket'].isoformat()
+        
+        log_action("admin_view_analytics", current_user_id)
+        
+        return jsonify({
+            "total_users": total_users,
+            "total_transcriptions": total_transcriptions,
+            "total_logins": all_time.get("login_count", {}).get("count", 0),
+            "top_users": storage.analytics.top_users("transcription_count", start, end),
+            "range": {"start": start.isoformat(), "end": end.isoformat(), "granularity": granularity},
+            "totals": storage.analytics.totals(start, end, types=types, user_id=user_id),
+            "series": series
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
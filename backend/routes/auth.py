@@ -0,0 +1,167 @@
+"""
+Registration, login and token checks.
+"""
+from datetime import datetime, timedelta
+
+import jwt
+from flask import Blueprint, current_app, jsonify, request
+
+from passwords import PasswordHasherBusy
+from services import password_hasher, storage, track_metric, user_cache
+from storage import DuplicateEmail
+
+bp = Blueprint("auth", __name__)
+
+
+def password_busy_response():
+    response = jsonify({"error": "Server is busy, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 429
+
+
+# ===========================
+# AUTH ENDPOINTS
+# ===========================
+
+@bp.route("/register", methods=["POST"])
+def register():
+    """Register a new user"""
+    data = request.get_json()
+    
+    # Validation
+    if not data or not data.get("email") or not data.get("password") or not data.get("name"):
+        return jsonify({"error": "Email, name, and password are required"}), 400
+    
+    email = data.get("email").lower()
+    password = data.get("password")
+    name = data.get("name")
+    role = data.get("role", "user").lower()  # Default to "user", allow "admin"
+    
+    # Validate role
+    if role not in ["user", "admin"]:
+        return jsonify({"error": "Role must be 'user' or 'admin'"}), 400
+    
+    # Check if user already exists
+    if storage.users.find_by_email(email):
+        return jsonify({"error": "Email already registered"}), 409
+    
+    # Validate password length
+    if len(password) < 6:
+        return jsonify({"error": "Password must be at least 6 characters"}), 400
+    
+    # Hash password
+    try:
+        hashed_password = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return password_busy_response()
+    
+    # Create user
+    user = {
+        "name": name,
+        "email": email,
+        "password": hashed_password,
+        "role": role,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    
+    try:
+        user_id = storage.users.create(user)
+    except DuplicateEmail:
+        # Registered concurrently since the check above
+        return jsonify({"error": "Email already registered"}), 409
+
+    return jsonify({
+        "message": "User registered successfully",
+        "user_id": str(user_id)
+    }), 201
+
+
+@bp.route("/login", methods=["POST"])
+def login():
+    """Login user and return JWT token"""
+    data = request.get_json()
+    
+    if not data or not data.get("email") or not data.get("password"):
+        return jsonify({"error": "Email and password are required"}), 400
+    
+    email = data.get("email").lower()
+    password = data.get("password")
+    
+    # Find user
+    user = storage.users.find_by_email(email)
+    if not user:
+        return jsonify({"error": "Invalid email or password"}), 401
+
+    # Check password (str hashes are converted by the hasher)
+    stored_pw = user.get('password')
+    try:
+        if not password_hasher.verify(password, stored_pw):
+            return jsonify({"error": "Invalid email or password"}), 401
+    except PasswordHasherBusy:
+        return password_busy_response()
+
+    # Upgrade hashes made with a different BCRYPT_ROUNDS, in the background
+    if password_hasher.needs_rehash(stored_pw):
+        password_hasher.rehash_later(password, lambda new_hash, user=user: save_password_hash(user, new_hash))
+    
+    track_metric("login_count", 1, str(user['_id']))
+    
+    # Generate JWT token (include role for frontend to read)
+    token = jwt.encode({
+        'user_id': str(user['_id']),
+        'email': user['email'],
+        'role': user.get('role', 'user'),
+        'iat': datetime.utcnow(),
+        'exp': datetime.utcnow() + timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm='HS256')
+    
+    return jsonify({
+        "message": "Login successful",
+        "token": token,
+        "user": {
+            "id": str(user['_id']),
+            "name": user['name'],
+            "email": user['email'],
+            "role": user.get('role', 'user')
+        }
+    }), 200
+
+
+def save_password_hash(user, new_hash):
+    """Store an upgraded password hash"""
+    storage.users.update(user["_id"], {"password": new_hash, "updated_at": datetime.utcnow()})
+
+
+@bp.route("/verify-token", methods=["POST"])
+def verify_token():
+    """Verify if a token is valid"""
+    data = request.get_json()
+    token = data.get("token")
+    
+    if not token:
+        return jsonify({"error": "Token is required"}), 400
+    
+    try:
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        user_id = data['user_id']
+
+        # Fetch user record to include role and name (cached)
+        user = user_cache.get(user_id)
+
+        if user:
+            user_info = {
+                "id": user_id,
+                "email": data.get('email'),
+                "name": user.get('name') or user.get('full_name') or '',
+                "role": user.get('role', 'user')
+            }
+        else:
+            user_info = {"id": user_id, "email": data.get('email'), "role": 'user'}
+
+        return jsonify({
+            "valid": True,
+            "user": user_info
+        }), 200
+    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+        return jsonify({"valid": False, "error": "Invalid or expired token"}), 401
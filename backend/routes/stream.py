@@ -0,0 +1,215 @@
+"""
+Live transcription over a WebSocket (see streaming.py).
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import jwt
+from flask import Blueprint, current_app, request
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+
+from metrics import STAGE_SECONDS, Gauge
+from models import registry as model_registry
+from services import log_action, storage, track_metric
+from transcription import index_transcription, make_preview
+
+bp = Blueprint("stream", __name__)
+# WebSocket routes are registered on the blueprint; Sock needs no app
+sock = Sock()
+
+STREAM_START_TIMEOUT = float(os.getenv("STREAM_START_TIMEOUT", "10"))
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "60"))
+
+STREAMS_ACTIVE = Gauge("live_streams_active", "Live transcription streams being served")
+
+# Each live stream holds a serving thread and runs Whisper in this process,
+# not in the job workers (STREAM_MAX_SESSIONS slots, created by the first stream)
+_stream_slots = None
+_stream_slots_lock = threading.Lock()
+
+
+def stream_slots():
+    global _stream_slots
+    with _stream_slots_lock:
+        if _stream_slots is None:
+            from streaming import STREAM_MAX_SESSIONS
+            _stream_slots = threading.BoundedSemaphore(STREAM_MAX_SESSIONS)
+        return _stream_slots
+
+
+def _send_event(ws, event):
+    ws.send(json.dumps(event))
+
+
+def _control_message(message):
+    """Type of a JSON text message ("start", "stop", ...), or None"""
+    try:
+        return json.loads(message).get("type")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _reject(ws, error, code):
+    _send_event(ws, {"type": "error", "error": error})
+    ws.close(code)
+
+
+def _authenticate(ws):
+    """User id from the token, or None after rejecting the stream"""
+    token = request.args.get("token") or request.headers.get("Authorization", "").partition(" ")[2]
+    try:
+        return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])['user_id']
+    except jwt.InvalidTokenError:
+        _reject(ws, "Invalid or missing token", 1008)
+        return None
+
+
+def _open_session(ws):
+    """Read the start message; returns (StreamingTranscriber, settings), or None after rejecting the stream"""
+    # numpy-based; imported by the first stream, not at startup
+    from denoise import resolve_method
+    from streaming import STREAM_MAX_SESSIONS, StreamingTranscriber
+
+    if STREAM_MAX_SESSIONS < 1:
+        _reject(ws, "Live transcription is disabled on this server", 1008)
+        return None
+
+    try:
+        start = json.loads(ws.receive(timeout=STREAM_START_TIMEOUT) or "{}")
+        if not isinstance(start, dict) or start.get("type") != "start":
+            raise ValueError("The first message must be a start message")
+        whisper_model = model_registry.resolve("whisper", start.get("model"))
+        denoise = resolve_method(start.get("denoise"))
+
+        def transcribe(samples, prompt):
+            with STAGE_SECONDS.time(pipeline="stream", stage="transcribe"):
+                with model_registry.use("whisper", whisper_model) as model:
+                    return model.transcribe(samples, initial_prompt=prompt)
+
+        session = StreamingTranscriber(
+            transcribe,
+            sample_rate=int(start.get("sample_rate", 16000)),
+            encoding=start.get("encoding", "pcm_s16le"),
+            denoise=denoise
+        )
+    except (ValueError, TypeError) as e:
+        _reject(ws, str(e), 1003)
+        return None
+
+    settings = {
+        "filename": start.get("filename") or f"Live meeting {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
+        "model": whisper_model,
+        "denoise": denoise
+    }
+    return session, settings
+
+
+def _drain(ws, session, message):
+    """Feed `message` and everything queued up behind it; returns True on a stop message"""
+    while message is not None:
+        if isinstance(message, bytes):
+            session.feed(message)
+        elif _control_message(message) == "stop":
+            return True
+        message = ws.receive(timeout=0)
+    return False
+
+
+def _pump(ws, session):
+    """Feed frames to the session and send its events until stop, idle timeout or disconnect"""
+    try:
+        while True:
+            message = ws.receive(timeout=STREAM_IDLE_TIMEOUT)
+            # Take everything that queued up while Whisper was busy, then run one pass
+            if message is None or _drain(ws, session, message):
+                break
+            for event in session.step():
+                _send_event(ws, event)
+    except ConnectionClosed:
+        # The client went away; what it sent is still transcribed and saved
+        pass
+    except Exception as e:
+        print(f"Warning: live transcription failed: {e}")
+        try:
+            _send_event(ws, {"type": "error", "error": str(e)})
+        except ConnectionClosed:
+            pass
+
+
+def _save_stream(current_user_id, session, settings):
+    """Store the finished stream as a transcription; returns its id, or None when nothing was said"""
+    if not session.segments:
+        return None
+    doc = {
+        "user_id": str(current_user_id),
+        "filename": settings["filename"],
+        "transcription": session.text,
+        "segments": session.segments,
+        "preview": make_preview(session.text),
+        "created_at": datetime.utcnow(),
+        "summary": None,
+        "key_items": None,
+        "model": settings["model"],
+        "source": "stream",
+        "duration_seconds": round(session.duration, 3),
+        "denoise": settings["denoise"],
+        "timings": {stage: round(seconds, 3) for stage, seconds in session.timings.items()}
+    }
+    transcription_id = storage.transcriptions.create(doc)
+    index_transcription(transcription_id, doc)
+    log_action("transcription_created", current_user_id, {"filename": settings["filename"], "source": "stream"})
+    track_metric("transcription_count", 1, str(current_user_id))
+    return transcription_id
+
+
+@sock.route("/transcribe/stream", bp=bp)
+def transcribe_stream(ws):
+    """Live transcription: PCM frames in, partial and final segments out, saved when the stream ends
+
+    The token comes in the `token` query parameter (browsers cannot set
+    headers on WebSocket requests) or an Authorization header. See
+    API_DOCUMENTATION.md for the message protocol.
+    """
+    current_user_id = _authenticate(ws)
+    if current_user_id is None:
+        return
+    opened = _open_session(ws)
+    if opened is None:
+        return
+    session, settings = opened
+
+    slots = stream_slots()
+    if not slots.acquire(blocking=False):
+        _reject(ws, "Too many live streams; try again later", 1013)
+        return
+
+    log_action("stream_started", current_user_id, {"filename": settings["filename"]})
+    STREAMS_ACTIVE.inc()
+    try:
+        _send_event(ws, {"type": "ready"})
+        _pump(ws, session)
+
+        try:
+            events = session.finish()
+        except Exception as e:
+            print(f"Warning: could not transcribe the end of a live stream: {e}")
+            events = [{"type": "error", "error": str(e)}]
+
+        transcription_id = _save_stream(current_user_id, session, settings)
+        try:
+            for event in events:
+                _send_event(ws, event)
+            _send_event(ws, {
+                "type": "done",
+                "transcription_id": transcription_id,
+                "transcription": session.text,
+                "segments": session.segments
+            })
+        except ConnectionClosed:
+            pass
+    finally:
+        STREAMS_ACTIVE.dec()
+        slots.release()
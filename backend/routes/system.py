@@ -0,0 +1,54 @@
+"""
+Liveness and readiness checks, and the Prometheus metrics.
+"""
+import os
+
+from flask import Blueprint, Response, jsonify, request
+
+import metrics
+from services import storage
+
+bp = Blueprint("system", __name__)
+
+# Bearer token required by GET /metrics; empty leaves it open (keep it off the public network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus text exposition of the metrics of every serving and job process"""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Invalid metrics token"}), 401
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# ===========================
+# HEALTH CHECK
+# ===========================
+@bp.route("/", methods=["GET"])
+def home():
+    """Liveness: answers as soon as the process serves requests, whatever the database does"""
+    return jsonify({
+        "message": "MinuteMinds backend is running!",
+        "features": [
+            "User Registration & Login",
+            "Audio Transcription with Noise Filtering",
+            "Background Transcription Jobs",
+            "Live Transcription over WebSocket",
+            "Automatic Summarization",
+            "Keyword Search",
+            "PDF/DOCX Export",
+            "Admin Dashboard",
+            "System Logs",
+            "Analytics"
+        ],
+        "version": "2.0"
+    }), 200
+
+
+@bp.route("/health", methods=["GET"])
+def health():
+    """Readiness: 200 when the storage backend answers, 503 while MongoDB is starting or unreachable"""
+    storage_health = storage.health()
+    ready = storage_health["status"] == "ok"
+    return jsonify({"status": storage_health["status"], "storage": storage_health}), 200 if ready else 503
@@ -0,0 +1,353 @@
+"""
+Audio uploads (single request or resumable, in chunks) and the transcription jobs they queue.
+"""
+import os
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+
+from metrics import STAGE_SECONDS
+from models import registry as model_registry
+from result_cache import make_key
+from routes import token_required
+from services import (UPLOAD_FOLDER, job_queue, log_action, request_id, storage, track_metric,
+                      transcription_cache, upload_sessions)
+from transcription import index_transcription, make_preview
+from upload_sessions import (ASSEMBLING, COMPLETE, OPEN, STORED, UploadConflict, UploadIncomplete,
+                             UploadLimitReached)
+from uploads import save_stream, save_upload
+
+bp = Blueprint("transcribe", __name__)
+
+TRANSCRIBE_CHUNKED = os.getenv("TRANSCRIBE_CHUNKED", "false")
+
+
+# ===========================
+# TRANSCRIBE AUDIO (PROTECTED) - WITH NOISE FILTERING
+# ===========================
+def _transcription_options(options):
+    """Validate the transcription options of an upload; raises ValueError"""
+    # numpy-based; imported by the first upload, not at startup
+    from denoise import resolve_method
+    from vad import VAD_ENABLED
+
+    # Chunked mode splits long audio at silence and transcribes chunks in parallel
+    chunked = str(options.get("chunked", TRANSCRIBE_CHUNKED)).lower() == "true"
+    # Voice activity detection: transcribe only the speech, skipping silence
+    vad = str(options.get("vad", VAD_ENABLED)).lower() == "true"
+
+    try:
+        chunk_seconds = float(options["chunk_seconds"]) if options.get("chunk_seconds") else None
+        parallelism = int(options["parallelism"]) if options.get("parallelism") else None
+    except (TypeError, ValueError):
+        raise ValueError("chunk_seconds and parallelism must be numbers")
+
+    if (chunk_seconds is not None and chunk_seconds < 10) or (parallelism is not None and parallelism < 1):
+        raise ValueError("chunk_seconds must be at least 10 and parallelism at least 1")
+
+    return {
+        "chunked": chunked,
+        "vad": vad,
+        "chunk_seconds": chunk_seconds,
+        "parallelism": parallelism,
+        # "true" selects DENOISE_METHOD; "gate" or "stationary" pick one
+        "denoise": resolve_method(options.get("denoise")),
+        # Whisper size, limited to WHISPER_ALLOWED_MODELS
+        "model": model_registry.resolve("whisper", options.get("model"))
+    }
+
+
+def _queue_transcription(current_user_id, filename, audio_hash, filepath, settings):
+    """Answer from the result cache or queue a transcription job for a stored upload; returns (body, status)"""
+    try:
+        cache_key = make_key(audio_hash, settings["model"], settings["denoise"], settings["vad"])
+
+        # Same recording already transcribed with the same settings: reuse the result
+        cached = transcription_cache.get(cache_key)
+        if cached:
+            doc = {
+                "user_id": str(current_user_id),
+                "filename": filename,
+                "transcription": cached["transcription"],
+                "segments": cached["segments"],
+                "preview": make_preview(cached["transcription"]),
+                "created_at": datetime.utcnow(),
+                "summary": None,
+                "key_items": None,
+                "model": settings["model"],
+                "audio_hash": audio_hash,
+                "cache_key": cache_key,
+                "denoise": settings["denoise"],
+                "vad": settings["vad"],
+                "timings": {},
+                "speech": {}
+            }
+            transcription_id = storage.transcriptions.create(doc)
+            index_transcription(transcription_id, doc)
+
+            log_action("transcription_created", current_user_id, {"filename": filename, "cached": True})
+            track_metric("transcription_count", 1, str(current_user_id))
+
+            return {
+                "transcription_id": transcription_id,
+                "transcription": cached["transcription"],
+                "segments": cached["segments"],
+                "cached": True
+            }, 200
+
+        job_id = job_queue.enqueue("transcribe", {
+            "user_id": str(current_user_id),
+            "filename": filename,
+            "filepath": filepath,
+            "audio_hash": audio_hash,
+            "cache_key": cache_key,
+            "request_id": request_id(),
+            **settings
+        }, user_id=current_user_id)
+
+        log_action("transcription_queued", current_user_id, {"filename": filename, "job_id": job_id})
+
+        return {
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }, 202
+
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+
+@bp.route("/transcribe", methods=["POST"])
+@token_required
+def transcribe_audio(current_user_id):
+    """Queue an audio file for transcription with optional noise filtering (requires authentication)
+
+    Accepts a multipart upload in `file`, or the raw audio as the request body
+    (Content-Type audio/* or application/octet-stream, filename in X-Filename
+    and options in the query string). Either way the file is streamed to disk.
+    Large recordings can be sent in resumable chunks instead (see /uploads).
+    """
+    raw_upload = request.mimetype.startswith("audio/") or request.mimetype == "application/octet-stream"
+    if raw_upload:
+        audio_file = None
+        filename = request.headers.get("X-Filename") or request.args.get("filename", "")
+    elif "file" in request.files:
+        audio_file = request.files["file"]
+        filename = audio_file.filename
+    else:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    if filename == "":
+        return jsonify({"error": "Empty file"}), 400
+
+    try:
+        settings = _transcription_options(request.values)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Oversized bodies raise 413 here (see handle_upload_too_large)
+    with STAGE_SECONDS.time(pipeline="transcribe", stage="upload"):
+        if raw_upload:
+            audio_hash, filepath = save_stream(request.stream, filename, UPLOAD_FOLDER)
+        else:
+            audio_hash, filepath = save_upload(audio_file, UPLOAD_FOLDER)
+
+    body, status = _queue_transcription(current_user_id, filename, audio_hash, filepath, settings)
+    return jsonify(body), status
+
+
+@bp.app_errorhandler(413)
+def handle_upload_too_large(e):
+    return jsonify({"error": f"File too large (limit is {current_app.config['MAX_CONTENT_LENGTH']} bytes)"}), 413
+
+
+# ===========================
+# RESUMABLE UPLOADS (PROTECTED) - see upload_sessions.py
+# ===========================
+def _upload_response(session):
+    received = session["received"]
+    response = {
+        "upload_id": session["id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "chunk_size": session["chunk_size"],
+        "chunks": session["chunks"],
+        "status": session["status"],
+        "received": len(received),
+        "expires_at": session["expires_at"],
+        "upload_url": f"/uploads/{session['id']}"
+    }
+    if session["status"] == OPEN:
+        received = set(received)
+        response["missing"] = [i for i in range(session["chunks"]) if i not in received]
+    return response
+
+
+@bp.route("/uploads", methods=["POST"])
+@token_required
+def create_upload(current_user_id):
+    """Start a resumable upload: {filename, size, chunk_size?, options?}"""
+    data = request.get_json(silent=True) or {}
+    options = data.get("options") or {}
+    if not isinstance(options, dict):
+        return jsonify({"error": "options must be an object"}), 400
+
+    # Checked now so that a bad option does not surface after the whole upload
+    try:
+        _transcription_options(options)
+        session = upload_sessions.create(current_user_id, data.get("filename"), data.get("size"),
+                                         data.get("chunk_size"), options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UploadLimitReached as e:
+        return jsonify({"error": str(e)}), 429
+
+    log_action("upload_started", current_user_id, {
+        "upload_id": session["id"], "filename": session["filename"], "size": session["size"]
+    })
+    return jsonify(_upload_response(session)), 201
+
+
+@bp.route("/uploads/<upload_id>", methods=["GET"])
+@token_required
+def get_upload(current_user_id, upload_id):
+    """Which chunks of a resumable upload have arrived (and its result once completed)"""
+    session = upload_sessions.get(upload_id, current_user_id)
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+    response = _upload_response(session)
+    if session["status"] == COMPLETE:
+        response["result"] = session["result"]["body"]
+    return jsonify(response), 200
+
+
+@bp.route("/uploads/<upload_id>/chunks/<int:index>", methods=["PUT"])
+@token_required
+def put_upload_chunk(current_user_id, upload_id, index):
+    """Store chunk `index` (raw body, optionally checked against X-Chunk-SHA256)"""
+    session = upload_sessions.get(upload_id, current_user_id)
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+
+    try:
+        with STAGE_SECONDS.time(pipeline="upload", stage="chunk"):
+            digest = upload_sessions.put(session, index, request.stream, request.headers.get("X-Chunk-SHA256"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UploadConflict as e:
+        return jsonify({"error": str(e)}), 409
+
+    return jsonify({"upload_id": upload_id, "index": index, "sha256": digest}), 200
+
+
+@bp.route("/uploads/<upload_id>/complete", methods=["POST"])
+@token_required
+def complete_upload(current_user_id, upload_id):
+    """Assemble a resumable upload and queue its transcription, like /transcribe"""
+    session = upload_sessions.get(upload_id, current_user_id)
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+    # A repeated completion gets the answer of the first one
+    if session["status"] == COMPLETE:
+        return jsonify(session["result"]["body"]), session["result"]["status_code"]
+
+    data = request.get_json(silent=True) or {}
+    try:
+        if session["status"] == STORED:
+            # Stored by an earlier completion whose queueing failed
+            audio_hash, filepath = upload_sessions.resume(session)
+        else:
+            # The session is open again if this fails, so complete can be retried
+            with STAGE_SECONDS.time(pipeline="upload", stage="assemble"):
+                audio_hash, filepath = upload_sessions.complete(session, UPLOAD_FOLDER, data.get("sha256"))
+    except UploadIncomplete as e:
+        return jsonify({"error": str(e), "missing": e.missing}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UploadConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": f"Could not store the upload: {e}"}), 500
+
+    try:
+        settings = _transcription_options(session["options"])
+    except ValueError as e:
+        # Options were valid at creation; only a configuration change gets here
+        body, status = {"error": str(e)}, 400
+    else:
+        body, status = _queue_transcription(current_user_id, session["filename"], audio_hash, filepath, settings)
+    if 200 <= status < 300:
+        upload_sessions.finish(upload_id, body, status)
+    else:
+        # Only the queueing has to be retried: the next complete skips the assembly
+        upload_sessions.stored(upload_id, audio_hash, filepath)
+    log_action("upload_completed", current_user_id, {"upload_id": upload_id, "audio_hash": audio_hash,
+                                                     "status": status})
+    return jsonify(body), status
+
+
+@bp.route("/uploads/<upload_id>", methods=["DELETE"])
+@token_required
+def delete_upload(current_user_id, upload_id):
+    """Abandon a resumable upload and free its disk space (a stored file stays in the upload folder)"""
+    session = upload_sessions.get(upload_id, current_user_id)
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+    if session["status"] == ASSEMBLING:
+        return jsonify({"error": "Upload is being completed"}), 409
+
+    upload_sessions.delete(upload_id)
+    log_action("upload_deleted", current_user_id, {"upload_id": upload_id})
+    return jsonify({"message": "Upload deleted"}), 200
+
+
+# ===========================
+# TRANSCRIPTION JOBS (PROTECTED)
+# ===========================
+def _get_user_job(job_id, current_user_id):
+    job = job_queue.get(job_id)
+    if not job or job.get("user_id") != str(current_user_id):
+        return None
+    return job
+
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job(current_user_id, job_id):
+    """Get status and progress of a transcription job"""
+    job = _get_user_job(job_id, current_user_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "stage": job["stage"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"]
+    }
+    if job["status"] == "done":
+        if job["kind"] == "transcribe":
+            response["transcription_id"] = job["result"]["transcription_id"]
+        else:
+            response["result"] = job["result"]
+    return jsonify(response), 200
+
+
+@bp.route("/jobs/<job_id>/result", methods=["GET"])
+@token_required
+def get_job_result(current_user_id, job_id):
+    """Get the transcription produced by a finished job"""
+    job = _get_user_job(job_id, current_user_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    if job["status"] == "failed":
+        return jsonify({"job_id": job["id"], "status": job["status"], "error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"job_id": job["id"], "status": job["status"], "progress": job["progress"]}), 202
+
+    return jsonify(dict(job["result"], job_id=job["id"], status=job["status"])), 200
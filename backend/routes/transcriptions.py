@@ -0,0 +1,383 @@
+"""
+A user's transcriptions: lists, search, export, summaries, key items and translation.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request, send_file
+
+from exports import EXPORT_BULK_MAX, EXPORT_FORMATS, MIMETYPES, download_name
+from key_items import extract_key_items_from_text
+from models import registry as model_registry
+from routes import token_required
+from search_index import SEARCH_MAX_LIMIT
+from services import export_engine, log_action, segment_index, storage, track_metric, translator
+from summarization import engine as summarization_engine
+from translation import TranslationError
+
+bp = Blueprint("transcriptions", __name__)
+
+
+# ===========================
+# TRANSLATE TEXT (PROTECTED)
+# ===========================
+@bp.route("/translate", methods=["POST"])
+@token_required
+def translate_text(current_user_id):
+    """Translate text to target language (requires authentication)"""
+    data = request.get_json(silent=True) or {}
+    text = data.get("text", "")
+    target = data.get("target", "en")
+
+    if not text:
+        return jsonify({"error": "Text to translate is required"}), 400
+
+    try:
+        translated = translator.translate(text, target)
+    except TranslationError as e:
+        return jsonify({"translatedText": "", "error": str(e)}), 502
+    
+    log_action("translation", current_user_id, {"target_language": target})
+    track_metric("translation_count", 1, str(current_user_id))
+    
+    return jsonify({"translatedText": translated}), 200
+
+
+@bp.route("/transcriptions/<transcription_id>/translate", methods=["POST"])
+@token_required
+def translate_transcription(current_user_id, transcription_id):
+    """Translate every segment of a transcription concurrently
+
+    JSON body: target (default "en"), source (default "auto").
+    """
+    data = request.get_json(silent=True) or {}
+    target = data.get("target", "en")
+    source = data.get("source", "auto")
+
+    transcription = storage.transcriptions.get(transcription_id, current_user_id)
+    if not transcription:
+        return jsonify({"error": "Transcription not found"}), 404
+
+    segments = transcription.get("segments") or []
+    texts = [s.get("text") or "" for s in segments] or [transcription.get("transcription") or ""]
+
+    started = datetime.utcnow()
+    try:
+        translated, cached = translator.translate_many(texts, target, source)
+    except TranslationError as e:
+        return jsonify({"error": str(e)}), 502
+
+    log_action("translation", current_user_id, {
+        "transcription_id": transcription_id, "target_language": target, "segments": len(texts)
+    })
+    track_metric("translation_count", 1, str(current_user_id))
+
+    return jsonify({
+        "transcription_id": transcription_id,
+        "target": target,
+        "translatedText": " ".join(t.strip() for t in translated if t.strip()),
+        "segments": [
+            {"start": s.get("start"), "end": s.get("end"), "text": t}
+            for s, t in zip(segments, translated)
+        ],
+        "stats": {
+            "segments": len(texts),
+            "cached": cached,
+            "seconds": round((datetime.utcnow() - started).total_seconds(), 3)
+        }
+    }), 200
+
+
+# ===========================
+# SUMMARIZATION (NEW FEATURE - AD-4)
+# ===========================
+@bp.route("/transcriptions/<transcription_id>/summarize", methods=["POST"])
+@token_required
+def summarize_transcription(current_user_id, transcription_id):
+    """Generate summary of transcription"""
+    try:
+        transcription = storage.transcriptions.get(transcription_id, current_user_id)
+        
+        if not transcription:
+            return jsonify({"error": "Transcription not found"}), 404
+        
+        # Load (or reuse) the summarization pipeline from the model registry
+        try:
+            model_registry.get("summarizer")
+        except Exception as e:
+            print(f"Summarizer could not be loaded: {e}")
+            return jsonify({"error": "Summarization service unavailable"}), 503
+        
+        text = transcription["transcription"]
+        
+        # Split text into sentences for better summarization
+        sentences = text.split('. ')
+        if len(sentences) < 3:
+            return jsonify({"summary": text, "message": "Text too short to summarize"}), 200
+        
+        # Map-reduce over token-bounded chunks, batched with other requests' chunks
+        summary_text, summary_stats = summarization_engine.summarize(text)
+        
+        # Extract bullet points
+        bullet_points = [s.strip() + "." for s in summary_text.split('.') if s.strip()]
+        
+        # Update transcription with summary
+        storage.transcriptions.update(transcription_id, {"summary": summary_text, "bullet_points": bullet_points})
+        
+        log_action("summarization", current_user_id, {"transcription_id": transcription_id})
+        track_metric("summarization_count", 1, str(current_user_id))
+        track_metric("summarization_chunks_per_sec", summary_stats["chunks_per_sec"], str(current_user_id))
+        
+        return jsonify({
+            "summary": summary_text,
+            "bullet_points": bullet_points,
+            "stats": summary_stats
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ===========================
+# KEY ITEMS ENDPOINTS (AD-6)
+# ===========================
+@bp.route("/transcriptions/<transcription_id>/extract-items", methods=["POST"])
+@token_required
+def extract_items(current_user_id, transcription_id):
+    """Extract key decisions and action items from a transcription"""
+    try:
+        transcription = storage.transcriptions.get(transcription_id, current_user_id)
+
+        if not transcription:
+            return jsonify({"error": "Transcription not found"}), 404
+
+        text = transcription.get('transcription', '')
+        items = extract_key_items_from_text(text)
+
+        # Update transcription
+        storage.transcriptions.update(transcription_id, {"key_items": items})
+
+        log_action("extract_key_items", current_user_id, {"transcription_id": transcription_id, "count": len(items)})
+        track_metric("key_items_extracted", len(items), str(current_user_id))
+
+        return jsonify({"key_items": items}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/transcriptions/<transcription_id>/key-items", methods=["POST"])
+@token_required
+def update_key_items(current_user_id, transcription_id):
+    """Update key items array for a transcription (bulk replace). Accepts JSON { key_items: [...] }"""
+    try:
+        data = request.get_json() or {}
+        items = data.get('key_items')
+
+        if items is None:
+            return jsonify({"error": "key_items array required"}), 400
+
+        # Basic validation: ensure list
+        if not isinstance(items, list):
+            return jsonify({"error": "key_items must be a list"}), 400
+
+        if not storage.transcriptions.update(transcription_id, {"key_items": items}, current_user_id):
+            return jsonify({"error": "Transcription not found or not owned by user"}), 404
+
+        log_action("update_key_items", current_user_id, {"transcription_id": transcription_id, "count": len(items)})
+        return jsonify({"message": "Key items updated"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ===========================
+# KEYWORD SEARCH (NEW FEATURE - Sprint 2 #4)
+# ===========================
+@bp.route("/transcriptions/search", methods=["GET"])
+@token_required
+def search_transcriptions(current_user_id):
+    """Search transcript segments; ranked hits with highlighted snippets and timestamps
+
+    Query parameters: q (words, "quoted phrases", prefix*), limit (default 20), offset.
+    """
+    query = request.args.get("q", "").strip()
+    
+    if not query:
+        return jsonify({"error": "Search query required"}), 400
+    
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), SEARCH_MAX_LIMIT))
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    
+    try:
+        total, hits = segment_index.search(str(current_user_id), query, limit=limit, offset=offset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    log_action("search", current_user_id, {"query": query, "results": total})
+    track_metric("search_count", 1, str(current_user_id))
+    
+    return jsonify({
+        "query": query,
+        "count": total,
+        "limit": limit,
+        "offset": offset,
+        "results": hits
+    }), 200
+
+
+# ===========================
+# EXPORT TO PDF/DOCX (NEW FEATURE - Sprint 2 #7)
+# ===========================
+@bp.route("/transcriptions/<transcription_id>/export", methods=["GET"])
+@token_required
+def export_transcription(current_user_id, transcription_id):
+    """Export transcription as PDF or DOCX (cached until the transcription changes)"""
+    try:
+        format_type = request.args.get("format", "docx").lower()
+        
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({"error": "Format must be 'pdf' or 'docx'"}), 400
+        
+        transcription = storage.transcriptions.get(transcription_id, current_user_id)
+        
+        if not transcription:
+            return jsonify({"error": "Transcription not found"}), 404
+        
+        log_action("export", current_user_id, {"transcription_id": transcription_id, "format": format_type})
+        track_metric("export_count", 1, str(current_user_id))
+        
+        name = download_name(transcription, format_type)
+        path = export_engine.lookup(transcription_id, transcription.get("revision"), format_type)
+        if path:
+            return send_file(path, mimetype=MIMETYPES[format_type], as_attachment=True, download_name=name)
+        
+        # Rendered while it is sent (PDF page by page) and cached on the way
+        return Response(
+            export_engine.render(transcription, format_type),
+            mimetype=MIMETYPES[format_type],
+            headers={"Content-Disposition": f'attachment; filename="{name}"'}
+        )
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/transcriptions/export", methods=["POST"])
+@token_required
+def export_transcriptions(current_user_id):
+    """Export several transcriptions as one streamed ZIP archive
+
+    JSON body: ids (list of transcription ids, at most EXPORT_BULK_MAX), format (docx or pdf).
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    format_type = str(data.get("format", "docx")).lower()
+    
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({"error": "Format must be 'pdf' or 'docx'"}), 400
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids must be a non-empty list"}), 400
+    if len(ids) > EXPORT_BULK_MAX:
+        return jsonify({"error": f"At most {EXPORT_BULK_MAX} transcriptions per export"}), 400
+    
+    # Check ownership up front; full documents are only reloaded for exports not in the cache
+    entries = []
+    missing = []
+    for transcription_id in dict.fromkeys(str(i) for i in ids):
+        transcription = storage.transcriptions.get(transcription_id, current_user_id)
+        if transcription is None:
+            missing.append(transcription_id)
+        else:
+            entries.append((transcription_id, transcription.get("revision"), download_name(transcription, format_type)))
+    if missing:
+        return jsonify({"error": "Transcriptions not found", "ids": missing}), 404
+    
+    log_action("export", current_user_id, {"transcription_ids": [e[0] for e in entries], "format": format_type})
+    track_metric("export_count", len(entries), str(current_user_id))
+    
+    def load(transcription_id):
+        return storage.transcriptions.get(transcription_id, current_user_id)
+    
+    name = f"minutes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        export_engine.zip_stream(entries, format_type, load),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
+
+
+# ===========================
+# GET USER TRANSCRIPTIONS (PROTECTED)
+# ===========================
+# List views only need metadata and a short preview (storage.LIST_FIELDS),
+# never the full text or segments
+LIST_DEFAULT_LIMIT = 20
+LIST_MAX_LIMIT = 100
+
+
+def _encode_cursor(doc):
+    raw = json.dumps({"created_at": doc["created_at"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return datetime.fromisoformat(data["created_at"]), str(data["id"])
+
+
+@bp.route("/transcriptions", methods=["GET"])
+@token_required
+def get_transcriptions(current_user_id):
+    """List the current user's transcriptions, newest first, one page at a time
+
+    Query params: limit (default 20, max 100) and cursor (next_cursor from the
+    previous page). Items carry metadata and a short preview; fetch
+    /transcriptions/<id> for the full text and segments.
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", LIST_DEFAULT_LIMIT)), 1), LIST_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    after = None
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            after = _decode_cursor(cursor)
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    # Keyset pagination: strictly after the last item of the previous page
+    try:
+        page = storage.transcriptions.list_page(current_user_id, limit + 1, after=after)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    next_cursor = _encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+
+    for t in page:
+        t['created_at'] = t['created_at'].isoformat()
+    
+    return jsonify({"transcriptions": page, "next_cursor": next_cursor}), 200
+
+
+@bp.route("/transcriptions/<transcription_id>", methods=["GET"])
+@token_required
+def get_transcription(current_user_id, transcription_id):
+    """Get one transcription with its full text and segments"""
+    try:
+        transcription = storage.transcriptions.get(transcription_id, current_user_id)
+
+        if not transcription:
+            return jsonify({"error": "Transcription not found"}), 404
+
+        transcription['created_at'] = transcription['created_at'].isoformat()
+
+        return jsonify(transcription), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
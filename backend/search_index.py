@@ -0,0 +1,201 @@
+"""
+Segment-level full-text search index.
+
+Every transcript segment is stored as a row of a SQLite FTS5 table (porter
+stemming, unicode folding) on local disk, shared by the API and the job
+workers. Queries are ranked with BM25 and return highlighted snippets with
+the segment's start/end timestamps. Transcriptions are added as they are
+created; `python backend/search_index.py --rebuild` indexes existing ones.
+
+Query syntax: plain words (all must match, stemmed), "quoted phrases" and
+prefix* terms.
+"""
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+SEARCH_INDEX_DB = os.getenv("SEARCH_INDEX_DB", os.path.join("uploads", "search_index.sqlite3"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+SNIPPET_TOKENS = 24
+HIGHLIGHT = ("<mark>", "</mark>")
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text,
+    transcription_id UNINDEXED,
+    user_id UNINDEXED,
+    filename UNINDEXED,
+    created_at UNINDEXED,
+    position UNINDEXED,
+    start UNINDEXED,
+    end UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS documents (
+    transcription_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    segments INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+"""
+
+_QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r"\w+")
+
+
+def build_match(query):
+    """Translate a user query into an FTS5 MATCH expression, or raise ValueError"""
+    parts = []
+    for phrase, term in _QUERY_TERM.findall(query or ""):
+        if phrase:
+            words = _WORD.findall(phrase)
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+            continue
+        # Anything that is not a word character would be FTS5 syntax; split on it
+        words = _WORD.findall(term)
+        for i, word in enumerate(words):
+            prefix = term.endswith("*") and i == len(words) - 1
+            parts.append(f'"{word}"' + ("*" if prefix else ""))
+    if not parts:
+        raise ValueError("Search query must contain at least one word")
+    return " AND ".join(parts)
+
+
+class SegmentIndex:
+    """BM25-ranked full-text index over transcript segments"""
+
+    def __init__(self, path=SEARCH_INDEX_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def add(self, transcription_id, user_id, filename, created_at, segments, text=None):
+        """Index (or re-index) one transcription's segments"""
+        transcription_id = str(transcription_id)
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        rows = [
+            (s.get("text", "").strip(), s.get("start"), s.get("end"), i)
+            for i, s in enumerate(segments or [])
+            if s.get("text", "").strip()
+        ]
+        if not rows and text:
+            # No timestamps (e.g. older documents): index the whole transcript as one segment
+            rows = [(text, None, None, 0)]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM segments WHERE transcription_id = ?", (transcription_id,))
+            conn.executemany(
+                "INSERT INTO segments (text, transcription_id, user_id, filename, created_at, position, start, end) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (seg_text, transcription_id, str(user_id), filename, created_at, position, start, end)
+                    for seg_text, start, end, position in rows
+                ]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (transcription_id, user_id, segments, indexed_at) VALUES (?, ?, ?, ?)",
+                (transcription_id, str(user_id), len(rows), datetime.utcnow().isoformat())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return len(rows)
+
+    def remove(self, transcription_id):
+        """Drop a transcription from the index"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM segments WHERE transcription_id = ?", (str(transcription_id),))
+            conn.execute("DELETE FROM documents WHERE transcription_id = ?", (str(transcription_id),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def search(self, user_id, query, limit=20, offset=0):
+        """Return (total hits, ranked hits) for a user's query; raises ValueError on an empty query"""
+        match = build_match(query)
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        offset = max(0, int(offset))
+        with self._connect() as conn:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM segments WHERE segments MATCH ? AND user_id = ?",
+                (match, str(user_id))
+            ).fetchone()[0]
+            rows = conn.execute(
+                "SELECT transcription_id, filename, created_at, position, start, end, text, "
+                "snippet(segments, 0, ?, ?, '…', ?) AS snippet, bm25(segments) AS rank "
+                "FROM segments WHERE segments MATCH ? AND user_id = ? "
+                "ORDER BY rank LIMIT ? OFFSET ?",
+                (HIGHLIGHT[0], HIGHLIGHT[1], SNIPPET_TOKENS, match, str(user_id), limit, offset)
+            ).fetchall()
+        hits = [
+            {
+                "transcription_id": row["transcription_id"],
+                "filename": row["filename"],
+                "created_at": row["created_at"],
+                "segment": row["position"],
+                "start": row["start"],
+                "end": row["end"],
+                "text": row["text"],
+                "snippet": row["snippet"],
+                # bm25() is lower-is-better; flip it so higher scores rank first
+                "score": round(-row["rank"], 4)
+            }
+            for row in rows
+        ]
+        return total, hits
+
+    def stats(self):
+        with self._connect() as conn:
+            documents, segments = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(segments), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "segments": segments}
+
+
+def rebuild(storage, index=None):
+    """Index every stored transcription; returns the number indexed"""
+    index = index or SegmentIndex()
+    count = 0
+    for doc in storage.transcriptions.iter_all(["user_id", "filename", "created_at", "segments", "transcription"]):
+        index.add(doc["_id"], doc.get("user_id"), doc.get("filename"), doc.get("created_at"),
+                  doc.get("segments"), doc.get("transcription"))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    from storage import STORAGE_BACKEND, STORAGE_BACKENDS, open_storage
+
+    parser = argparse.ArgumentParser(description="Manage the MinuteMinds segment search index")
+    parser.add_argument("--backend", default=STORAGE_BACKEND, choices=STORAGE_BACKENDS, help="Storage backend")
+    parser.add_argument("--rebuild", action="store_true", help="Index all existing transcriptions")
+    args = parser.parse_args()
+
+    segment_index = SegmentIndex()
+    if args.rebuild:
+        indexed = rebuild(open_storage(args.backend), segment_index)
+        print(f"Indexed {indexed} transcriptions")
+    print(segment_index.stats())
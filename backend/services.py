@@ -0,0 +1,145 @@
+"""
+Process-wide services shared by the blueprints (see routes/).
+
+Opened once per process, when create_app() first imports this module; under
+gunicorn that is the master, before it forks the HTTP workers (preload_app).
+Opening them is cheap and never waits on the network: storage does not
+block on MongoDB (see storage.py), models are loaded on first use or via
+MODEL_PRELOAD (see models.py), and numpy, the export libraries and the
+translation HTTP session are imported by the code that uses them.
+"""
+import os
+from datetime import datetime
+
+from flask import g, has_request_context
+
+import metrics
+from events import EventPipeline
+from exports import ExportEngine
+from jobs import JobQueue, WorkerPool
+from metrics import Counter, Gauge
+from models import registry as model_registry, rss_bytes
+from passwords import PasswordHasher
+from result_cache import TranscriptionCache
+from search_index import SegmentIndex
+from storage import open_storage
+from summarization import engine as summarization_engine
+from translation import TranslationClient
+from upload_sessions import UploadSessions
+from user_cache import UserCache
+
+# Users, transcriptions, logs and analytics live in MongoDB or, when
+# STORAGE_BACKEND=sqlite (or MongoDB is unreachable), in an embedded SQLite
+# database; see storage.py
+storage = open_storage()
+# Job workers are spawned processes; make them open the same backend
+os.environ["STORAGE_BACKEND"] = storage.name
+
+UPLOAD_FOLDER = "uploads"
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Resumable uploads: chunks are written in place under uploads/sessions until
+# completed; expired sessions are purged by each serving process (init_process)
+upload_sessions = UploadSessions()
+
+# Transcription jobs are queued in SQLite and run by a pool of worker processes
+job_queue = JobQueue()
+worker_pool = WorkerPool(job_queue)
+
+# Finished results keyed by (audio hash, model, denoising method) so duplicate uploads skip Whisper
+transcription_cache = TranscriptionCache()
+
+# Segment-level full-text index (SQLite FTS5) behind /transcriptions/search
+segment_index = SegmentIndex()
+
+# Audit logs and metrics are buffered and written in batches off the request
+# path; metrics are also counted into per-minute/hour/day rollups
+event_pipeline = EventPipeline({
+    "logs": storage.logs.insert_many,
+    "analytics": storage.analytics.insert_many
+})
+
+
+def load_user(user_id):
+    """Fetch the user record the auth checks need"""
+    try:
+        return storage.users.get(user_id)
+    except Exception as e:
+        print(f"Warning: could not load user {user_id}: {e}")
+        return None
+
+# Role and name lookups for admin_required and /verify-token
+user_cache = UserCache(load_user)
+
+# bcrypt runs on a bounded pool; saturation is answered with 429
+password_hasher = PasswordHasher()
+
+# Pooled, cached client for the translation server (TRANSLATE_URL)
+translator = TranslationClient()
+
+# DOCX/PDF exports, cached on disk per transcription revision
+export_engine = ExportEngine()
+
+# ===========================
+# METRICS (see metrics.py)
+# ===========================
+EVENTS_TOTAL = Counter("events_total", "Analytics events tracked, by type", ("type",))
+Gauge("job_queue_depth", "Transcription jobs waiting for a worker", function=lambda: job_queue.depth(), scrape=True)
+Gauge("event_queue_size", "Buffered log and analytics events not written yet",
+      function=lambda: event_pipeline.stats()["queued"])
+Gauge("summarizer_queue_size", "Chunks waiting for the summarizer",
+      function=lambda: summarization_engine.stats()["queued"])
+Gauge("model_memory_bytes", "Memory held by loaded models", ("kind", "name"), function=lambda: {
+    (m["kind"], m["name"]): m["memory_mb"] * 1024 * 1024 for m in model_registry.stats()["loaded"]
+})
+Gauge("process_resident_memory_bytes", "Resident memory of the serving and job processes",
+      function=rss_bytes)
+
+# ===========================
+# LOGGING UTILITY
+# ===========================
+
+def request_id():
+    """X-Request-ID of the request being served, or None outside a request"""
+    return g.get("request_id") if has_request_context() else None
+
+def log_action(action, user_id, details=None):
+    """Log user actions (buffered), tagged with the request id"""
+    log_entry = {
+        "action": action,
+        "user_id": str(user_id) if user_id else None,
+        "timestamp": datetime.utcnow(),
+        "details": dict(details or {}, request_id=request_id())
+    }
+    event_pipeline.emit("logs", log_entry)
+
+def track_metric(metric_type, value, user_id=None):
+    """Track metrics for analytics (buffered)"""
+    metric = {
+        "type": metric_type,
+        "value": value,
+        "user_id": str(user_id) if user_id else None,
+        "timestamp": datetime.utcnow()
+    }
+    EVENTS_TOTAL.inc(type=metric_type)
+    event_pipeline.emit("analytics", metric)
+
+# ===========================
+# PROCESS LIFECYCLE (see gunicorn.conf.py)
+# ===========================
+
+def init_process():
+    """Start-up of each serving process, after it was forked from a preloading master"""
+    # Connections opened by the master must not be shared with its children
+    storage.after_fork()
+    storage.start()
+    metrics.start()
+    upload_sessions.start()
+    # Models are loaded per process and never in the master (see models.py)
+    model_registry.warm_up()
+
+
+def shutdown():
+    """Flush buffered logs/metrics and let running jobs finish (up to JOB_STOP_TIMEOUT)"""
+    event_pipeline.stop()
+    worker_pool.stop()
@@ -0,0 +1,511 @@
+"""
+Embedded SQLite storage backend (see storage.py for the repository API).
+
+Everything lives in one database file (SQLITE_DB_PATH) in WAL mode, shared
+by the API process and the job workers. Each thread keeps its own
+connection. Transcription documents are stored as JSON, with the fields the
+list view and the key item backfill filter on copied into indexed columns.
+Metrics are folded into the same per-minute/hour/day rollups as with
+MongoDB (rollups.compute_increments).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from rollups import ALL_USERS, RETENTION_DAYS, bucket_start, compute_increments
+from storage import LIST_FIELDS, DuplicateEmail, time_repositories
+
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", os.path.join("uploads", "minuteminds.sqlite3"))
+# How often expired minute/hour rollups are purged
+ROLLUP_PURGE_INTERVAL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT,
+    password BLOB,
+    role TEXT NOT NULL DEFAULT 'user',
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS transcriptions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    filename TEXT,
+    preview TEXT,
+    summary TEXT,
+    model TEXT,
+    job_id TEXT,
+    has_key_items INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcriptions_user_created_at ON transcriptions (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS transcriptions_has_key_items ON transcriptions (has_key_items, id);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action TEXT NOT NULL,
+    user_id TEXT,
+    timestamp TEXT NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS logs_timestamp ON logs (timestamp DESC);
+CREATE INDEX IF NOT EXISTS logs_action_timestamp ON logs (action, timestamp DESC);
+CREATE TABLE IF NOT EXISTS analytics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    value REAL,
+    user_id TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analytics_rollups (
+    granularity TEXT NOT NULL,
+    type TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (granularity, type, user_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS analytics_rollups_user_bucket ON analytics_rollups (granularity, user_id, bucket);
+"""
+
+_USER_COLUMNS = ("email", "name", "password", "role", "created_at", "updated_at")
+# Hot queries checked by diagnostics() with EXPLAIN QUERY PLAN
+_DIAGNOSTIC_QUERIES = [
+    ("login by email", "users", "SELECT * FROM users WHERE email = ?", ("user@example.com",)),
+    ("list transcriptions", "transcriptions",
+     "SELECT id FROM transcriptions WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 20", ("",)),
+    ("admin logs", "logs", "SELECT * FROM logs ORDER BY timestamp DESC LIMIT 100", ()),
+    ("admin logs by action", "logs",
+     "SELECT * FROM logs WHERE action = ? ORDER BY timestamp DESC LIMIT 100", ("user_login",)),
+    ("analytics series", "analytics_rollups",
+     "SELECT * FROM analytics_rollups WHERE granularity = ? AND user_id = ? AND bucket >= ? ORDER BY bucket",
+     ("hour", ALL_USERS, "")),
+]
+
+
+def _ts(value):
+    return value.isoformat(timespec="microseconds") if isinstance(value, datetime) else value
+
+
+def _dt(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _in_clause(values):
+    return ",".join("?" * len(values))
+
+
+class SQLiteStorage:
+    """Repositories backed by one embedded SQLite database"""
+
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self.conn().executescript(_SCHEMA)
+        self.users = SQLiteUsers(self)
+        self.transcriptions = SQLiteTranscriptions(self)
+        self.logs = SQLiteLogs(self)
+        self.analytics = SQLiteAnalytics(self)
+        time_repositories(self)
+
+    def conn(self):
+        """This thread's connection (reopened after a fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def ensure_indexes(self):
+        """Indexes are part of the schema; report them like the MongoDB backend does"""
+        rows = self.conn().execute(
+            "SELECT tbl_name, name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        ).fetchall()
+        return [{"collection": row["tbl_name"], "name": row["name"], "status": "ok"} for row in rows]
+
+    def start(self):
+        """Nothing to do: the indexes are part of the schema and the database is a local file"""
+
+    def health(self):
+        try:
+            self.conn().execute("SELECT 1")
+        except sqlite3.Error as e:
+            return {"backend": self.name, "status": "unavailable", "error": str(e), "indexes": "ok"}
+        return {"backend": self.name, "status": "ok", "indexes": "ok"}
+
+    def diagnostics(self):
+        """Query plans of the hot queries; flags full table scans"""
+        results = []
+        for description, table, sql, params in _DIAGNOSTIC_QUERIES:
+            plan = [row["detail"] for row in self.conn().execute("EXPLAIN QUERY PLAN " + sql, params)]
+            scan = any(d.startswith("SCAN") and "USING" not in d for d in plan)
+            entry = {"query": description, "collection": table, "stages": plan, "collection_scan": scan}
+            if scan:
+                entry["warning"] = "Query does a full table scan; is an index missing?"
+            results.append(entry)
+        return {"queries": results, "usage": {}}
+
+    def after_fork(self):
+        """Nothing to do: conn() already opens new connections in a forked process"""
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SQLiteUsers:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def _row(self, row, with_password=False):
+        if row is None:
+            return None
+        user = {
+            "_id": row["id"],
+            "email": row["email"],
+            "name": row["name"],
+            "role": row["role"],
+            "created_at": _dt(row["created_at"]),
+            "updated_at": _dt(row["updated_at"])
+        }
+        if with_password:
+            user["password"] = row["password"]
+        return user
+
+    def get(self, user_id):
+        row = self.storage.conn().execute("SELECT * FROM users WHERE id = ?", (str(user_id),)).fetchone()
+        return self._row(row)
+
+    def find_by_email(self, email):
+        row = self.storage.conn().execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return self._row(row, with_password=True)
+
+    def create(self, user):
+        user_id = str(ObjectId())
+        try:
+            self.storage.conn().execute(
+                f"INSERT INTO users (id, {', '.join(_USER_COLUMNS)}) VALUES (?, {_in_clause(_USER_COLUMNS)})",
+                (user_id,) + tuple(_ts(user.get(c)) for c in _USER_COLUMNS)
+            )
+        except sqlite3.IntegrityError:
+            raise DuplicateEmail(user["email"])
+        return user_id
+
+    def update(self, user_id, fields):
+        columns = [c for c in fields if c in _USER_COLUMNS]
+        if not columns:
+            return self.get(user_id) is not None
+        cursor = self.storage.conn().execute(
+            f"UPDATE users SET {', '.join(c + ' = ?' for c in columns)} WHERE id = ?",
+            tuple(_ts(fields[c]) for c in columns) + (str(user_id),)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, user_id):
+        return self.storage.conn().execute("DELETE FROM users WHERE id = ?", (str(user_id),)).rowcount > 0
+
+    def list(self):
+        return [self._row(row) for row in self.storage.conn().execute("SELECT * FROM users ORDER BY created_at")]
+
+    def count(self):
+        return self.storage.conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+class SQLiteTranscriptions:
+    def __init__(self, storage):
+        self.storage = storage
+
+    @staticmethod
+    def _columns(doc):
+        return (
+            doc.get("user_id"),
+            _ts(doc.get("created_at")),
+            doc.get("filename"),
+            doc.get("preview"),
+            doc.get("summary"),
+            doc.get("model"),
+            doc.get("job_id"),
+            int(doc.get("key_items") is not None),
+            json.dumps({k: v for k, v in doc.items() if k not in ("_id", "created_at")}, default=_json_default)
+        )
+
+    @staticmethod
+    def _row(row, fields=None):
+        doc = json.loads(row["doc"])
+        if fields is not None:
+            doc = {k: v for k, v in doc.items() if k in fields}
+        doc["_id"] = row["id"]
+        doc["created_at"] = _dt(row["created_at"])
+        return doc
+
+    def create(self, doc):
+        transcription_id = str(ObjectId())
+        self.storage.conn().execute(
+            "INSERT INTO transcriptions (id, user_id, created_at, filename, preview, summary, model, job_id, "
+            "has_key_items, doc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (transcription_id,) + self._columns(doc)
+        )
+        return transcription_id
+
+    def get(self, transcription_id, user_id=None):
+        sql = "SELECT id, created_at, doc FROM transcriptions WHERE id = ?"
+        params = [str(transcription_id)]
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(str(user_id))
+        row = self.storage.conn().execute(sql, params).fetchone()
+        return self._row(row) if row else None
+
+    def _update(self, conn, transcription_id, fields, user_id=None):
+        sql = "SELECT id, created_at, doc FROM transcriptions WHERE id = ?"
+        params = [str(transcription_id)]
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(str(user_id))
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            return False
+        doc = self._row(row)
+        doc.update(fields)
+        doc["revision"] = int(doc.get("revision") or 0) + 1
+        conn.execute(
+            "UPDATE transcriptions SET user_id = ?, created_at = ?, filename = ?, preview = ?, summary = ?, "
+            "model = ?, job_id = ?, has_key_items = ?, doc = ? WHERE id = ?",
+            self._columns(doc) + (row["id"],)
+        )
+        return True
+
+    def update(self, transcription_id, fields, user_id=None):
+        with self.storage.transaction() as conn:
+            return self._update(conn, transcription_id, fields, user_id)
+
+    def list_page(self, user_id, limit, after=None):
+        sql = ("SELECT id, " + ", ".join(LIST_FIELDS) + " FROM transcriptions WHERE user_id = ?")
+        params = [str(user_id)]
+        if after:
+            created_at, last_id = after
+            sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            params += [_ts(created_at), _ts(created_at), str(last_id)]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        page = []
+        for row in self.storage.conn().execute(sql, params):
+            item = {field: row[field] for field in LIST_FIELDS}
+            item["_id"] = row["id"]
+            item["created_at"] = _dt(row["created_at"])
+            page.append(item)
+        return page
+
+    def iter_all(self, fields, missing_key_items=False, batch_size=200):
+        # Keyset batches by id, so callers may write between batches
+        last_id = ""
+        where = "has_key_items = 0 AND " if missing_key_items else ""
+        while True:
+            rows = self.storage.conn().execute(
+                f"SELECT id, created_at, doc FROM transcriptions WHERE {where}id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row(row, fields)
+            last_id = rows[-1]["id"]
+
+    def update_many(self, updates):
+        with self.storage.transaction() as conn:
+            for transcription_id, fields in updates:
+                self._update(conn, transcription_id, fields)
+
+    def count(self, missing_key_items=False):
+        sql = "SELECT COUNT(*) FROM transcriptions" + (" WHERE has_key_items = 0" if missing_key_items else "")
+        return self.storage.conn().execute(sql).fetchone()[0]
+
+
+class SQLiteLogs:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def insert_many(self, entries):
+        with self.storage.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO logs (action, user_id, timestamp, details) VALUES (?, ?, ?, ?)",
+                [
+                    (e["action"], e.get("user_id"), _ts(e["timestamp"]), json.dumps(e.get("details") or {}, default=_json_default))
+                    for e in entries
+                ]
+            )
+
+    def recent(self, limit=100, action=None):
+        sql = "SELECT * FROM logs"
+        params = []
+        if action:
+            sql += " WHERE action = ?"
+            params.append(action)
+        sql += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+        return [
+            {
+                "_id": str(row["id"]),
+                "action": row["action"],
+                "user_id": row["user_id"],
+                "timestamp": _dt(row["timestamp"]),
+                "details": json.loads(row["details"] or "{}")
+            }
+            for row in self.storage.conn().execute(sql, params)
+        ]
+
+
+class SQLiteAnalytics:
+    def __init__(self, storage):
+        self.storage = storage
+        self._last_purge = 0.0
+
+    def _apply(self, conn, metrics):
+        increments = compute_increments(metrics)
+        conn.executemany(
+            "INSERT INTO analytics_rollups (granularity, type, user_id, bucket, count, sum, min, max) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (granularity, type, user_id, bucket) DO UPDATE SET "
+            "count = count + excluded.count, sum = sum + excluded.sum, "
+            "min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+            [
+                (granularity, metric_type, user_id, _ts(bucket), count, total, low, high)
+                for (granularity, bucket, metric_type, user_id), (count, total, low, high) in increments.items()
+            ]
+        )
+
+    def _purge(self, conn):
+        """Drop minute/hour buckets past their retention (MongoDB uses a TTL index)"""
+        now = datetime.utcnow()
+        for granularity, days in RETENTION_DAYS.items():
+            if days:
+                conn.execute(
+                    "DELETE FROM analytics_rollups WHERE granularity = ? AND bucket < ?",
+                    (granularity, _ts(now - timedelta(days=days)))
+                )
+
+    def insert_many(self, metrics):
+        """Store raw metrics and fold them into the rollups in one transaction"""
+        with self.storage.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO analytics (type, value, user_id, timestamp) VALUES (?, ?, ?, ?)",
+                [(m["type"], m.get("value"), m.get("user_id"), _ts(m["timestamp"])) for m in metrics]
+            )
+            self._apply(conn, metrics)
+            if time.monotonic() - self._last_purge > ROLLUP_PURGE_INTERVAL:
+                self._purge(conn)
+                self._last_purge = time.monotonic()
+
+    @staticmethod
+    def _range(sql, params, start, end):
+        if start:
+            sql += " AND bucket >= ?"
+            params.append(_ts(bucket_start(start, "day")))
+        if end:
+            sql += " AND bucket < ?"
+            params.append(_ts(end))
+        return sql
+
+    def series(self, start, end, granularity, types=None, user_id=ALL_USERS):
+        sql = ("SELECT type, bucket, count, sum, min, max FROM analytics_rollups "
+               "WHERE granularity = ? AND user_id = ? AND bucket >= ? AND bucket < ?")
+        params = [granularity, user_id, _ts(bucket_start(start, granularity)), _ts(end)]
+        if types:
+            sql += f" AND type IN ({_in_clause(types)})"
+            params += list(types)
+        series = {}
+        for row in self.storage.conn().execute(sql + " ORDER BY bucket", params):
+            series.setdefault(row["type"], []).append({
+                "bucket": _dt(row["bucket"]),
+                "count": row["count"],
+                "sum": row["sum"],
+                "min": row["min"],
+                "max": row["max"]
+            })
+        return series
+
+    def totals(self, start=None, end=None, types=None, user_id=ALL_USERS):
+        params = [user_id]
+        sql = self._range(
+            "SELECT type, SUM(count) AS count, SUM(sum) AS sum FROM analytics_rollups "
+            "WHERE granularity = 'day' AND user_id = ?",
+            params, start, end
+        )
+        if types:
+            sql += f" AND type IN ({_in_clause(types)})"
+            params += list(types)
+        rows = self.storage.conn().execute(sql + " GROUP BY type", params)
+        return {row["type"]: {"count": row["count"], "sum": row["sum"]} for row in rows}
+
+    def top_users(self, metric_type, start=None, end=None, limit=10):
+        params = [metric_type, ALL_USERS]
+        sql = self._range(
+            "SELECT user_id, SUM(count) AS count FROM analytics_rollups "
+            "WHERE granularity = 'day' AND type = ? AND user_id != ?",
+            params, start, end
+        )
+        rows = self.storage.conn().execute(sql + " GROUP BY user_id ORDER BY count DESC LIMIT ?", params + [limit])
+        return [{"_id": row["user_id"], "count": row["count"]} for row in rows]
+
+    def rebuild_rollups(self, batch_size=5000):
+        """Recompute all rollups from the raw metrics; returns the number of metrics read"""
+        with self.storage.transaction() as conn:
+            conn.execute("DELETE FROM analytics_rollups")
+        count = 0
+        last_id = 0
+        while True:
+            rows = self.storage.conn().execute(
+                "SELECT id, type, value, user_id, timestamp FROM analytics WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return count
+            metrics = [
+                {"type": r["type"], "value": r["value"], "user_id": r["user_id"], "timestamp": _dt(r["timestamp"])}
+                for r in rows
+            ]
+            with self.storage.transaction() as conn:
+                self._apply(conn, metrics)
+            count += len(rows)
+            last_id = rows[-1]["id"]
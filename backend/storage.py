@@ -0,0 +1,430 @@
+"""
+Storage backends.
+
+The app, the job workers and the maintenance scripts read and write users,
+transcriptions, logs and analytics through four repositories:
+
+  storage.users           get, find_by_email, create, update, delete, list, count
+  storage.transcriptions  create, get, update, list_page, iter_all, update_many, count
+  storage.logs            insert_many, recent
+  storage.analytics       insert_many (raw metrics + rollups), series, totals, top_users
+
+Two implementations behave the same way:
+
+  mongo   MongoDB (MONGO_URL), for multi-node deployments
+  sqlite  one embedded SQLite database file (SQLITE_DB_PATH; see
+          sqlite_storage.py), for single-node deployments and load tests
+
+STORAGE_BACKEND selects one; "auto" (the default) uses MongoDB when it
+answers and SQLite otherwise. Opening a backend never waits long on MongoDB:
+"auto" first probes the MongoDB hosts with a plain TCP connect
+(MONGO_PROBE_TIMEOUT_MS), so a refused or unroutable server falls back to
+SQLite at once, and only pings a server that accepted the connection. The
+indexes are created by start(), in a thread that pings MongoDB every
+MONGO_HEALTH_INTERVAL seconds until it answers and then keeps reporting its
+health (see health()); requests made while MongoDB is down fail after
+MONGO_CONNECT_TIMEOUT_MS. Documents are
+plain dicts whose "_id" is a string; invalid ids are simply not found.
+Every transcriptions.update / update_many increments the document's
+"revision" (absent means 0), which keys cached exports (see exports.py).
+Every repository call is timed into the storage_call_seconds histogram
+(see metrics.py); MongoDB commands are also timed one by one.
+
+A process forked after opening a backend (e.g. a gunicorn worker with
+preload_app) must call after_fork() before using it.
+"""
+import inspect
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from metrics import STORAGE_ERRORS, STORAGE_SECONDS, Histogram
+from rollups import ALL_USERS, AnalyticsRollups
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "auto")
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "meeting_minutes")
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "2000"))
+MONGO_PROBE_TIMEOUT_MS = int(os.getenv("MONGO_PROBE_TIMEOUT_MS", "300"))
+MONGO_HEALTH_INTERVAL = float(os.getenv("MONGO_HEALTH_INTERVAL", "5"))
+STORAGE_BACKENDS = ("auto", "mongo", "sqlite")
+
+# Fields returned by transcription list views: metadata and a short preview
+LIST_FIELDS = ("filename", "created_at", "preview", "summary", "model", "job_id")
+
+
+class DuplicateEmail(Exception):
+    """Raised by users.create when the email is already registered"""
+
+
+class TimedRepository:
+    """Wraps a repository to time its public methods.
+
+    A generator method (e.g. iter_all) is timed while it runs, not while
+    the caller handles what it yields.
+    """
+
+    def __init__(self, repository, backend, name):
+        self._repository = repository
+        self._labels = {"backend": backend, "repository": name}
+
+    def __getattr__(self, attr):
+        value = getattr(self._repository, attr)
+        if attr.startswith("_") or not inspect.ismethod(value):
+            return value
+        labels = dict(self._labels, operation=attr)
+
+        if inspect.isgeneratorfunction(value):
+            def timed(*args, **kwargs):
+                spent = 0.0
+                items = value(*args, **kwargs)
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                        except Exception:
+                            STORAGE_ERRORS.inc(**labels)
+                            raise
+                        finally:
+                            spent += time.perf_counter() - started
+                        yield item
+                finally:
+                    items.close()
+                    STORAGE_SECONDS.observe(spent, **labels)
+        else:
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return value(*args, **kwargs)
+                except Exception:
+                    STORAGE_ERRORS.inc(**labels)
+                    raise
+                finally:
+                    STORAGE_SECONDS.observe(time.perf_counter() - started, **labels)
+
+        # Cached: later lookups skip __getattr__
+        setattr(self, attr, timed)
+        return timed
+
+
+def time_repositories(storage):
+    """Replace the four repositories of a backend with timed ones"""
+    for name in ("users", "transcriptions", "logs", "analytics"):
+        setattr(storage, name, TimedRepository(getattr(storage, name), storage.name, name))
+
+
+def open_storage(backend=None):
+    """Open the configured storage backend"""
+    backend = backend or STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}")
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+
+    if backend == "mongo":
+        return MongoStorage()
+    if _mongo_reachable():
+        storage = MongoStorage()
+        try:
+            storage.client.admin.command("ping")
+            return storage
+        except Exception:
+            storage.close()
+    print(f"Warning: could not connect to MongoDB at {MONGO_URL}; using the embedded SQLite storage instead.")
+    from sqlite_storage import SQLiteStorage
+    return SQLiteStorage()
+
+
+def _mongo_reachable(url=MONGO_URL, timeout_ms=MONGO_PROBE_TIMEOUT_MS):
+    """Whether any host of a mongodb:// URL accepts a TCP connection (mongodb+srv:// is assumed reachable)"""
+    if not url.startswith("mongodb://"):
+        return True
+    # Hosts sit between the scheme (and credentials) and the database path
+    hosts = url[len("mongodb://"):].split("/", 1)[0].rpartition("@")[2]
+    for host in hosts.split(","):
+        if host.startswith("["):
+            name, _, port = host[1:].partition("]")
+            port = port.lstrip(":")
+        else:
+            name, _, port = host.partition(":")
+        try:
+            with socket.create_connection((name, int(port or 27017)), timeout=timeout_ms / 1000):
+                return True
+        except (OSError, ValueError):
+            continue
+    return False
+
+
+# ===========================
+# MONGODB
+# ===========================
+
+def _oid(value):
+    """ObjectId for an id string, or None when it is not a valid id"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    try:
+        return ObjectId(str(value))
+    except (InvalidId, TypeError):
+        return None
+
+
+def _out(doc):
+    if doc is not None:
+        doc["_id"] = str(doc["_id"])
+    return doc
+
+
+def _revised(fields):
+    return {"$set": fields, "$inc": {"revision": 1}}
+
+
+MONGO_COMMAND_SECONDS = Histogram("mongo_command_seconds", "Duration of MongoDB commands", ("command", "outcome"))
+
+
+def _command_listener():
+    from pymongo import monitoring
+
+    class CommandTimer(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome="ok")
+
+        def failed(self, event):
+            MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome="error")
+
+    return CommandTimer()
+
+
+class MongoUsers:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, user_id):
+        """User without the password hash, or None"""
+        oid = _oid(user_id)
+        return _out(self.collection.find_one({"_id": oid}, {"password": 0})) if oid else None
+
+    def find_by_email(self, email):
+        """User including the password hash, or None"""
+        return _out(self.collection.find_one({"email": email}))
+
+    def create(self, user):
+        from pymongo.errors import DuplicateKeyError
+        try:
+            return str(self.collection.insert_one(dict(user)).inserted_id)
+        except DuplicateKeyError:
+            raise DuplicateEmail(user["email"])
+
+    def update(self, user_id, fields):
+        oid = _oid(user_id)
+        return bool(oid) and self.collection.update_one({"_id": oid}, {"$set": fields}).matched_count > 0
+
+    def delete(self, user_id):
+        oid = _oid(user_id)
+        return bool(oid) and self.collection.delete_one({"_id": oid}).deleted_count > 0
+
+    def list(self):
+        return [_out(u) for u in self.collection.find({}, {"password": 0})]
+
+    def count(self):
+        # Collection metadata; no scan
+        return self.collection.estimated_document_count()
+
+
+class MongoTranscriptions:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def _query(self, transcription_id, user_id):
+        oid = _oid(transcription_id)
+        if oid is None:
+            return None
+        query = {"_id": oid}
+        if user_id is not None:
+            query["user_id"] = str(user_id)
+        return query
+
+    def create(self, doc):
+        return str(self.collection.insert_one(dict(doc)).inserted_id)
+
+    def get(self, transcription_id, user_id=None):
+        """Full transcription, optionally only if owned by user_id"""
+        query = self._query(transcription_id, user_id)
+        return _out(self.collection.find_one(query)) if query else None
+
+    def update(self, transcription_id, fields, user_id=None):
+        """Set fields; returns False when no (owned) transcription matched"""
+        query = self._query(transcription_id, user_id)
+        return bool(query) and self.collection.update_one(query, _revised(fields)).matched_count > 0
+
+    def list_page(self, user_id, limit, after=None):
+        """A user's transcriptions (LIST_FIELDS only), newest first, strictly after (created_at, id)"""
+        query = {"user_id": str(user_id)}
+        if after:
+            created_at, last_id = after
+            last_oid = _oid(last_id)
+            if last_oid is None:
+                raise ValueError("Invalid cursor id")
+            # Keyset pagination on the user_created_at index
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": last_oid}}
+            ]
+        page = list(
+            self.collection.find(query, {field: 1 for field in LIST_FIELDS})
+            .sort([("created_at", -1), ("_id", -1)])
+            .limit(limit)
+        )
+
+        # Documents created before previews were stored get one computed (and saved) once
+        missing = [t["_id"] for t in page if "preview" not in t]
+        if missing:
+            from transcription import make_preview
+            previews = {}
+            for doc in self.collection.find({"_id": {"$in": missing}}, {"transcription": 1}):
+                previews[doc["_id"]] = make_preview(doc.get("transcription"))
+                self.collection.update_one({"_id": doc["_id"]}, {"$set": {"preview": previews[doc["_id"]]}})
+            for t in page:
+                if t["_id"] in previews:
+                    t["preview"] = previews[t["_id"]]
+        return [_out(t) for t in page]
+
+    def iter_all(self, fields, missing_key_items=False, batch_size=200):
+        """Stream every transcription with the given fields"""
+        query = {"key_items": None} if missing_key_items else {}
+        for doc in self.collection.find(query, {field: 1 for field in fields}).batch_size(batch_size):
+            yield _out(doc)
+
+    def update_many(self, updates):
+        """Apply [(transcription_id, fields), ...] in one round trip"""
+        from pymongo import UpdateOne
+        if updates:
+            self.collection.bulk_write(
+                [UpdateOne({"_id": _oid(tid)}, _revised(fields)) for tid, fields in updates],
+                ordered=False
+            )
+
+    def count(self, missing_key_items=False):
+        if missing_key_items:
+            return self.collection.count_documents({"key_items": None})
+        return self.collection.estimated_document_count()
+
+
+class MongoLogs:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def insert_many(self, entries):
+        self.collection.insert_many(entries, ordered=False)
+
+    def recent(self, limit=100, action=None):
+        query = {"action": action} if action else {}
+        return [_out(log) for log in self.collection.find(query).sort("timestamp", -1).limit(limit)]
+
+
+class MongoAnalytics:
+    def __init__(self, db):
+        self.collection = db["analytics"]
+        self.rollups = AnalyticsRollups(db)
+
+    def insert_many(self, metrics):
+        """Store raw metrics and fold them into the rollups"""
+        self.collection.insert_many(metrics, ordered=False)
+        self.rollups.apply(metrics)
+
+    def series(self, start, end, granularity, types=None, user_id=ALL_USERS):
+        return self.rollups.query(start, end, granularity, types=types, user_id=user_id)
+
+    def totals(self, start=None, end=None, types=None, user_id=ALL_USERS):
+        return self.rollups.totals(start, end, types=types, user_id=user_id)
+
+    def top_users(self, metric_type, start=None, end=None, limit=10):
+        return self.rollups.top_users(metric_type, start, end, limit)
+
+    def rebuild_rollups(self):
+        return self.rollups.rebuild(self.collection)
+
+
+class MongoStorage:
+    """Repositories backed by MongoDB"""
+
+    name = "mongo"
+
+    def __init__(self, url=MONGO_URL, db_name=MONGO_DB_NAME):
+        self.url = url
+        self.db_name = db_name
+        self._indexed = False
+        self._health = {"status": "starting"}
+        self._monitor_pid = None
+        self._connect()
+
+    def _connect(self):
+        from pymongo import MongoClient
+        self.client = MongoClient(self.url, serverSelectionTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                                  event_listeners=[_command_listener()])
+        self.db = self.client[self.db_name]
+        self.users = MongoUsers(self.db["users"])
+        self.transcriptions = MongoTranscriptions(self.db["transcriptions"])
+        self.logs = MongoLogs(self.db["logs"])
+        self.analytics = MongoAnalytics(self.db)
+        time_repositories(self)
+
+    def ensure_indexes(self):
+        from indexes import ensure_indexes
+        return ensure_indexes(self.db)
+
+    def start(self):
+        """Create the indexes and watch the connection in the background (once per process)"""
+        if self._monitor_pid == os.getpid():
+            return
+        self._monitor_pid = os.getpid()
+
+        def run(pid):
+            while os.getpid() == pid:
+                self.check()
+                time.sleep(MONGO_HEALTH_INTERVAL)
+
+        threading.Thread(target=run, args=(os.getpid(),), name="mongo-health", daemon=True).start()
+
+    def check(self):
+        """Ping MongoDB; the first successful ping creates the indexes. Returns health()"""
+        started = time.perf_counter()
+        try:
+            self.client.admin.command("ping")
+        except Exception as e:
+            if self._health["status"] != "unavailable":
+                print(f"Warning: MongoDB at {self.url} is unavailable: {e}")
+            self._health = {"status": "unavailable", "error": str(e), "checked_at": datetime.utcnow().isoformat()}
+            return self.health()
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        if not self._indexed:
+            # Idempotent, and failures are reported per index; not retried
+            self.ensure_indexes()
+            self._indexed = True
+        self._health = {"status": "ok", "latency_ms": latency_ms, "checked_at": datetime.utcnow().isoformat()}
+        return self.health()
+
+    def health(self):
+        """Result of the last background check; status is starting, ok or unavailable"""
+        return dict(self._health, backend=self.name, indexes="ok" if self._indexed else "pending")
+
+    def diagnostics(self):
+        """Query plans of the hot queries and per-index usage"""
+        from indexes import explain_queries, index_usage
+        return {"queries": explain_queries(self.db), "usage": index_usage(self.db)}
+
+    def after_fork(self):
+        """Open a new client; MongoClient instances must not be shared across a fork"""
+        self._connect()
+
+    def close(self):
+        self.client.close()
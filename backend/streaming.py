@@ -0,0 +1,170 @@
+"""
+Live transcription of an audio stream.
+
+A StreamingTranscriber receives raw PCM frames as they are recorded and
+keeps the audio that has not been finalized yet (at most
+STREAM_WINDOW_SECONDS). Every STREAM_STEP_SECONDS of new audio Whisper runs
+over that window:
+
+  - every segment but the last one is final: it is reported once and its
+    audio is dropped from the window
+  - the last segment may still change as more audio arrives and is reported
+    as partial
+  - a window that reaches STREAM_WINDOW_SECONDS is finalized whole
+
+Memory is bounded by the window, whatever the length of the meeting. When
+Whisper is slower than real time, frames queue up and the next pass simply
+covers more new audio. Segment times are seconds since the start of the
+stream, in the {start, end, text} shape of extract_segments.
+"""
+import os
+import time
+
+import numpy as np
+
+from transcription import extract_segments
+
+STREAM_SAMPLE_RATE = 16000  # Whisper's input rate
+STREAM_STEP_SECONDS = float(os.getenv("STREAM_STEP_SECONDS", "2"))
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "30"))
+# Concurrent streams per serving process, each running Whisper there; 0 disables them
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "2"))
+# Denoising starts once this much audio is known, so the noise is not learned from the first words
+STREAM_DENOISE_WARMUP_SECONDS = float(os.getenv("STREAM_DENOISE_WARMUP_SECONDS", "3"))
+# Characters of finalized text passed to Whisper as the prompt for the next window
+PROMPT_CHARS = 200
+
+# Sample format -> (NumPy dtype, scale to [-1, 1])
+ENCODINGS = {
+    "pcm_s16le": (np.dtype("<i2"), 1 / 32768),
+    "pcm_f32le": (np.dtype("<f4"), 1.0),
+}
+
+
+class StreamingTranscriber:
+    """Rolling-window transcription of one stream.
+
+    `transcribe(samples, prompt)` runs Whisper over 16 kHz float32 samples and
+    returns its result dict. feed() only buffers audio; step() and finish()
+    run Whisper and return the events to send to the client.
+    """
+
+    def __init__(self, transcribe, sample_rate=STREAM_SAMPLE_RATE, encoding="pcm_s16le", denoise=None,
+                 step_seconds=STREAM_STEP_SECONDS, window_seconds=STREAM_WINDOW_SECONDS):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+        if not 8000 <= int(sample_rate) <= 192000:
+            raise ValueError("sample_rate must be between 8000 and 192000")
+        self.transcribe = transcribe
+        self.dtype, self.scale = ENCODINGS[encoding]
+        self.step_samples = int(step_seconds * STREAM_SAMPLE_RATE)
+        self.window_samples = int(window_seconds * STREAM_SAMPLE_RATE)
+
+        self._resampler = None
+        if int(sample_rate) != STREAM_SAMPLE_RATE:
+            import soxr
+            self._resampler = soxr.ResampleStream(int(sample_rate), STREAM_SAMPLE_RATE, 1, dtype="float32")
+        self._denoiser = None
+        if denoise:
+            from denoise import Denoiser
+            self._denoiser = Denoiser(denoise, STREAM_SAMPLE_RATE, min_history_seconds=STREAM_DENOISE_WARMUP_SECONDS)
+
+        self._carry = b""
+        self._window = np.empty(0, dtype=np.float32)
+        # Stream time of the first sample in the window
+        self._offset = 0
+        self._new = 0
+        self.received = 0
+        self.segments = []
+        self.partial = []
+        self.timings = {"decode": 0.0, "transcribe": 0.0}
+        if self._denoiser is not None:
+            self.timings["denoise"] = 0.0
+        self.passes = 0
+
+    @property
+    def text(self):
+        return "".join(segment["text"] or "" for segment in self.segments).strip()
+
+    @property
+    def duration(self):
+        return self.received / STREAM_SAMPLE_RATE
+
+    def _append(self, samples):
+        if self._denoiser is not None:
+            started = time.perf_counter()
+            samples = self._denoiser.feed(samples)
+            self.timings["denoise"] += time.perf_counter() - started
+        self._window = np.concatenate([self._window, samples])
+        self._new += len(samples)
+        self.received += len(samples)
+
+    def feed(self, data):
+        """Buffer a frame of raw PCM bytes"""
+        started = time.perf_counter()
+        data = self._carry + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._carry = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32) * self.scale
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples)
+        self.timings["decode"] += time.perf_counter() - started
+        self._append(samples)
+
+    def step(self):
+        """Run Whisper if enough new audio arrived since the last pass; returns events"""
+        if self._new < self.step_samples:
+            return []
+        return self._pass(final=False)
+
+    def finish(self):
+        """Transcribe whatever is left and finalize it; returns events"""
+        if self._resampler is not None:
+            self._append(self._resampler.resample_chunk(np.empty(0, dtype=np.float32), last=True))
+        if self._denoiser is not None:
+            self._window = np.concatenate([self._window, self._denoiser.flush()])
+        return self._pass(final=True)
+
+    def _pass(self, final):
+        from vad import detect_speech
+
+        self._new = 0
+        if not len(self._window):
+            return []
+        offset = self._offset / STREAM_SAMPLE_RATE
+        # A muted microphone: nothing for Whisper to do, and nothing to keep
+        muted = not len(detect_speech(self._window, STREAM_SAMPLE_RATE))
+        if muted:
+            segments = []
+        else:
+            started = time.perf_counter()
+            prompt = self.text[-PROMPT_CHARS:] or None
+            result = self.transcribe(self._window, prompt)
+            self.timings["transcribe"] += time.perf_counter() - started
+            self.passes += 1
+            segments = [
+                dict(segment, start=round(segment["start"] + offset, 3), end=round(segment["end"] + offset, 3))
+                for segment in extract_segments(result)
+                if segment.get("start") is not None and segment.get("end") is not None
+            ]
+
+        full = final or muted or len(self._window) >= self.window_samples
+        done, partial = (segments, []) if full else (segments[:-1], segments[-1:])
+        if full:
+            cut = len(self._window)
+        elif done:
+            cut = int(round((done[-1]["end"] - offset) * STREAM_SAMPLE_RATE))
+            cut = min(max(cut, 0), len(self._window))
+        else:
+            cut = 0
+        self._window = self._window[cut:]
+        self._offset += cut
+
+        self.segments.extend(done)
+        self.partial = partial
+        events = []
+        if done:
+            events.append({"type": "final", "segments": done})
+        if partial or not final:
+            events.append({"type": "partial", "segments": partial})
+        return events
@@ -0,0 +1,181 @@
+"""
+Batched map-reduce summarization.
+
+Transcripts are split at sentence boundaries into chunks that fit the
+summarization model's input window (map), the chunk summaries are joined and
+summarized again until a single summary remains (reduce). All chunks, from
+every concurrent request, go through one batcher thread that groups them
+into shared batched forward passes.
+"""
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import STAGE_SECONDS
+from models import registry
+
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "900"))
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "8"))
+# How long the batcher waits for more chunks before running a partial batch
+SUMMARY_BATCH_WAIT_MS = int(os.getenv("SUMMARY_BATCH_WAIT_MS", "50"))
+SUMMARY_MAX_LEVELS = 5
+
+# Generation settings for chunk summaries (map) and the final summary (reduce)
+MAP_PARAMS = (("max_length", 120), ("min_length", 20))
+FINAL_PARAMS = (("max_length", 150), ("min_length", 30))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class SummarizationEngine:
+    """Map-reduce summarizer with cross-request batching"""
+
+    def __init__(self, chunk_tokens=SUMMARY_CHUNK_TOKENS, batch_size=SUMMARY_BATCH_SIZE,
+                 batch_wait_ms=SUMMARY_BATCH_WAIT_MS):
+        self.chunk_tokens = chunk_tokens
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"chunks": 0, "batches": 0, "busy_seconds": 0.0}
+
+    # ---- chunking ----
+
+    def _count_tokens(self, text):
+        tokenizer = getattr(registry.get("summarizer"), "tokenizer", None)
+        if tokenizer is None:
+            # Roughly 1.3 tokens per word for English BPE vocabularies
+            return int(len(text.split()) * 1.3) + 1
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def chunk(self, text):
+        """Split text into sentence-aligned chunks of at most chunk_tokens tokens"""
+        chunks = []
+        current, current_tokens = [], 0
+        for sentence in _SENTENCE_END.split(text.strip()):
+            if not sentence:
+                continue
+            tokens = self._count_tokens(sentence)
+            if tokens > self.chunk_tokens:
+                # A single run-on "sentence" longer than the window: cut it by words
+                words = sentence.split()
+                step = max(1, int(len(words) * self.chunk_tokens / tokens))
+                pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            else:
+                pieces = [sentence]
+            for piece in pieces:
+                piece_tokens = tokens if len(pieces) == 1 else self._count_tokens(piece)
+                if current and current_tokens + piece_tokens > self.chunk_tokens:
+                    chunks.append(" ".join(current))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += piece_tokens
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    # ---- batching ----
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="summarization-batcher", daemon=True)
+                self._thread.start()
+
+    def _submit(self, texts, params):
+        self._ensure_started()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, params, future))
+            futures.append(future)
+        return [f.result() for f in futures]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
+            for params, items in groups.items():
+                self._run_batch(params, items)
+
+    def _run_batch(self, params, items):
+        started = time.perf_counter()
+        try:
+            summarizer = registry.get("summarizer")
+            outputs = summarizer(
+                [text for text, _, _ in items],
+                batch_size=len(items),
+                truncation=True,
+                do_sample=False,
+                **dict(params)
+            )
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, pipeline="summarize", stage="batch")
+        with self._stats_lock:
+            self._stats["chunks"] += len(items)
+            self._stats["batches"] += 1
+            self._stats["busy_seconds"] += elapsed
+        for (_, _, future), output in zip(items, outputs):
+            future.set_result(output["summary_text"])
+
+    # ---- map-reduce ----
+
+    def summarize(self, text):
+        """Summarize text of any length; returns (summary_text, run statistics)"""
+        started = time.perf_counter()
+        chunks = self.chunk(text)
+        total_chunks = len(chunks)
+        levels = 0
+
+        while len(chunks) > 1 and levels < SUMMARY_MAX_LEVELS:
+            with STAGE_SECONDS.time(pipeline="summarize", stage="map"):
+                partials = self._submit(chunks, MAP_PARAMS)
+            levels += 1
+            chunks = self.chunk(" ".join(partials))
+            total_chunks += len(chunks)
+
+        with STAGE_SECONDS.time(pipeline="summarize", stage="reduce"):
+            summary = self._submit([" ".join(chunks)], FINAL_PARAMS)[0]
+        elapsed = time.perf_counter() - started
+        return summary, {
+            "chunks": total_chunks,
+            "reduce_levels": levels,
+            "seconds": round(elapsed, 3),
+            "chunks_per_sec": round(total_chunks / elapsed, 2) if elapsed else 0.0
+        }
+
+    def stats(self):
+        """Engine-wide throughput across all requests"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        busy = stats["busy_seconds"]
+        stats["chunks_per_sec"] = round(stats["chunks"] / busy, 2) if busy else 0.0
+        stats["avg_batch_size"] = round(stats["chunks"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["busy_seconds"] = round(busy, 3)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+engine = SummarizationEngine()
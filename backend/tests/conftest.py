@@ -0,0 +1,10 @@
+"""
+The backend modules are imported as top-level modules, as gunicorn and
+`python backend/app.py` do (see gunicorn.conf.py).
+"""
+import os
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
@@ -0,0 +1,168 @@
+"""
+Chunked transcription (chunking.py): splitting at silence, stitching the
+chunks back together, and the chunk pool's size and failure handling.
+"""
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+import chunking
+from models import WHISPER_MODEL_MB
+
+SR = 1000
+
+
+def noisy(seconds, silences=()):
+    """Loud noise with silent (start, end) spans, in seconds"""
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, int(seconds * SR)).astype(np.float32)
+    for start, end in silences:
+        audio[int(start * SR):int(end * SR)] = 0
+    return audio
+
+
+def test_splits_at_the_quietest_point_near_each_mark():
+    audio = noisy(30, silences=[(9.0, 9.2), (20.0, 20.2)])
+    points = chunking.find_split_points(audio, SR, chunk_seconds=10, search_seconds=2)
+    assert len(points) == 2
+    assert 9.0 * SR <= points[0] < 9.2 * SR
+    assert 20.0 * SR <= points[1] < 20.2 * SR
+
+
+def test_short_audio_is_not_split():
+    assert chunking.find_split_points(noisy(11), SR, chunk_seconds=10, search_seconds=2) == []
+    assert chunking.find_split_points(np.zeros(0, dtype=np.float32), SR) == []
+
+
+def test_split_points_stay_within_the_search_window():
+    # No silence at all: still one split per chunk_seconds, give or take search_seconds
+    points = chunking.find_split_points(noisy(60), SR, chunk_seconds=10, search_seconds=2)
+    assert len(points) >= 4
+    assert 8 * SR <= points[0] <= 12.1 * SR
+    assert all(8 * SR <= gap <= 12 * SR for gap in np.diff(points))
+
+
+def test_chunks_overlap_and_cover_the_audio():
+    audio = noisy(30, silences=[(9.0, 9.2), (20.0, 20.2)])
+    points = chunking.find_split_points(audio, SR, chunk_seconds=10)
+    chunks = chunking.split_audio(audio, SR, chunk_seconds=10, overlap_seconds=1)
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0
+    for (offset, samples), point in zip(chunks[1:], points):
+        assert offset == (point - SR) / SR
+        assert np.array_equal(samples, audio[point - SR:point - SR + len(samples)])
+    # Without the overlaps, the chunks are the audio again
+    rebuilt = [chunks[0][1]] + [samples[SR:] for _, samples in chunks[1:]]
+    assert np.array_equal(np.concatenate(rebuilt), audio)
+
+
+def test_unsplit_audio_is_one_chunk():
+    audio = noisy(5)
+    [(offset, samples)] = chunking.split_audio(audio, SR, chunk_seconds=10, overlap_seconds=1)
+    assert offset == 0 and np.array_equal(samples, audio)
+
+
+def segment(start, end, text):
+    return {"start": start, "end": end, "text": " " + text}
+
+
+def test_stitching_drops_words_heard_twice_in_the_overlap():
+    stitched = chunking.stitch_segments([
+        (0.0, [segment(0, 5, "Good morning everyone"), segment(5, 10, "let's review the budget")]),
+        # This chunk starts 1 s before the split at 10 s
+        (9.0, [segment(0, 0.8, "budget"), segment(0.5, 4, "the budget. First item"), segment(4, 8, "is travel")]),
+    ])
+    assert stitched == [
+        segment(0, 5, "Good morning everyone"),
+        segment(5, 10, "let's review the budget"),
+        segment(10, 13, "First item"),
+        segment(13, 17, "is travel"),
+    ]
+
+
+def test_stitching_keeps_new_words_in_a_straddling_segment():
+    stitched = chunking.stitch_segments([
+        (0.0, [segment(0, 10, "we agreed to")]),
+        (9.0, [segment(0.2, 3, "ship it on Friday")]),
+    ])
+    assert stitched[1] == segment(10, 12, "ship it on Friday")
+
+
+def test_stitching_skips_empty_text_and_matches_words_loosely():
+    stitched = chunking.stitch_segments([
+        (0.0, [segment(0, 10, "Thanks, everyone.")]),
+        (9.0, [segment(0.5, 2, "thanks everyone"), segment(2, 3, ""), segment(3, 5, "Bye.")]),
+    ])
+    assert [s["text"] for s in stitched] == [" Thanks, everyone.", " Bye."]
+
+
+# ===========================
+# POOL
+# ===========================
+
+def test_pool_size_shares_the_job_workers_cores(monkeypatch):
+    monkeypatch.setattr(chunking, "CORES_PER_JOB_WORKER", 8)
+    monkeypatch.setattr(chunking, "MAX_PARALLELISM", 8)
+    assert chunking.pool_size("base", 4, memory_budget_mb=0) == (4, 2)
+    assert chunking.pool_size("base", 3, memory_budget_mb=0) == (3, 2)
+    # Never more processes than the worker's share of the cores
+    assert chunking.pool_size("base", 32, memory_budget_mb=0) == (8, 1)
+
+
+def test_pool_size_fits_the_model_copies_in_the_memory_budget(monkeypatch):
+    monkeypatch.setattr(chunking, "CORES_PER_JOB_WORKER", 16)
+    monkeypatch.setattr(chunking, "MAX_PARALLELISM", 16)
+    small_mb = WHISPER_MODEL_MB["small"]
+    assert chunking.pool_size("small", 16, memory_budget_mb=small_mb * 3.5) == (3, 5)
+    # At least one process, however small the budget
+    assert chunking.pool_size("small", 16, memory_budget_mb=1) == (1, 16)
+
+
+class _Pool:
+    """Stands in for a ProcessPoolExecutor whose processes died or whose chunks fail"""
+
+    def __init__(self, error):
+        self.error = error
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, fn, samples):
+        future = Future()
+        if not self.futures:
+            future.set_exception(self.error)
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_a_broken_pool_is_replaced(monkeypatch):
+    pool = _Pool(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+    monkeypatch.setattr(chunking, "_executor", pool)
+    monkeypatch.setattr(chunking, "_executor_key", ("base", 1))
+    monkeypatch.setattr(chunking, "pool_size", lambda model_name, parallelism: (1, 1))
+
+    with pytest.raises(BrokenProcessPool):
+        chunking.transcribe_chunked(noisy(3), "base", chunk_seconds=1, parallelism=1)
+    assert pool.shut_down
+    assert chunking._executor is None
+
+
+def test_a_failed_chunk_cancels_the_rest(monkeypatch):
+    pool = _Pool(RuntimeError("out of memory"))
+    monkeypatch.setattr(chunking, "_executor", pool)
+    monkeypatch.setattr(chunking, "_executor_key", ("base", 1))
+    monkeypatch.setattr(chunking, "pool_size", lambda model_name, parallelism: (1, 1))
+    monkeypatch.setattr(chunking, "SAMPLE_RATE", SR)
+
+    with pytest.raises(RuntimeError):
+        chunking.transcribe_chunked(noisy(30, silences=[(9.0, 9.2), (20.0, 20.2)]), "base", chunk_seconds=10,
+                                    parallelism=1)
+    assert len(pool.futures) == 3
+    assert all(future.cancelled() for future in pool.futures[1:])
+    # Only a broken pool is dropped
+    assert chunking._executor is pool
@@ -0,0 +1,69 @@
+"""
+Cold start budget: importing app and calling create_app() must stay fast and
+must not import the ML stack or wait for MongoDB (see services.py).
+
+Each start runs in a fresh interpreter, in a temporary working directory so
+the uploads/ folder and SQLite files it creates are thrown away.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+# Imported on first use only (the same list as benchmarks/run.py)
+DEFERRED_MODULES = ("numpy", "pymongo", "requests", "docx", "spacy", "torch", "transformers", "whisper")
+# Nothing listens on the discard port
+UNREACHABLE_MONGO_URL = "mongodb://127.0.0.1:9"
+REPEATS = 3
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+app.create_app()
+print(json.dumps({"seconds": time.perf_counter() - started, "loaded": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+def start_app(cwd, **env):
+    """Import app and call create_app() in a fresh interpreter; returns {"seconds", "loaded"}"""
+    env = dict(os.environ, MONGO_URL=UNREACHABLE_MONGO_URL, **env,
+               PYTHONPATH=os.pathsep.join(filter(None, [BACKEND, os.environ.get("PYTHONPATH")])))
+    env.pop("MODEL_PRELOAD", None)
+    child = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, *DEFERRED_MODULES], cwd=cwd, env=env,
+                           capture_output=True, text=True, timeout=120)
+    assert child.returncode == 0, f"create_app() failed:\n{child.stderr[-2000:]}"
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def median_start(cwd, **env):
+    # The first start writes the bytecode and warms the disk cache
+    start_app(cwd, **env)
+    reports = [start_app(cwd, **env) for _ in range(REPEATS)]
+    loaded = sorted(set(m for report in reports for m in report["loaded"]))
+    return statistics.median(report["seconds"] for report in reports), loaded
+
+
+def test_startup_with_mongodb_unreachable(tmp_path):
+    """auto storage falls back to SQLite without waiting and without importing the deferred modules"""
+    seconds, loaded = median_start(tmp_path, STORAGE_BACKEND="auto")
+    assert loaded == [], f"create_app() imported {', '.join(loaded)}, which must only be imported on first use"
+    assert seconds <= STARTUP_BUDGET_SECONDS, (
+        f"create_app() took {seconds:.3f}s, over the {STARTUP_BUDGET_SECONDS}s budget (STARTUP_BUDGET_SECONDS)"
+    )
+
+
+def test_startup_does_not_wait_for_mongodb(tmp_path):
+    """With STORAGE_BACKEND=mongo the client is created but the indexes are built in the background"""
+    pytest.importorskip("pymongo")
+    seconds, loaded = median_start(tmp_path, STORAGE_BACKEND="mongo")
+    loaded = [m for m in loaded if m != "pymongo"]
+    assert loaded == [], f"create_app() imported {', '.join(loaded)}, which must only be imported on first use"
+    assert seconds <= STARTUP_BUDGET_SECONDS, (
+        f"create_app() took {seconds:.3f}s with MongoDB down, over the {STARTUP_BUDGET_SECONDS}s budget"
+    )
@@ -0,0 +1,146 @@
+"""
+Live transcription (streaming.py): the rolling window and its denoiser.
+
+Whisper is replaced by a fake that returns scripted segments, with times
+relative to the window it is given, as Whisper's are.
+"""
+import numpy as np
+
+from denoise import Denoiser
+from streaming import StreamingTranscriber
+
+SR = 16000
+
+
+def tone(seconds, hz=220, level=0.3):
+    t = np.arange(int(seconds * SR)) / SR
+    return (level * np.sin(2 * np.pi * hz * t)).astype(np.float32)
+
+
+def rms(samples):
+    return float(np.sqrt(np.mean(np.square(samples))))
+
+
+def feed_frames(denoiser, audio, frame_seconds=0.1):
+    frame = int(frame_seconds * SR)
+    return np.concatenate([denoiser.feed(audio[i:i + frame]) for i in range(0, len(audio), frame)])
+
+
+def test_small_frames_are_not_gated_before_the_warm_up():
+    # The start of a stream is often all speech: without a warm-up it is taken for the noise
+    speech = tone(2)
+    cold = feed_frames(Denoiser("stationary", SR), speech)
+    assert rms(cold) < 0.2 * rms(speech)
+
+    warm = feed_frames(Denoiser("stationary", SR, min_history_seconds=3), speech)
+    assert len(warm) > SR
+    np.testing.assert_allclose(warm, speech[:len(warm)], atol=1e-4)
+
+
+def test_warm_up_does_not_drop_or_delay_audio():
+    audio = np.concatenate([tone(4), np.random.default_rng(0).normal(0, 0.01, 2 * SR).astype(np.float32)])
+    denoiser = Denoiser("stationary", SR, min_history_seconds=3)
+    out = np.concatenate([feed_frames(denoiser, audio), denoiser.flush()])
+    assert len(out) == len(audio)
+    np.testing.assert_allclose(out[:2 * SR], audio[:2 * SR], atol=1e-4)
+
+
+class FakeWhisper:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def __call__(self, samples, prompt):
+        self.calls.append((len(samples) / SR, prompt))
+        return {"segments": [{"start": start, "end": end, "text": " " + text}
+                             for start, end, text in self.results.pop(0)]}
+
+
+def pcm(samples):
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+def stream(whisper, **kwargs):
+    return StreamingTranscriber(whisper, step_seconds=2, **kwargs)
+
+
+def times(segments):
+    return [(s["start"], s["end"], s["text"].strip()) for s in segments]
+
+
+def test_all_but_the_last_segment_are_final():
+    whisper = FakeWhisper(
+        [(0, 1.2, "Good morning."), (1.2, 2.5, "Let's start."), (2.5, 3, "First")],
+        # The next window starts where "Let's start." ended, 2.5 s into the stream
+        [(0, 1.0, "First item:"), (1.0, 2.5, "the budget")],
+    )
+    session = stream(whisper)
+
+    session.feed(pcm(tone(1)))
+    assert session.step() == [] and whisper.calls == []
+
+    session.feed(pcm(tone(2)))
+    final, partial = session.step()
+    assert final["type"] == "final"
+    assert times(final["segments"]) == [(0, 1.2, "Good morning."), (1.2, 2.5, "Let's start.")]
+    assert partial == {"type": "partial", "segments": [{"start": 2.5, "end": 3, "text": " First"}]}
+    # The finalized audio is dropped from the window
+    assert len(session._window) == int(0.5 * SR)
+
+    session.feed(pcm(tone(2)))
+    final, partial = session.step()
+    assert whisper.calls[1] == (2.5, "Good morning. Let's start.")
+    assert times(final["segments"]) == [(2.5, 3.5, "First item:")]
+    assert times(partial["segments"]) == [(3.5, 5.0, "the budget")]
+    assert session.text == "Good morning. Let's start. First item:"
+
+
+def test_a_full_window_is_finalized_whole():
+    whisper = FakeWhisper([(0, 2, "We never"), (2, 4, "stop talking")], [(0, 1, "at all")])
+    session = stream(whisper, window_seconds=4)
+
+    session.feed(pcm(tone(4)))
+    final, partial = session.step()
+    assert times(final["segments"]) == [(0, 2, "We never"), (2, 4, "stop talking")]
+    assert partial == {"type": "partial", "segments": []}
+    assert len(session._window) == 0
+
+    session.feed(pcm(tone(1)))
+    [final] = session.finish()
+    assert times(final["segments"]) == [(4, 5, "at all")]
+    assert session.partial == []
+
+
+def test_a_window_without_segments_keeps_its_audio():
+    whisper = FakeWhisper([], [(0, 4, "Hello there")])
+    session = stream(whisper)
+    session.feed(pcm(tone(2)))
+    assert session.step() == [{"type": "partial", "segments": []}]
+
+    session.feed(pcm(tone(2)))
+    [final] = session.finish()
+    assert whisper.calls[1][0] == 4
+    assert times(final["segments"]) == [(0, 4, "Hello there")]
+
+
+def test_a_muted_microphone_is_skipped():
+    whisper = FakeWhisper([(0, 1, "Are you there?")])
+    session = stream(whisper)
+    session.feed(pcm(np.zeros(3 * SR, dtype=np.float32)))
+    assert session.step() == [{"type": "partial", "segments": []}]
+    assert whisper.calls == [] and len(session._window) == 0
+
+    session.feed(pcm(tone(2)))
+    [final] = session.finish()
+    assert times(final["segments"]) == [(3, 4, "Are you there?")]
+
+
+def test_frames_may_split_samples():
+    whisper = FakeWhisper([(0, 2, "Testing")])
+    session = stream(whisper)
+    data = pcm(tone(2))
+    for i in range(0, len(data), 333):
+        session.feed(data[i:i + 333])
+    assert session.duration == 2
+    [partial] = session.step()
+    assert times(partial["segments"]) == [(0, 2, "Testing")]
@@ -0,0 +1,282 @@
+"""
+Resumable upload sessions (upload_sessions.py and the /uploads routes):
+
+  open --complete--> assembling --queued (2xx)--> complete
+                         |
+                         +-- assembly failed --> open
+                         +-- queueing failed --> stored --complete--> assembling
+"""
+import errno
+import hashlib
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+import upload_sessions
+from upload_sessions import (ASSEMBLING, COMPLETE, OPEN, STORED, UploadConflict, UploadIncomplete,
+                             UploadSessions)
+
+CHUNK = upload_sessions.UPLOAD_SESSION_MIN_CHUNK_BYTES
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    return UploadSessions(str(tmp_path / "sessions.sqlite3"), str(tmp_path / "sessions"))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    path = tmp_path / "uploads"
+    path.mkdir()
+    return str(path)
+
+
+def audio(size=CHUNK * 2 + 1000):
+    return os.urandom(size)
+
+
+def chunks_of(data):
+    return [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+
+
+def upload(sessions, data, user_id="u1"):
+    session = sessions.create(user_id, "meeting.wav", len(data), CHUNK)
+    for index, chunk in enumerate(chunks_of(data)):
+        sessions.put(session, index, io.BytesIO(chunk))
+    return sessions.get(session["id"], user_id)
+
+
+def lease(sessions, session, index, started_at):
+    """A chunk_writes row, as left by a put() that is still running (or died)"""
+    with sessions._connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO chunk_writes (session_id, idx, started_at) VALUES (?, ?, ?)",
+                     (session["id"], index, started_at))
+
+
+def status(sessions, session):
+    return sessions.get(session["id"], session["user_id"])["status"]
+
+
+def test_complete_stores_the_file_under_its_sha256(sessions, folder):
+    data = audio()
+    session = upload(sessions, data)
+    assert session["status"] == OPEN and session["received"] == [0, 1, 2]
+
+    audio_hash, path = sessions.complete(session, folder, hashlib.sha256(data).hexdigest())
+
+    assert audio_hash == hashlib.sha256(data).hexdigest()
+    assert path.endswith(audio_hash + ".wav") and open(path, "rb").read() == data
+    assert not os.path.exists(sessions.data_path(session["id"]))
+    assert status(sessions, session) == ASSEMBLING
+
+    sessions.finish(session["id"], {"job_id": "j1"}, 202)
+    assert sessions.get(session["id"], "u1")["status"] == COMPLETE
+    assert sessions.get(session["id"], "u1")["result"] == {"body": {"job_id": "j1"}, "status_code": 202}
+
+
+def test_chunks_may_arrive_in_any_order_and_be_resent(sessions, folder):
+    data = audio()
+    chunks = chunks_of(data)
+    session = sessions.create("u1", "meeting.wav", len(data), CHUNK)
+    for index in (2, 0):
+        sessions.put(session, index, io.BytesIO(chunks[index]))
+    sessions.put(session, 0, io.BytesIO(b"x" * CHUNK))
+    sessions.put(session, 0, io.BytesIO(chunks[0]))
+
+    with pytest.raises(UploadIncomplete) as missing:
+        sessions.complete(session, folder)
+    assert missing.value.missing == [1]
+    assert status(sessions, session) == OPEN
+
+    sessions.put(session, 1, io.BytesIO(chunks[1]))
+    _, path = sessions.complete(session, folder)
+    assert open(path, "rb").read() == data
+
+
+def test_bad_chunks_count_as_missing(sessions):
+    data = audio()
+    session = sessions.create("u1", "meeting.wav", len(data), CHUNK)
+    with pytest.raises(ValueError):
+        sessions.put(session, 0, io.BytesIO(b"short"))
+    with pytest.raises(ValueError):
+        sessions.put(session, 0, io.BytesIO(data[:CHUNK]), expected_sha256="00" * 32)
+    with pytest.raises(ValueError):
+        sessions.put(session, 3, io.BytesIO(b""))
+    assert sessions.get(session["id"], "u1")["received"] == []
+
+
+def test_hash_mismatch_reopens_the_session(sessions, folder):
+    session = upload(sessions, audio())
+    with pytest.raises(ValueError):
+        sessions.complete(session, folder, "00" * 32)
+    assert status(sessions, session) == OPEN
+    assert os.path.exists(sessions.data_path(session["id"]))
+
+
+def test_failed_move_reopens_the_session(sessions, folder, monkeypatch):
+    data = audio()
+    session = upload(sessions, data)
+
+    def disk_full(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(upload_sessions, "save_file", disk_full)
+    with pytest.raises(OSError):
+        sessions.complete(session, folder)
+    assert status(sessions, session) == OPEN
+
+    monkeypatch.undo()
+    _, path = sessions.complete(session, folder)
+    assert open(path, "rb").read() == data
+
+
+def test_move_across_filesystems_copies(sessions, folder, monkeypatch):
+    import uploads
+    data = audio()
+    session = upload(sessions, data)
+    replace = os.replace
+
+    def cross_device(src, dst):
+        if src == sessions.data_path(session["id"]):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return replace(src, dst)
+
+    monkeypatch.setattr(uploads.os, "replace", cross_device)
+    _, path = sessions.complete(session, folder)
+    assert open(path, "rb").read() == data
+    assert not os.path.exists(sessions.data_path(session["id"]))
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".part")]
+
+
+def test_only_one_completion_wins(sessions, folder):
+    session = upload(sessions, audio())
+    sessions.complete(session, folder)
+    with pytest.raises(UploadConflict):
+        sessions.complete(session, folder)
+    with pytest.raises(UploadConflict):
+        sessions.put(session, 0, io.BytesIO(b"x" * CHUNK))
+
+
+def test_stored_upload_is_resumed_once(sessions, folder):
+    session = upload(sessions, audio())
+    audio_hash, path = sessions.complete(session, folder)
+    sessions.stored(session["id"], audio_hash, path)
+    assert status(sessions, session) == STORED
+
+    assert sessions.resume(session) == (audio_hash, path)
+    assert status(sessions, session) == ASSEMBLING
+    with pytest.raises(UploadConflict):
+        sessions.resume(session)
+
+
+def test_duplicate_chunk_while_leased_is_a_conflict(sessions, folder):
+    data = audio()
+    session = sessions.create("u1", "meeting.wav", len(data), CHUNK)
+    lease(sessions, session, 0, datetime.utcnow().isoformat())
+    with pytest.raises(UploadConflict):
+        sessions.put(session, 0, io.BytesIO(data[:CHUNK]))
+    # Other chunks are not held up
+    sessions.put(session, 1, io.BytesIO(data[CHUNK:2 * CHUNK]))
+
+
+def test_leased_chunk_blocks_completion(sessions, folder):
+    session = upload(sessions, audio())
+    # put() drops the chunk's row when it takes the lease
+    with sessions._connect() as conn:
+        conn.execute("DELETE FROM chunks WHERE session_id = ? AND idx = 1", (session["id"],))
+    lease(sessions, session, 1, datetime.utcnow().isoformat())
+    with pytest.raises(UploadIncomplete) as missing:
+        sessions.complete(session, folder)
+    assert missing.value.missing == [1]
+
+
+def test_expired_lease_can_be_taken_over(sessions, monkeypatch):
+    data = audio()
+    session = sessions.create("u1", "meeting.wav", len(data), CHUNK)
+    lease(sessions, session, 0, "2000-01-01T00:00:00")
+    sessions.put(session, 0, io.BytesIO(data[:CHUNK]))
+    assert sessions.get(session["id"], "u1")["received"] == [0]
+
+    monkeypatch.setattr(upload_sessions, "UPLOAD_SESSION_WRITE_TIMEOUT", 0)
+    lease(sessions, session, 1, datetime.utcnow().isoformat())
+    sessions.put(session, 1, io.BytesIO(data[CHUNK:2 * CHUNK]))
+
+
+def test_expired_sessions_are_purged(sessions):
+    session = sessions.create("u1", "meeting.wav", CHUNK, CHUNK)
+    with sessions._connect() as conn:
+        conn.execute("UPDATE sessions SET expires_at = '2000-01-01' WHERE id = ?", (session["id"],))
+    assert sessions.get(session["id"], "u1") is None
+    assert sessions.purge_expired() == 1
+    assert not os.path.exists(sessions.data_path(session["id"]))
+
+
+# ===========================
+# /uploads ROUTES
+# ===========================
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """The app, serving from a temporary working directory (uploads/ and the SQLite files)"""
+    cwd, storage_backend = os.getcwd(), os.environ.get("STORAGE_BACKEND")
+    os.chdir(tmp_path_factory.mktemp("app"))
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    try:
+        import app
+        client = app.create_app({"TESTING": True}).test_client()
+        client.post("/register", json={"name": "U", "email": "u@example.com", "password": "Passw0rd!x"})
+        token = client.post("/login", json={"email": "u@example.com", "password": "Passw0rd!x"}).get_json()["token"]
+        client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        yield client
+    finally:
+        os.chdir(cwd)
+        if storage_backend is None:
+            os.environ.pop("STORAGE_BACKEND", None)
+        else:
+            os.environ["STORAGE_BACKEND"] = storage_backend
+
+
+def send(client, data):
+    upload_id = client.post("/uploads", json={"filename": "a.wav", "size": len(data), "chunk_size": CHUNK,
+                                              "options": {"vad": "false"}}).get_json()["upload_id"]
+    for index, chunk in enumerate(chunks_of(data)):
+        response = client.put(f"/uploads/{upload_id}/chunks/{index}", data=chunk,
+                              content_type="application/octet-stream")
+        assert response.status_code == 200
+    return upload_id
+
+
+def test_failed_queueing_is_retried_without_the_upload(client, monkeypatch):
+    from routes import transcribe
+
+    upload_id = send(client, audio())
+
+    def queue_down(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(transcribe.job_queue, "enqueue", queue_down)
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 500
+    assert client.get(f"/uploads/{upload_id}").get_json()["status"] == STORED
+
+    monkeypatch.undo()
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert client.get(f"/uploads/{upload_id}").get_json()["status"] == COMPLETE
+
+    # A lost answer is asked again
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 202 and response.get_json()["job_id"] == job_id
+
+
+def test_complete_with_missing_chunks_is_a_conflict(client):
+    data = audio()
+    upload_id = client.post("/uploads", json={"filename": "a.wav", "size": len(data),
+                                              "chunk_size": CHUNK}).get_json()["upload_id"]
+    client.put(f"/uploads/{upload_id}/chunks/1", data=data[CHUNK:2 * CHUNK], content_type="application/octet-stream")
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 409 and response.get_json()["missing"] == [0, 2]
+    assert client.get(f"/uploads/{upload_id}").get_json()["status"] == OPEN
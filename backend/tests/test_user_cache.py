@@ -0,0 +1,89 @@
+"""
+User cache (user_cache.py): invalidations shared through the log, and the
+log's compaction. Two caches on one log stand in for two processes.
+"""
+import os
+import time
+
+import pytest
+
+import user_cache
+from user_cache import UserCache
+
+
+class Users:
+    """Loader counting the lookups that reach the database"""
+
+    def __init__(self):
+        self.roles = {"u1": "user", "u2": "user"}
+        self.loads = 0
+
+    def __call__(self, user_id):
+        self.loads += 1
+        return {"_id": user_id, "role": self.roles[user_id]}
+
+
+@pytest.fixture
+def log(tmp_path):
+    return str(tmp_path / "user_invalidations.log")
+
+
+def test_invalidation_reaches_the_other_processes(log):
+    users = Users()
+    first, second = UserCache(users, invalidation_log=log), UserCache(users, invalidation_log=log)
+    assert second.get("u1")["role"] == "user"
+
+    users.roles["u1"] = "admin"
+    first.invalidate("u1")
+    assert second.get("u1")["role"] == "admin"
+    assert second.get("u1")["role"] == "admin"
+    assert users.loads == 2
+
+
+def test_a_new_process_skips_nothing_it_needs(log):
+    users = Users()
+    UserCache(users, trust_role_seconds=60, invalidation_log=log).invalidate("u1")
+    late = UserCache(users, trust_role_seconds=60, invalidation_log=log)
+    token = {"user_id": "u1", "role": "admin", "iat": time.time() - 5}
+    # Issued before the invalidation: the claim is not trusted
+    assert late.role(token) == "user"
+
+
+@pytest.mark.skipif(user_cache.fcntl is None, reason="the log is only compacted where file locks are available")
+def test_log_is_compacted_without_losing_recent_invalidations(log, monkeypatch):
+    monkeypatch.setattr(user_cache, "USER_CACHE_INVALIDATIONS_MAX_BYTES", 1024)
+    users = Users()
+    writer = UserCache(users, ttl=60, invalidation_log=log)
+    reader = UserCache(users, ttl=60, invalidation_log=log)
+    # A long history nobody needs any more
+    with open(log, "w") as f:
+        f.writelines(f"{time.time() - 3600:.6f} old-{i}\n" for i in range(100))
+    reader.get("u2")
+    inode = os.stat(log).st_ino
+
+    writer.invalidate("u2")
+
+    with open(log) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1 and lines[0].endswith(" u2")
+    assert os.stat(log).st_ino != inode
+    # The reader had read past the old lines; it reads the new log from the start
+    users.roles["u2"] = "admin"
+    assert reader.get("u2")["role"] == "admin"
+
+    writer.invalidate("u1")
+    reader.get("u1")
+    users.roles["u1"] = "admin"
+    writer.invalidate("u1")
+    assert reader.get("u1")["role"] == "admin"
+
+
+@pytest.mark.skipif(user_cache.fcntl is None, reason="the log is only compacted where file locks are available")
+def test_compaction_keeps_the_role_claim_window(log, monkeypatch):
+    monkeypatch.setattr(user_cache, "USER_CACHE_INVALIDATIONS_MAX_BYTES", 0)
+    cache = UserCache(Users(), ttl=60, trust_role_seconds=600, invalidation_log=log)
+    with open(log, "w") as f:
+        f.write(f"{time.time() - 300:.6f} u1\n{time.time() - 900:.6f} u2\n")
+    cache.invalidate("u3")
+    with open(log) as f:
+        assert [line.split()[1] for line in f] == ["u1", "u3"]
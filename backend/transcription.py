@@ -0,0 +1,226 @@
+"""
+The Whisper transcription pipeline.
+
+Used by the job workers (see jobs.py). Each worker process loads Whisper
+models through its own model registry and lazily opens its own storage
+backend (see storage.py), reusing both for every job it runs.
+"""
+import os
+import time
+from datetime import datetime
+
+from metrics import STAGE_SECONDS
+from models import registry
+
+PREVIEW_CHARS = 200
+# Models each job worker loads before taking its first job, e.g. "whisper:base"
+WORKER_MODEL_PRELOAD = os.getenv("WORKER_MODEL_PRELOAD", "")
+
+# Per-process state
+_storage = None
+
+
+def make_preview(text):
+    """Short leading excerpt of a transcript, stored for list views"""
+    text = (text or "").strip()
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS].rstrip() + "…"
+
+
+def extract_segments(result):
+    """Extract segments with timestamps from Whisper result"""
+    segments = []
+    if "segments" in result:
+        for segment in result["segments"]:
+            segments.append({
+                "start": segment.get("start"),
+                "end": segment.get("end"),
+                "text": segment.get("text")
+            })
+    return segments
+
+
+def init_worker():
+    """Job worker start-up hook: warm up the configured models"""
+    registry.warm_up(WORKER_MODEL_PRELOAD, background=False)
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        from storage import open_storage
+        _storage = open_storage()
+    return _storage
+
+
+def transcribe_file(filepath, denoise=None, progress=None, model_name=None, chunked=False,
+                    chunk_seconds=None, parallelism=None, timings=None, vad=False, speech=None):
+    """Decode an audio file (optionally denoised) and run Whisper over it; returns (text, segments).
+
+    `denoise` is a method of denoise.py or None. The audio is decoded once
+    into memory at 16 kHz and handed to Whisper as an array. With `vad`,
+    only the speech spans are transcribed (see vad.py), segment times still
+    refer to the whole file and the speech ratio and time saved are stored
+    in the `speech` dict. With `chunked`, long audio is split at silence and
+    transcribed in parallel (see chunking.py). Seconds per stage are added
+    to the `timings` dict.
+    """
+    from audio import load_audio
+
+    progress = progress or (lambda value, stage=None: None)
+    timings = {} if timings is None else timings
+    model_name = registry.resolve("whisper", model_name)
+
+    progress(0.1, "denoising" if denoise else "decoding")
+    audio = load_audio(filepath, denoise, timings=timings)
+
+    speech_map = None
+    if vad:
+        from vad import SpeechMap
+        progress(0.15, "detecting_speech")
+        started = time.perf_counter()
+        speech_map = SpeechMap.detect(audio)
+        audio = speech_map.compact(audio)
+        timings["vad"] = time.perf_counter() - started
+
+    if speech_map is not None and not len(audio):
+        # Nothing to transcribe (and Whisper tends to invent text for silence)
+        text, segments = "", []
+    elif chunked:
+        import chunking
+        progress(0.2, "transcribing")
+        started = time.perf_counter()
+        text, segments = chunking.transcribe_chunked(
+            audio,
+            model_name,
+            chunk_seconds=chunk_seconds or chunking.CHUNK_SECONDS,
+            parallelism=parallelism or chunking.MAX_PARALLELISM,
+            progress=progress
+        )
+        timings["transcribe"] = time.perf_counter() - started
+    else:
+        progress(0.2, "loading_model")
+        started = time.perf_counter()
+        with registry.use("whisper", model_name) as whisper_model:
+            timings["load_model"] = time.perf_counter() - started
+            progress(0.3, "transcribing")
+            started = time.perf_counter()
+            result = whisper_model.transcribe(audio)
+            timings["transcribe"] = time.perf_counter() - started
+        text, segments = result["text"], extract_segments(result)
+
+    if speech_map is not None:
+        segments = speech_map.remap_segments(segments)
+        if speech is not None:
+            speech.update(speech_map.report(timings.get("transcribe", 0.0)))
+    return text, segments
+
+
+def index_transcription(transcription_id, doc):
+    """Add a new transcription to the segment search index; a failure only logs a warning"""
+    from search_index import SegmentIndex
+
+    try:
+        SegmentIndex().add(transcription_id, doc["user_id"], doc["filename"], doc["created_at"],
+                           doc["segments"], doc["transcription"])
+    except Exception as e:
+        print(f"Warning: could not index transcription {transcription_id} for search: {e}")
+
+
+def run_transcription_job(job, progress):
+    """Job handler: transcribe the uploaded file and store the transcription document"""
+    from result_cache import TranscriptionCache
+
+    from denoise import resolve_method
+
+    payload = job["payload"]
+    user_id = payload["user_id"]
+    # Jobs queued by older versions carry a true/false flag
+    denoise = resolve_method(payload.get("denoise"))
+    vad = payload.get("vad", False)
+    cache = TranscriptionCache()
+    cache_key = payload.get("cache_key")
+    timings = {}
+    speech = {}
+
+    # An identical upload may have finished while this job was queued (the
+    # upload's own lookup already counted the miss)
+    cached = cache.get(cache_key, count=False) if cache_key else None
+    if cached:
+        text, segments = cached["transcription"], cached["segments"]
+    else:
+        text, segments = transcribe_file(
+            payload["filepath"],
+            denoise,
+            progress,
+            model_name=payload.get("model"),
+            chunked=payload.get("chunked", False),
+            chunk_seconds=payload.get("chunk_seconds"),
+            parallelism=payload.get("parallelism"),
+            timings=timings,
+            vad=vad,
+            speech=speech
+        )
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, pipeline="transcribe", stage=stage)
+        if cache_key:
+            cache.put(
+                cache_key,
+                payload["audio_hash"],
+                registry.resolve("whisper", payload.get("model")),
+                denoise,
+                text,
+                segments
+            )
+
+    progress(0.9, "saving")
+    storage = get_storage()
+    doc = {
+        "user_id": str(user_id),
+        "filename": payload["filename"],
+        "transcription": text,
+        "segments": segments,
+        "preview": make_preview(text),
+        "created_at": datetime.utcnow(),
+        "summary": None,
+        "key_items": None,
+        "job_id": job["id"],
+        "model": registry.resolve("whisper", payload.get("model")),
+        "audio_hash": payload.get("audio_hash"),
+        "cache_key": cache_key,
+        "denoise": denoise,
+        "vad": vad,
+        # Seconds per pipeline stage, and the voice activity report; empty when the result came from the cache
+        "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        "speech": speech
+    }
+    with STAGE_SECONDS.time(pipeline="transcribe", stage="save"):
+        transcription_id = storage.transcriptions.create(doc)
+    with STAGE_SECONDS.time(pipeline="transcribe", stage="index"):
+        index_transcription(transcription_id, doc)
+
+    storage.logs.insert_many([{
+        "action": "transcription_created",
+        "user_id": str(user_id),
+        "timestamp": datetime.utcnow(),
+        "details": {
+            "filename": payload["filename"],
+            "job_id": job["id"],
+            "cached": bool(cached),
+            # The upload request's X-Request-ID
+            "request_id": payload.get("request_id")
+        }
+    }])
+    storage.analytics.insert_many([{
+        "type": "transcription_count",
+        "value": 1,
+        "user_id": str(user_id),
+        "timestamp": datetime.utcnow()
+    }])
+
+    return {
+        "transcription_id": transcription_id,
+        "transcription": text,
+        "segments": segments,
+        "timings": doc["timings"],
+        "speech": speech
+    }
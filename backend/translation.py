@@ -0,0 +1,194 @@
+"""
+Client for a LibreTranslate / Argos Translate server.
+
+All requests go through one keep-alive requests.Session whose connection
+pool holds TRANSLATE_CONCURRENCY connections, with connect/read timeouts and
+retries with exponential backoff on connection errors, 429 and 5xx answers.
+Translations are kept in an in-process LRU cache keyed by (text hash,
+source, target), so re-translating a transcript or a repeated segment costs
+no round trip.
+
+translate_many() translates a list of texts (e.g. the segments of a
+transcription) on a shared thread pool, so at most TRANSLATE_CONCURRENCY
+requests are in flight per process however many users translate at once.
+
+TRANSLATE_URL points at the server's /translate endpoint; set it to a local
+instance (or a stand-in server in tests) to avoid the public one.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import STAGE_SECONDS
+
+TRANSLATE_URL = os.getenv("TRANSLATE_URL", "https://translate.argosopentech.com/translate")
+TRANSLATE_API_KEY = os.getenv("TRANSLATE_API_KEY", "")
+TRANSLATE_CONNECT_TIMEOUT = float(os.getenv("TRANSLATE_CONNECT_TIMEOUT", "3"))
+TRANSLATE_READ_TIMEOUT = float(os.getenv("TRANSLATE_READ_TIMEOUT", "30"))
+TRANSLATE_RETRIES = int(os.getenv("TRANSLATE_RETRIES", "3"))
+TRANSLATE_BACKOFF = float(os.getenv("TRANSLATE_BACKOFF", "0.5"))
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "8"))
+TRANSLATE_CACHE_SIZE = int(os.getenv("TRANSLATE_CACHE_SIZE", "10000"))
+
+
+class TranslationError(Exception):
+    """The translation server could not be reached or returned an error"""
+
+
+class TranslationClient:
+    """Pooled, retrying, caching client for the /translate endpoint"""
+
+    def __init__(self, url=TRANSLATE_URL, api_key=TRANSLATE_API_KEY, concurrency=TRANSLATE_CONCURRENCY,
+                 cache_size=TRANSLATE_CACHE_SIZE, retries=TRANSLATE_RETRIES, backoff=TRANSLATE_BACKOFF,
+                 timeout=(TRANSLATE_CONNECT_TIMEOUT, TRANSLATE_READ_TIMEOUT)):
+        self.url = url
+        self.api_key = api_key
+        self.concurrency = max(1, concurrency)
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # Opened by the first translation; requests is not imported at startup
+        self._session = None
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="translate")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "hits": 0, "misses": 0, "seconds": 0.0}
+
+    def session(self):
+        """The pooled, retrying requests.Session (created on first use)"""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                # Translating the same text twice is harmless, so POSTs are retried too
+                retry = Retry(
+                    total=self.retries,
+                    backoff_factor=self.backoff,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=["POST"],
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    @staticmethod
+    def _key(text, source, target):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest(), source, target
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._cache[key]
+            self._stats["misses"] += 1
+        return None
+
+    def _store(self, key, translated):
+        with self._lock:
+            self._cache[key] = translated
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _request(self, text, source, target):
+        import requests
+        payload = {"q": text, "source": source, "target": target, "format": "text"}
+        if self.api_key:
+            payload["api_key"] = self.api_key
+        started = time.perf_counter()
+        try:
+            response = self.session().post(self.url, json=payload, timeout=self.timeout)
+            if response.status_code != 200:
+                try:
+                    detail = response.json().get("error")
+                except ValueError:
+                    detail = None
+                raise TranslationError(detail or f"Translation server answered {response.status_code}")
+            return response.json()["translatedText"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise TranslationError(f"Translation failed: {e}")
+        except TranslationError:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.observe(elapsed, pipeline="translate", stage="request")
+            with self._lock:
+                self._stats["requests"] += 1
+                self._stats["seconds"] += elapsed
+
+    def translate(self, text, target, source="auto"):
+        """Translate one text; raises TranslationError"""
+        if not text.strip():
+            return text
+        key = self._key(text, source, target)
+        translated = self._cached(key)
+        if translated is None:
+            translated = self._executor.submit(self._request, text, source, target).result()
+            self._store(key, translated)
+        return translated
+
+    def translate_many(self, texts, target, source="auto"):
+        """Translate a list of texts concurrently; returns (translations, number served from cache).
+
+        Identical texts are translated once. Raises TranslationError if any text fails.
+        """
+        results = list(texts)
+        pending = {}
+        cached = 0
+        for i, text in enumerate(texts):
+            if not text.strip():
+                continue
+            key = self._key(text, source, target)
+            if key in pending:
+                pending[key][1].append(i)
+                continue
+            translated = self._cached(key)
+            if translated is None:
+                pending[key] = (text, [i])
+            else:
+                results[i] = translated
+                cached += 1
+
+        futures = {
+            key: self._executor.submit(self._request, text, source, target)
+            for key, (text, _) in pending.items()
+        }
+        try:
+            for key, future in futures.items():
+                translated = future.result()
+                self._store(key, translated)
+                for i in pending[key][1]:
+                    results[i] = translated
+        finally:
+            # A failed text makes the whole batch fail; do not leave the rest queued
+            for future in futures.values():
+                future.cancel()
+        return results, cached
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_size"] = len(self._cache)
+        requests_made = stats["requests"]
+        seconds = stats.pop("seconds")
+        stats["avg_ms"] = round(seconds / requests_made * 1000, 2) if requests_made else 0.0
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["concurrency"] = self.concurrency
+        stats["url"] = self.url
+        return stats
@@ -0,0 +1,425 @@
+"""
+Resumable uploads.
+
+A long recording is uploaded in numbered chunks that may be sent in
+parallel, retried and resumed after a network failure:
+
+  create    a session for a file of known size, cut into chunk_size chunks
+  put       chunk n, streamed straight to its offset in the session's data
+            file (preallocated, sparse), hashing it on the way
+  status    which chunks have arrived
+  complete  hash the assembled file and move it into the upload folder under
+            its SHA-256, like any other upload (see uploads.save_file)
+
+The chunks are already in place when the upload completes, so the file is
+read once, to hash it (chunks arrive in any order and on any HTTP worker, so
+no worker sees the file from start to end), and never copied unless the
+upload folder is on another filesystem.
+
+Sessions are kept in a local SQLite database shared by the HTTP workers;
+the data files live in UPLOAD_SESSIONS_DIR. While a chunk is being received
+it is leased (chunk_writes), so the same chunk cannot be written twice at
+once and an upload cannot complete under a chunk still being written.
+
+  open --complete--> assembling --queued (2xx)--> complete
+                         |
+                         +-- assembly failed --> open
+                         +-- queueing failed --> stored --complete--> assembling
+
+A session that fails to complete can be completed again: it is open again
+if the file could not be stored, and stored (the file is in the upload
+folder, only the transcription still has to be queued) if the queueing
+failed.
+
+A session expires UPLOAD_SESSION_TTL seconds after its last chunk and is
+then deleted along with its data file by every serving process's purge
+thread (start()), or by:
+  python backend/upload_sessions.py --purge
+A completed session keeps its result until it expires, so a client that
+lost the answer to complete can ask again.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from uploads import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, save_file
+
+UPLOAD_SESSIONS_DB = os.getenv("UPLOAD_SESSIONS_DB", os.path.join("uploads", "upload_sessions.sqlite3"))
+UPLOAD_SESSIONS_DIR = os.getenv("UPLOAD_SESSIONS_DIR", os.path.join("uploads", "sessions"))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+UPLOAD_SESSION_CHUNK_BYTES = int(os.getenv("UPLOAD_SESSION_CHUNK_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_SESSION_MIN_CHUNK_BYTES = 256 * 1024
+UPLOAD_SESSION_MAX_CHUNK_BYTES = 64 * 1024 * 1024
+UPLOAD_SESSIONS_PER_USER = int(os.getenv("UPLOAD_SESSIONS_PER_USER", "10"))
+# A chunk lease older than this is from a writer that died; the chunk can be sent again
+UPLOAD_SESSION_WRITE_TIMEOUT = float(os.getenv("UPLOAD_SESSION_WRITE_TIMEOUT", "900"))
+# Expired sessions are purged this often by each process (see start())
+UPLOAD_SESSION_PURGE_INTERVAL = float(os.getenv("UPLOAD_SESSION_PURGE_INTERVAL", "60"))
+
+OPEN = "open"
+ASSEMBLING = "assembling"
+STORED = "stored"
+COMPLETE = "complete"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    chunks INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+CREATE INDEX IF NOT EXISTS sessions_user_status ON sessions (user_id, status);
+CREATE TABLE IF NOT EXISTS chunks (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (session_id, idx)
+);
+CREATE TABLE IF NOT EXISTS chunk_writes (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    PRIMARY KEY (session_id, idx)
+);
+"""
+
+
+class UploadLimitReached(Exception):
+    """Raised by create when the user already has UPLOAD_SESSIONS_PER_USER open sessions"""
+
+
+class UploadIncomplete(Exception):
+    """Raised by complete while chunks are missing (see .missing)"""
+
+    def __init__(self, missing):
+        super().__init__(f"{len(missing)} chunk(s) missing")
+        self.missing = missing
+
+
+class UploadConflict(Exception):
+    """Raised for chunks and completions of a session that is no longer open"""
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def file_hash(path):
+    """SHA-256 of a file, read in UPLOAD_CHUNK_SIZE blocks"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(UPLOAD_CHUNK_SIZE)
+            if not data:
+                break
+            sha.update(data)
+    return sha.hexdigest()
+
+
+class UploadSessions:
+    """SQLite-backed resumable upload sessions shared by the HTTP workers"""
+
+    def __init__(self, path=UPLOAD_SESSIONS_DB, directory=UPLOAD_SESSIONS_DIR, ttl=UPLOAD_SESSION_TTL):
+        self.path = path
+        self.directory = directory
+        self.ttl = ttl
+        self._last_purge = 0.0
+        self._purge_pid = None
+        for folder in (os.path.dirname(path), directory):
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def data_path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.part")
+
+    def _expires_at(self):
+        return (_now() + timedelta(seconds=self.ttl)).isoformat()
+
+    def start(self):
+        """Purge expired sessions every UPLOAD_SESSION_PURGE_INTERVAL seconds in the background (once per process)"""
+        if self._purge_pid == os.getpid():
+            return
+        self._purge_pid = os.getpid()
+
+        def run(pid):
+            while os.getpid() == pid:
+                time.sleep(UPLOAD_SESSION_PURGE_INTERVAL)
+                try:
+                    self.purge_expired()
+                except Exception as e:
+                    print(f"Warning: could not purge expired upload sessions: {e}")
+
+        threading.Thread(target=run, args=(os.getpid(),), name="upload-purge", daemon=True).start()
+
+    def create(self, user_id, filename, size, chunk_size=None, options=None):
+        """Open a session for `size` bytes; returns it. Raises ValueError or UploadLimitReached"""
+        # Also purged here, for servers that never call start()
+        if time.monotonic() - self._last_purge > UPLOAD_SESSION_PURGE_INTERVAL:
+            self.purge_expired()
+        if not filename:
+            raise ValueError("filename is required")
+        if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+            raise ValueError("size must be a positive integer (bytes)")
+        if size > MAX_UPLOAD_BYTES:
+            raise ValueError(f"File too large (limit is {MAX_UPLOAD_BYTES} bytes)")
+        chunk_size = UPLOAD_SESSION_CHUNK_BYTES if chunk_size is None else chunk_size
+        if (not isinstance(chunk_size, int) or isinstance(chunk_size, bool)
+                or not UPLOAD_SESSION_MIN_CHUNK_BYTES <= chunk_size <= UPLOAD_SESSION_MAX_CHUNK_BYTES):
+            raise ValueError(f"chunk_size must be between {UPLOAD_SESSION_MIN_CHUNK_BYTES} "
+                             f"and {UPLOAD_SESSION_MAX_CHUNK_BYTES} bytes")
+
+        session_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            active = conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE user_id = ? AND status = ? AND expires_at > ?",
+                (str(user_id), OPEN, _now().isoformat())
+            ).fetchone()[0]
+            if active >= UPLOAD_SESSIONS_PER_USER:
+                conn.execute("ROLLBACK")
+                raise UploadLimitReached(f"At most {UPLOAD_SESSIONS_PER_USER} uploads in progress per user")
+            conn.execute(
+                "INSERT INTO sessions (id, user_id, filename, size, chunk_size, chunks, options, status, "
+                "created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, str(user_id), filename, size, chunk_size, -(-size // chunk_size),
+                 json.dumps(options or {}), OPEN, _now().isoformat(), self._expires_at())
+            )
+            conn.execute("COMMIT")
+        # Sparse: disk space is only used as chunks arrive
+        with open(self.data_path(session_id), "wb") as f:
+            f.truncate(size)
+        return self.get(session_id, user_id)
+
+    def get(self, session_id, user_id):
+        """The user's session with the indices of the chunks received, or None (also once expired)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM sessions WHERE id = ? AND user_id = ? AND expires_at > ?",
+                (session_id, str(user_id), _now().isoformat())
+            ).fetchone()
+            if row is None:
+                return None
+            received = [r["idx"] for r in conn.execute(
+                "SELECT idx FROM chunks WHERE session_id = ? ORDER BY idx", (session_id,)
+            )]
+        session = dict(row)
+        session["options"] = json.loads(session["options"])
+        session["result"] = json.loads(session["result"]) if session["result"] else None
+        session["received"] = received
+        return session
+
+    def put(self, session, index, stream, expected_sha256=None):
+        """Write chunk `index` from a stream to its place in the data file; returns its SHA-256.
+
+        Raises ValueError for a chunk of the wrong size or hash (the chunk then
+        counts as missing) and UploadConflict once the session is completed or
+        while the same chunk is being received by another request.
+        """
+        if session["status"] != OPEN:
+            raise UploadConflict("Upload already completed")
+        if not 0 <= index < session["chunks"]:
+            raise ValueError(f"Chunk index must be between 0 and {session['chunks'] - 1}")
+        offset = index * session["chunk_size"]
+        length = min(session["chunk_size"], session["size"] - offset)
+
+        # Lease the chunk in the same transaction that checks the session is
+        # open. A resent chunk overwrites the old bytes and only counts again
+        # once it is complete, so complete() cannot run while it is written.
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM sessions WHERE id = ?", (session["id"],)).fetchone()
+            if row is None or row["status"] != OPEN:
+                conn.execute("ROLLBACK")
+                raise UploadConflict("Upload already completed")
+            stale = (_now() - timedelta(seconds=UPLOAD_SESSION_WRITE_TIMEOUT)).isoformat()
+            if conn.execute(
+                "SELECT 1 FROM chunk_writes WHERE session_id = ? AND idx = ? AND started_at > ?",
+                (session["id"], index, stale)
+            ).fetchone():
+                conn.execute("ROLLBACK")
+                raise UploadConflict(f"Chunk {index} is already being received")
+            conn.execute("INSERT OR REPLACE INTO chunk_writes (session_id, idx, started_at) VALUES (?, ?, ?)",
+                         (session["id"], index, _now().isoformat()))
+            conn.execute("DELETE FROM chunks WHERE session_id = ? AND idx = ?", (session["id"], index))
+            conn.execute("COMMIT")
+
+        digest = None
+        try:
+            digest = self._write(session, index, offset, length, stream)
+            if expected_sha256 and expected_sha256.lower() != digest:
+                digest = None
+                raise ValueError(f"Chunk {index} does not match its SHA-256")
+        finally:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM chunk_writes WHERE session_id = ? AND idx = ?", (session["id"], index))
+                if digest:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO chunks (session_id, idx, sha256) VALUES (?, ?, ?)",
+                        (session["id"], index, digest)
+                    )
+                    conn.execute("UPDATE sessions SET expires_at = ? WHERE id = ?",
+                                 (self._expires_at(), session["id"]))
+                conn.execute("COMMIT")
+        return digest
+
+    def _write(self, session, index, offset, length, stream):
+        """Copy exactly `length` bytes from the stream to `offset` in the data file; returns their SHA-256"""
+        sha = hashlib.sha256()
+        written = 0
+        try:
+            fd = os.open(self.data_path(session["id"]), os.O_WRONLY)
+        except FileNotFoundError:
+            raise UploadConflict("Upload already completed")
+        try:
+            while True:
+                # One byte more than expected, to tell an oversized chunk
+                data = stream.read(min(UPLOAD_CHUNK_SIZE, length - written + 1))
+                if not data:
+                    break
+                if written + len(data) > length:
+                    raise ValueError(f"Chunk {index} must be {length} bytes")
+                os.pwrite(fd, data, offset + written)
+                sha.update(data)
+                written += len(data)
+        finally:
+            os.close(fd)
+        if written != length:
+            raise ValueError(f"Chunk {index} must be {length} bytes, received {written}")
+        return sha.hexdigest()
+
+    def complete(self, session, folder, expected_sha256=None):
+        """Move a fully received upload into `folder` under its SHA-256; returns (audio_hash, path).
+
+        Raises UploadIncomplete, UploadConflict, ValueError (hash mismatch) or
+        the OSError of a failed move; on any failure the session is open
+        again. Otherwise the caller records the outcome with finish().
+        """
+        self._claim(session)
+        data_path = self.data_path(session["id"])
+        try:
+            audio_hash = file_hash(data_path)
+            if expected_sha256 and expected_sha256.lower() != audio_hash:
+                raise ValueError("Upload does not match its SHA-256; resend the chunks with X-Chunk-SHA256 "
+                                 "to find the damaged ones")
+            return audio_hash, save_file(data_path, session["filename"], folder, audio_hash)
+        except Exception:
+            with self._connect() as conn:
+                conn.execute("UPDATE sessions SET status = ? WHERE id = ? AND status = ?",
+                             (OPEN, session["id"], ASSEMBLING))
+            raise
+
+    def _claim(self, session):
+        """Mark an open session whose chunks have all arrived as being assembled, in one transaction"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM sessions WHERE id = ?", (session["id"],)).fetchone()
+            if row is None or row["status"] != OPEN:
+                conn.execute("ROLLBACK")
+                raise UploadConflict("Upload is already being completed")
+            # A chunk being written has no row yet (see put), so it counts as missing
+            received = set(r["idx"] for r in conn.execute(
+                "SELECT idx FROM chunks WHERE session_id = ?", (session["id"],)
+            ))
+            if len(received) < session["chunks"]:
+                conn.execute("ROLLBACK")
+                raise UploadIncomplete([i for i in range(session["chunks"]) if i not in received])
+            conn.execute("UPDATE sessions SET status = ? WHERE id = ?", (ASSEMBLING, session["id"]))
+            conn.execute("COMMIT")
+
+    def finish(self, session_id, body, status_code):
+        """Record the (successful) response to a completed upload, returned to repeated completions until it expires"""
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET status = ?, result = ? WHERE id = ?",
+                         (COMPLETE, json.dumps({"body": body, "status_code": status_code}), session_id))
+
+    def stored(self, session_id, audio_hash, filepath):
+        """Record an upload whose file is stored but whose transcription could not be queued yet"""
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET status = ?, result = ? WHERE id = ?",
+                         (STORED, json.dumps({"audio_hash": audio_hash, "filepath": filepath}), session_id))
+
+    def resume(self, session):
+        """Claim a stored upload to queue it again; returns (audio_hash, path). Raises UploadConflict"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status, result FROM sessions WHERE id = ?", (session["id"],)).fetchone()
+            if row is None or row["status"] != STORED:
+                conn.execute("ROLLBACK")
+                raise UploadConflict("Upload is already being completed")
+            conn.execute("UPDATE sessions SET status = ? WHERE id = ?", (ASSEMBLING, session["id"]))
+            conn.execute("COMMIT")
+        result = json.loads(row["result"])
+        return result["audio_hash"], result["filepath"]
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM chunk_writes WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._remove_data(session_id)
+
+    def _remove_data(self, session_id):
+        try:
+            os.remove(self.data_path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self):
+        """Delete expired sessions and their data files; returns how many"""
+        self._last_purge = time.monotonic()
+        with self._connect() as conn:
+            expired = [r["id"] for r in conn.execute(
+                "SELECT id FROM sessions WHERE expires_at <= ?", (_now().isoformat(),)
+            )]
+        for session_id in expired:
+            self.delete(session_id)
+        return len(expired)
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM sessions GROUP BY status").fetchall()
+        counts = {row["status"]: row["n"] for row in rows}
+        try:
+            pending_bytes = sum(
+                os.stat(os.path.join(self.directory, name)).st_blocks * 512
+                for name in os.listdir(self.directory) if name.endswith(".part")
+            )
+        except OSError:
+            pending_bytes = 0
+        return {"open": counts.get(OPEN, 0), "assembling": counts.get(ASSEMBLING, 0),
+                "stored": counts.get(STORED, 0), "complete": counts.get(COMPLETE, 0),
+                "pending_bytes": pending_bytes, "ttl_seconds": self.ttl}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the MinuteMinds resumable upload sessions")
+    parser.add_argument("--purge", action="store_true", help="Delete expired sessions and their data files")
+    args = parser.parse_args()
+
+    sessions = UploadSessions()
+    if args.purge:
+        print(f"Purged {sessions.purge_expired()} expired sessions")
+    print(sessions.stats())
@@ -0,0 +1,159 @@
+"""
+Upload storage.
+
+Uploaded audio is streamed to disk in fixed-size chunks and stored under its
+SHA-256 content hash (uploads/<aa>/<hash><ext>), so re-uploads of the same
+recording share one file and uploads with the same filename never overwrite
+each other. Nothing is buffered in memory beyond one chunk:
+
+- multipart file parts are written by Werkzeug's parser straight into a
+  hashing temp file in the upload folder (UploadRequest), which is then
+  renamed into place without being read again;
+- raw request bodies (Content-Type audio/* or application/octet-stream) are
+  copied from the request stream chunk by chunk (save_stream);
+- resumable uploads are assembled in place by upload_sessions.py and then
+  renamed into place (save_file), or copied when UPLOAD_SESSIONS_DIR is on
+  another filesystem.
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+
+class HashingFile:
+    """Write-through temp file that hashes everything written to it.
+
+    The file is removed on close unless it has been claimed by save_upload.
+    """
+
+    def __init__(self, folder):
+        fd, self.path = tempfile.mkstemp(dir=folder, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self.sha = hashlib.sha256()
+        self.claimed = False
+
+    def write(self, data):
+        self.sha.update(data)
+        return self._file.write(data)
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.claimed and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UploadRequest(Request):
+    """Request class that streams multipart file parts into the upload folder"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(current_app.config["UPLOAD_FOLDER"])
+
+
+def content_path(folder, audio_hash, ext=""):
+    return os.path.join(folder, audio_hash[:2], audio_hash + ext)
+
+
+def _extension(filename):
+    return os.path.splitext(secure_filename(filename or ""))[1].lower()
+
+
+def _move_into_place(tmp_path, folder, audio_hash, ext):
+    path = content_path(folder, audio_hash, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return path
+    try:
+        os.replace(tmp_path, path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # On another filesystem (e.g. UPLOAD_SESSIONS_DIR): copy next to the
+        # target first, so the content path only ever holds a whole file
+        fd, copy_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out, open(tmp_path, "rb") as src:
+                shutil.copyfileobj(src, out, UPLOAD_CHUNK_SIZE)
+            os.replace(copy_path, path)
+        except Exception:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+            raise
+        os.remove(tmp_path)
+    return path
+
+
+def save_stream(stream, filename, folder, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy a stream to its content-addressed path in fixed-size chunks; returns (audio_hash, path)"""
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    sha = hashlib.sha256()
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise RequestEntityTooLarge()
+                sha.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    audio_hash = sha.hexdigest()
+    return audio_hash, _move_into_place(tmp_path, folder, audio_hash, _extension(filename))
+
+
+def save_file(path, filename, folder, audio_hash):
+    """Move a file already written in the upload folder to its content-addressed path; returns the path"""
+    return _move_into_place(path, folder, audio_hash, _extension(filename))
+
+
+def save_upload(file_storage, folder):
+    """Store an uploaded file at its content-addressed path; returns (audio_hash, path)"""
+    stream = file_storage.stream
+    if isinstance(stream, HashingFile) and os.path.dirname(stream.path) == os.path.normpath(folder):
+        # Already on disk and hashed by the multipart parser: just rename it
+        stream.flush()
+        stream.claimed = True
+        audio_hash = stream.sha.hexdigest()
+        return audio_hash, _move_into_place(stream.path, folder, audio_hash, _extension(file_storage.filename))
+    return save_stream(stream, file_storage.filename, folder)
@@ -0,0 +1,220 @@
+"""
+In-process cache of user records for the auth decorators.
+
+admin_required and /verify-token only need a user's role and name, so
+records are kept in a TTL + LRU cache instead of being fetched from MongoDB
+on every request. Other changes (e.g. from scripts) are picked up after
+USER_CACHE_TTL seconds.
+
+Deleting a user or changing their role invalidates the entry in every
+process: invalidate() appends "<time> <user id>" to a log shared by the
+processes using the same uploads folder (USER_CACHE_INVALIDATIONS), and
+every lookup first applies the lines other processes appended since it last
+looked (one stat() when there are none). Once the log is larger than
+USER_CACHE_INVALIDATIONS_MAX_BYTES, the process appending to it rewrites it
+without the lines older than max(USER_CACHE_TTL,
+USER_CACHE_TRUST_ROLE_SECONDS), which no cache can still need. Appends and
+rewrites are serialized by a lock file; where file locks are not available
+(Windows) the log is only appended to.
+
+With USER_CACHE_TRUST_ROLE_SECONDS > 0, the signed role claim of a token
+issued less than that many seconds ago is trusted without any lookup, unless
+the user was invalidated, by any process, after the token was issued.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TRUST_ROLE_SECONDS = float(os.getenv("USER_CACHE_TRUST_ROLE_SECONDS", "0"))
+USER_CACHE_INVALIDATIONS = os.getenv("USER_CACHE_INVALIDATIONS", os.path.join("uploads", "user_invalidations.log"))
+USER_CACHE_INVALIDATIONS_MAX_BYTES = int(os.getenv("USER_CACHE_INVALIDATIONS_MAX_BYTES", str(64 * 1024)))
+
+
+class UserCache:
+    """TTL + LRU cache of user records keyed by user id"""
+
+    def __init__(self, loader, ttl=USER_CACHE_TTL, max_size=USER_CACHE_SIZE,
+                 trust_role_seconds=USER_CACHE_TRUST_ROLE_SECONDS, invalidation_log=USER_CACHE_INVALIDATIONS):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self.trust_role_seconds = trust_role_seconds
+        self.invalidation_log = invalidation_log
+        directory = os.path.dirname(invalidation_log)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._entries = OrderedDict()
+        # user id -> when it was last invalidated, for the role claim window
+        self._invalidated = {}
+        # The log file being read (kept open so its inode is not reused) and how much of it has been applied
+        self._log = None
+        self._log_inode = None
+        self._log_pid = None
+        self._log_offset = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "claims": 0, "evictions": 0, "invalidations": 0}
+
+    def _reopen_log(self):
+        """Open the log again after it was rewritten, or in a forked process (lock held)"""
+        try:
+            log = open(self.invalidation_log, "rb")
+        except FileNotFoundError:
+            return False
+        if self._log is not None:
+            self._log.close()
+        inode = os.fstat(log.fileno()).st_ino
+        if inode != self._log_inode:
+            # A rewritten log: its lines are applied again, which only costs a few reloads
+            self._log_offset = 0
+        self._log, self._log_inode, self._log_pid = log, inode, os.getpid()
+        return True
+
+    def _sync(self):
+        """Apply the invalidations appended to the shared log since the last lookup"""
+        try:
+            st = os.stat(self.invalidation_log)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            current = st.st_ino == self._log_inode and self._log_pid == os.getpid()
+            if current and st.st_size == self._log_offset:
+                return
+            if not current and not self._reopen_log():
+                return
+            size = os.fstat(self._log.fileno()).st_size
+            if size < self._log_offset:
+                # Truncated by hand: read it again from the start
+                self._log_offset = 0
+            self._log.seek(self._log_offset)
+            data = self._log.read(size - self._log_offset)
+            # A line still being appended is applied on a later lookup
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].decode("utf-8", "replace").splitlines():
+                at, _, user_id = line.partition(" ")
+                try:
+                    self._forget(user_id, float(at))
+                except ValueError:
+                    continue
+            self._log_offset += end
+
+    def _forget(self, user_id, at):
+        """Drop a user's entry and remember when it was invalidated (lock held)"""
+        self._entries.pop(user_id, None)
+        if self.trust_role_seconds > 0 and time.time() - at <= self.trust_role_seconds:
+            # Only invalidations within the trust window matter
+            for uid, when in list(self._invalidated.items()):
+                if time.time() - when > self.trust_role_seconds:
+                    del self._invalidated[uid]
+            self._invalidated[user_id] = max(at, self._invalidated.get(user_id, 0))
+
+    def get(self, user_id):
+        """Return the user record (or None if there is no such user), loading it on a miss"""
+        self._sync()
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        # Loaded outside the lock; concurrent misses for one user may both load
+        user = self.loader(user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return user
+
+    def role(self, token_data):
+        """Role for a decoded token: the trusted claim if fresh enough, else the cached record's"""
+        user_id = str(token_data["user_id"])
+        issued_at = token_data.get("iat")
+        if self.trust_role_seconds > 0 and issued_at and "role" in token_data:
+            self._sync()
+            age = time.time() - issued_at
+            with self._lock:
+                changed_at = self._invalidated.get(user_id, 0)
+                if age <= self.trust_role_seconds and issued_at > changed_at:
+                    self._stats["claims"] += 1
+                    return token_data["role"]
+        user = self.get(user_id)
+        return user.get("role", "user") if user else None
+
+    def invalidate(self, user_id):
+        """Forget a user after it was deleted or its role changed, in this and every other process"""
+        user_id = str(user_id)
+        now = time.time()
+        with self._lock:
+            self._forget(user_id, now)
+            self._stats["invalidations"] += 1
+        try:
+            with self._log_locked():
+                # One short O_APPEND write, so lines from several processes do not interleave
+                with open(self.invalidation_log, "a", encoding="utf-8") as f:
+                    f.write(f"{now:.6f} {user_id}\n")
+                    size = f.tell()
+                if fcntl is not None and size > USER_CACHE_INVALIDATIONS_MAX_BYTES:
+                    self._compact(now)
+        except OSError as e:
+            print(f"Warning: could not share the invalidation of user {user_id}: {e}")
+
+    @contextmanager
+    def _log_locked(self):
+        """Hold the lock file that serializes appending to and rewriting the log"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.invalidation_log + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _compact(self, now):
+        """Rewrite the log without the lines no cache can still need (log lock held)"""
+        keep_after = now - max(self.ttl, self.trust_role_seconds)
+        with open(self.invalidation_log, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+        kept = []
+        for line in lines:
+            try:
+                if float(line.partition(b" ")[0]) >= keep_after:
+                    kept.append(line)
+            except ValueError:
+                continue
+        # Readers notice the new inode and read it from the start
+        temp_path = self.invalidation_log + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.writelines(kept)
+        os.replace(temp_path, self.invalidation_log)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"] + stats["claims"]
+        stats["hit_rate"] = round((stats["hits"] + stats["claims"]) / lookups, 4) if lookups else 0.0
+        stats["ttl_seconds"] = self.ttl
+        stats["max_size"] = self.max_size
+        stats["trust_role_seconds"] = self.trust_role_seconds
+        stats["invalidation_log"] = self.invalidation_log
+        return stats
@@ -0,0 +1,147 @@
+"""
+Energy-based voice activity detection.
+
+Run on the decoded 16 kHz audio before Whisper: long silences (and other
+stretches well below the speech level) are cut out, the remaining speech
+spans are joined into one shorter array for Whisper, and the segment
+timestamps it returns are mapped back onto the original recording.
+
+Frames of VAD_FRAME_SECONDS are classified from their level relative to the
+recording's noise floor (its 10th percentile frame level), with hysteresis:
+a span starts above floor + VAD_THRESHOLD_DB and lasts while the level stays
+above half that margin. Spans shorter than VAD_MIN_SPEECH_SECONDS are
+dropped, the rest are padded by VAD_PAD_SECONDS on both sides, and gaps
+shorter than VAD_MIN_SILENCE_SECONDS are kept.
+"""
+import os
+
+import numpy as np
+
+# Off unless asked for: VAD changes the transcription (and its cache key)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "false").lower() == "true"
+VAD_FRAME_SECONDS = float(os.getenv("VAD_FRAME_SECONDS", "0.02"))
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "10"))
+VAD_MIN_SPEECH_SECONDS = float(os.getenv("VAD_MIN_SPEECH_SECONDS", "0.2"))
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "1.0"))
+VAD_PAD_SECONDS = float(os.getenv("VAD_PAD_SECONDS", "0.3"))
+
+FLOOR_PERCENTILE = 10
+PEAK_PERCENTILE = 95
+# Recordings whose loud frames stay below this level (dBFS) are silent
+SILENCE_DB = -60
+
+
+def _frame_levels(audio, frame):
+    n = len(audio) // frame
+    frames = audio[:n * frame].reshape(n, frame)
+    return 10 * np.log10(np.square(frames, dtype=np.float32).mean(axis=1) + 1e-10)
+
+
+def detect_speech(audio, sr=16000, threshold_db=VAD_THRESHOLD_DB, min_speech=VAD_MIN_SPEECH_SECONDS,
+                  min_silence=VAD_MIN_SILENCE_SECONDS, pad=VAD_PAD_SECONDS, frame_seconds=VAD_FRAME_SECONDS):
+    """Speech spans as an (n, 2) array of [start, end) sample indices"""
+    frame = max(1, int(sr * frame_seconds))
+    levels = _frame_levels(audio, frame)
+    everything = np.array([[0, len(audio)]], dtype=np.int64) if len(audio) else np.empty((0, 2), dtype=np.int64)
+    if len(levels) == 0:
+        return everything
+    floor = np.percentile(levels, FLOOR_PERCENTILE)
+    peak = np.percentile(levels, PEAK_PERCENTILE)
+    if peak < SILENCE_DB:
+        return np.empty((0, 2), dtype=np.int64)
+    # No quiet stretches to speak of (e.g. continuous speech or a constant noise bed): keep everything
+    if peak - floor < threshold_db:
+        return everything
+
+    # Runs of frames above the low threshold that reach the high one somewhere
+    above = levels > floor + threshold_db / 2
+    edges = np.diff(np.concatenate([[0], above.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    loud = np.add.reduceat((levels > floor + threshold_db).astype(np.int32), starts) > 0
+    keep = loud & ((ends - starts) * frame_seconds >= min_speech)
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    # Pad, then merge spans separated by less than min_silence
+    pad_frames = int(round(pad / frame_seconds))
+    starts = np.maximum(starts - pad_frames, 0)
+    ends = np.minimum(ends + pad_frames, len(levels))
+    split = (starts[1:] - ends[:-1]) * frame_seconds >= min_silence
+    starts = starts[np.concatenate([[True], split])]
+    ends = ends[np.concatenate([split, [True]])]
+
+    spans = np.stack([starts, ends], axis=1).astype(np.int64) * frame
+    # The last frame absorbs the samples left over after the whole frames
+    if ends[-1] == len(levels):
+        spans[-1, 1] = len(audio)
+    return spans
+
+
+class SpeechMap:
+    """Speech spans of a recording and the mapping between it and the speech-only audio"""
+
+    def __init__(self, spans, total_samples, sr=16000):
+        self.spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.total_samples = total_samples
+        self.sr = sr
+        lengths = self.spans[:, 1] - self.spans[:, 0]
+        # Start of each span in the speech-only audio
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        self.speech_samples = int(lengths.sum())
+
+    @classmethod
+    def detect(cls, audio, sr=16000, **kwargs):
+        return cls(detect_speech(audio, sr, **kwargs), len(audio), sr)
+
+    def compact(self, audio):
+        """The speech spans of `audio`, concatenated"""
+        if len(self.spans) == 1 and self.speech_samples == len(audio):
+            return audio
+        return np.concatenate([audio[start:end] for start, end in self.spans]) if len(self.spans) else audio[:0]
+
+    def to_original(self, seconds, end=False):
+        """Map a time in the speech-only audio to the original recording.
+
+        A time on the border between two spans maps to the end of the first
+        one when `end` is set and to the start of the second one otherwise.
+        """
+        if not len(self.spans):
+            return seconds
+        sample = int(round(seconds * self.sr))
+        i = int(np.searchsorted(self.offsets, sample, side="left" if end else "right")) - 1
+        i = min(max(i, 0), len(self.spans) - 1)
+        start, stop = self.spans[i]
+        return float(min(start + max(sample - self.offsets[i], 0), stop)) / self.sr
+
+    def remap_segments(self, segments):
+        """Shift {start, end, text} segments from the speech-only audio onto the original timeline"""
+        remapped = []
+        for segment in segments:
+            segment = dict(segment)
+            if segment.get("start") is not None:
+                segment["start"] = round(self.to_original(segment["start"]), 3)
+            if segment.get("end") is not None:
+                segment["end"] = round(self.to_original(segment["end"], end=True), 3)
+            remapped.append(segment)
+        return remapped
+
+    def report(self, transcribe_seconds=None):
+        """Speech ratio and time saved, for the transcription document"""
+        duration = self.total_samples / self.sr
+        speech = self.speech_samples / self.sr
+        report = {
+            "duration_seconds": round(duration, 3),
+            "speech_seconds": round(speech, 3),
+            "speech_ratio": round(speech / duration, 4) if duration else 1.0,
+            "spans": len(self.spans),
+            "skipped_seconds": round(duration - speech, 3)
+        }
+        # Whisper time grows about linearly with the audio length
+        if transcribe_seconds is not None:
+            saved = transcribe_seconds * (duration - speech) / speech if speech else 0.0
+            report["time_saved_seconds"] = round(saved, 3)
+        return report
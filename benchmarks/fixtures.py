@@ -0,0 +1,124 @@
+"""
+Synthetic, seeded inputs for the benchmarks (see run.py).
+
+Everything is generated from a seed, so two runs measure the same work:
+
+  make_audio       speech-like audio (voiced syllables with pauses) over noise
+  make_transcript  meeting-style text with action items and decisions
+  make_whisper     a Whisper result dict with timed segments
+  seed_corpus      transcription documents for one user, stored and indexed
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_WORDS = (
+    "budget roadmap release customer migration pipeline latency dashboard "
+    "contract vendor hiring onboarding review quarter metrics backlog incident "
+    "database storage frontend backend mobile pricing security audit training "
+    "design feedback launch campaign forecast invoice support escalation"
+).split()
+_NAMES = ["Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace", "Heidi"]
+_TEMPLATES = [
+    "We looked at the {a} numbers and the {b} is still behind plan.",
+    "{name} will follow up with the {a} team about the {b}.",
+    "The team decided to move the {a} to next quarter.",
+    "Action item: {name} to prepare the {a} report before Friday.",
+    "{name}'ll send the {a} notes to everyone after the call.",
+    "There was some discussion about whether the {a} affects the {b}.",
+    "We agreed that the {a} needs a second review.",
+    "{name} mentioned that the {a} and the {b} are related.",
+    "Nothing new on the {a} since last week.",
+    "The {a} deadline is fixed, so the {b} has to fit around it.",
+]
+
+
+def make_audio(seconds, snr_db=10.0, seed=0, sr=SAMPLE_RATE):
+    """float32 mono audio: harmonic "syllables" in phrases separated by pauses, plus white noise at snr_db"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    speech = np.zeros(n, dtype=np.float32)
+    t = 0.5
+    while t < seconds - 1:
+        phrase_end = min(seconds - 0.5, t + rng.uniform(2, 6))
+        while t < phrase_end:
+            length = rng.uniform(0.12, 0.3)
+            start, stop = int(t * sr), min(n, int((t + length) * sr))
+            k = np.arange(stop - start) / sr
+            f0 = rng.uniform(100, 220)
+            syllable = sum(np.sin(2 * np.pi * f0 * h * k) / h for h in range(1, 6))
+            speech[start:stop] += (syllable * np.hanning(stop - start) * 0.2).astype(np.float32)
+            t += length + rng.uniform(0.02, 0.1)
+        t += rng.uniform(0.5, 3)
+    power = np.mean(np.square(speech[speech != 0])) if np.any(speech) else 1e-4
+    noise = rng.standard_normal(n).astype(np.float32) * np.float32(np.sqrt(power / 10 ** (snr_db / 10)))
+    return speech + noise
+
+
+def _sentences(count, rng):
+    for _ in range(count):
+        template = _TEMPLATES[rng.integers(len(_TEMPLATES))]
+        a, b = rng.choice(_WORDS, 2, replace=False)
+        yield template.format(a=a, b=b, name=_NAMES[rng.integers(len(_NAMES))])
+
+
+def make_transcript(words=5000, seed=0):
+    """Meeting-style text of about `words` words, in paragraphs"""
+    rng = np.random.default_rng(seed)
+    paragraphs, total = [], 0
+    while total < words:
+        paragraph = " ".join(_sentences(int(rng.integers(3, 8)), rng))
+        paragraphs.append(paragraph)
+        total += len(paragraph.split())
+    return "\n\n".join(paragraphs)
+
+
+def make_whisper(segments=1000, seed=0):
+    """A Whisper result with `segments` timed segments (and the extra keys Whisper adds)"""
+    rng = np.random.default_rng(seed)
+    result, t = [], 0.0
+    for i, sentence in enumerate(_sentences(segments, rng)):
+        length = len(sentence.split()) * 0.35
+        result.append({
+            "id": i, "seek": int(t * 100), "start": round(t, 2), "end": round(t + length, 2),
+            "text": " " + sentence, "tokens": list(range(len(sentence.split()))),
+            "temperature": 0.0, "avg_logprob": -0.2, "compression_ratio": 1.4, "no_speech_prob": 0.01
+        })
+        t += length + float(rng.uniform(0, 1))
+    return {"text": "".join(s["text"] for s in result), "segments": result, "language": "en"}
+
+
+def make_document(user_id, segments=200, seed=0, created_at=None):
+    """A transcription document as the job pipeline stores it"""
+    whisper = make_whisper(segments, seed)
+    segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in whisper["segments"]]
+    text = whisper["text"].strip()
+    return {
+        "user_id": str(user_id),
+        "filename": f"meeting-{seed:05d}.wav",
+        "transcription": text,
+        "segments": segments,
+        "preview": text[:200],
+        "created_at": created_at or datetime(2024, 1, 1) + timedelta(hours=seed),
+        "summary": None,
+        "key_items": None,
+        "model": "base",
+        "denoise": None,
+        "vad": False,
+        "timings": {},
+        "speech": {}
+    }
+
+
+def seed_corpus(storage, index, user_id, count=200, segments=200):
+    """Store and index `count` transcriptions for a user; returns their ids"""
+    ids = []
+    for seed in range(count):
+        doc = make_document(user_id, segments, seed)
+        transcription_id = storage.transcriptions.create(doc)
+        index.add(transcription_id, doc["user_id"], doc["filename"], doc["created_at"],
+                  doc["segments"], doc["transcription"])
+        ids.append(transcription_id)
+    return ids
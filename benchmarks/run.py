@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the startup, audio, NLP, search, export and auth hot paths.
+
+Usage (from the repository root):
+  python benchmarks/run.py [--quick] [--only denoise,search] [--backend sqlite|mongomock]
+                           [--models stub|real] [--output FILE]
+                           [--baseline FILE] [--threshold 0.25] [--save-baseline]
+
+The app runs in a temporary working directory (uploads/, the SQLite
+databases and the export cache are created there) against the embedded
+SQLite backend or mongomock, on seeded synthetic fixtures (see
+fixtures.py). Every case runs once to warm up, then `--repeats` times;
+calls shorter than MIN_REPEAT_SECONDS are looped so each repeat lasts about
+that long. Results (median, min, mean, p95 seconds per call) are written as
+JSON to --output.
+
+With --baseline, a case whose median is more than --threshold (a fraction)
+slower than in the baseline file fails the run with exit status 1. Timings
+only compare on the same hardware: record the baseline with --save-baseline
+on the machine (or CI runner type) that checks against it.
+
+The startup case needs no baseline: `import app; create_app()` runs in a
+fresh interpreter with MongoDB unreachable, and the run fails when its
+median exceeds STARTUP_BUDGET_SECONDS or when it loaded any of
+DEFERRED_MODULES, which the app must only import on first use.
+
+--models stub (the default) swaps the summarizer for a stand-in that keeps
+the leading sentences and spaCy for a blank English pipeline, so the runs
+need no model downloads and measure this code rather than model inference;
+--models real loads the configured models.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import fixtures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))
+MIN_REPEAT_SECONDS = 0.2
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+DEFERRED_MODULES = ("numpy", "pymongo", "requests", "docx", "spacy", "torch", "transformers", "whisper")
+# Nothing listens on the discard port, so "auto" storage falls back to SQLite
+UNREACHABLE_MONGO_URL = "mongodb://127.0.0.1:9"
+
+# Fixture sizes: (quick, full)
+AUDIO_SECONDS = ([30], [30, 300])
+AUDIO_SNR_DB = ([10], [20, 5])
+WHISPER_SEGMENTS = ([1000], [1000, 10000])
+TRANSCRIPT_WORDS = ([2000], [2000, 20000])
+CORPUS = ((100, 100), (500, 200))  # transcriptions x segments
+EXPORT_SEGMENTS = (300, 1500)
+
+
+class StubSummarizer:
+    """Stand-in for the Transformers pipeline: the leading sentences of each text"""
+    tokenizer = None
+
+    def __call__(self, texts, max_length=150, **kwargs):
+        return [{"summary_text": " ".join(text.split(". ")[:2])[:max_length * 5]} for text in texts]
+
+
+def _stub_spacy(name):
+    import spacy
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+class Runner:
+    def __init__(self, repeats, only=None):
+        self.repeats = repeats
+        self.only = only
+        self.results = {}
+
+    def selected(self, name):
+        return not self.only or any(name.startswith(prefix) for prefix in self.only)
+
+    def case(self, name, fn, setup=None, **params):
+        """Time fn() (after setup(), which is not timed) and record the result under `name`"""
+        if not self.selected(name):
+            return
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        once = time.perf_counter() - started
+        number = max(1, int(MIN_REPEAT_SECONDS / once)) if once < MIN_REPEAT_SECONDS else 1
+
+        times = []
+        for _ in range(self.repeats):
+            spent = 0.0
+            for _ in range(number):
+                if setup:
+                    setup()
+                started = time.perf_counter()
+                fn()
+                spent += time.perf_counter() - started
+            times.append(spent / number)
+        self.record(name, times, number, **params)
+
+    def record(self, name, times, number=1, **params):
+        """Record seconds-per-call measurements taken by the caller"""
+        times = sorted(times)
+        self.results[name] = {
+            "median_s": statistics.median(times),
+            "min_s": times[0],
+            "mean_s": statistics.fmean(times),
+            "p95_s": times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+            "repeats": self.repeats,
+            "number": number,
+            "params": params
+        }
+        print(f"  {name:<40} {_ms(self.results[name]['median_s']):>12}  (x{number}, {self.repeats} repeats)")
+
+    def skip(self, name, reason):
+        if self.selected(name):
+            self.results[name] = {"skipped": reason}
+            print(f"  {name:<40} {'skipped':>12}  ({reason})")
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.3f} ms"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ===========================
+# BENCHMARKS
+# ===========================
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+app.create_app()
+print(json.dumps({"seconds": time.perf_counter() - started, "loaded": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+def bench_startup(run):
+    """Cold start of the app in fresh interpreters; returns why it is over budget, if it is"""
+    name = "startup.create_app"
+    if not run.selected(name):
+        return []
+    env = dict(os.environ, STORAGE_BACKEND="auto", MONGO_URL=UNREACHABLE_MONGO_URL,
+               PYTHONPATH=os.pathsep.join(filter(None, [BACKEND, os.environ.get("PYTHONPATH")])))
+    times, loaded = [], set()
+    # The first start warms the disk cache and writes the bytecode
+    for _ in range(run.repeats + 1):
+        child = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, *DEFERRED_MODULES], env=env,
+                               capture_output=True, text=True, timeout=120)
+        if child.returncode != 0:
+            raise RuntimeError(f"create_app() failed:\n{child.stderr[-2000:]}")
+        report = json.loads(child.stdout.strip().splitlines()[-1])
+        times.append(report["seconds"])
+        loaded.update(report["loaded"])
+    run.record(name, times[1:], budget_s=STARTUP_BUDGET_SECONDS, deferred_loaded=sorted(loaded))
+
+    problems = []
+    if run.results[name]["median_s"] > STARTUP_BUDGET_SECONDS:
+        problems.append(f"{name} took {_ms(run.results[name]['median_s'])}, over the "
+                        f"{_ms(STARTUP_BUDGET_SECONDS)} budget (STARTUP_BUDGET_SECONDS)")
+    if loaded:
+        problems.append(f"{name} imported {', '.join(sorted(loaded))}, which must only be imported on first use")
+    return problems
+
+
+def bench_audio(run, quick):
+    import shutil
+
+    import soundfile as sf
+
+    from audio import BLOCK_SECONDS, load_audio
+    from denoise import METHODS, denoise_blocks
+    from vad import detect_speech
+
+    block = int(BLOCK_SECONDS * fixtures.SAMPLE_RATE)
+    for seconds in AUDIO_SECONDS[not quick]:
+        for snr in AUDIO_SNR_DB[not quick]:
+            audio = fixtures.make_audio(seconds, snr, seed=seconds)
+            blocks = [audio[i:i + block] for i in range(0, len(audio), block)]
+            for method in METHODS:
+                run.case(f"denoise.{method}.{seconds}s.snr{snr:g}",
+                         lambda: list(denoise_blocks(blocks, method)), seconds=seconds, snr_db=snr)
+            run.case(f"vad.detect.{seconds}s.snr{snr:g}", lambda: detect_speech(audio), seconds=seconds, snr_db=snr)
+
+        # Decoding from a file, as the job pipeline does it
+        path = os.path.join("uploads", f"bench-{seconds}s.wav")
+        sf.write(path, fixtures.make_audio(seconds, 10, seed=seconds), fixtures.SAMPLE_RATE)
+        decoder = "ffmpeg" if shutil.which("ffmpeg") else "soundfile"
+        run.case(f"audio.load.{seconds}s", lambda: load_audio(path), seconds=seconds, decoder=decoder)
+        run.case(f"audio.load_denoise.{seconds}s", lambda: load_audio(path, "gate"), seconds=seconds, decoder=decoder)
+
+
+def bench_nlp(run, quick, services, client, headers):
+    from key_items import extract_key_items_from_text, get_nlp
+    from transcription import extract_segments
+
+    for count in WHISPER_SEGMENTS[not quick]:
+        result = fixtures.make_whisper(count)
+        run.case(f"segments.extract.{count}", lambda: extract_segments(result), segments=count)
+
+    nlp_available = get_nlp() is not None
+    for words in TRANSCRIPT_WORDS[not quick]:
+        text = fixtures.make_transcript(words, seed=words)
+        if nlp_available:
+            run.case(f"key_items.extract.{words}w", lambda: extract_key_items_from_text(text), words=words)
+        else:
+            run.skip(f"key_items.extract.{words}w", "spaCy is not installed")
+
+        try:
+            services.model_registry.get("summarizer")
+        except Exception as e:
+            run.skip(f"summarize.chunk.{words}w", f"summarizer unavailable: {e}")
+            run.skip(f"summarize.endpoint.{words}w", f"summarizer unavailable: {e}")
+            continue
+        run.case(f"summarize.chunk.{words}w", lambda: services.summarization_engine.chunk(text), words=words)
+        doc = fixtures.make_document("bench", 10, seed=words)
+        doc["transcription"] = text
+        doc["user_id"] = headers["user_id"]
+        transcription_id = services.storage.transcriptions.create(doc)
+        run.case(f"summarize.endpoint.{words}w",
+                 lambda: _ok(client.post(f"/transcriptions/{transcription_id}/summarize", headers=headers["auth"])),
+                 words=words)
+
+
+def bench_search(run, quick, services, client, headers):
+    if not run.selected("search."):
+        return
+    count, segments = CORPUS[not quick]
+    started = time.perf_counter()
+    fixtures.seed_corpus(services.storage, services.segment_index, headers["user_id"], count, segments)
+    print(f"  (seeded {count} transcriptions x {segments} segments in {time.perf_counter() - started:.1f}s)")
+    queries = {
+        "common": "budget",
+        "two_words": "vendor escalation",
+        "phrase": '"second review"',
+        "prefix": "onboard*",
+        "no_match": "zeppelin",
+    }
+    for name, query in queries.items():
+        run.case(f"search.{name}",
+                 lambda: _ok(client.get("/transcriptions/search", query_string={"q": query}, headers=headers["auth"])),
+                 query=query, transcriptions=count, segments=segments)
+
+
+def bench_export(run, quick, services, client, headers):
+    if not run.selected("export."):
+        return
+    segments = EXPORT_SEGMENTS[not quick]
+    doc = fixtures.make_document(headers["user_id"], segments, seed=7)
+    doc["summary"] = fixtures.make_transcript(150, seed=7)
+    doc["key_items"] = [{"text": s, "assignee": None, "status": "open"}
+                        for s in fixtures.make_transcript(300, seed=8).split(". ")[:15]]
+    transcription_id = services.storage.transcriptions.create(doc)
+    url = f"/transcriptions/{transcription_id}/export"
+
+    for fmt in ("pdf", "docx"):
+        def get(fmt=fmt):
+            response = client.get(url, query_string={"format": fmt}, headers=headers["auth"])
+            _ok(response)
+            response.get_data()
+            response.close()
+
+        run.case(f"export.{fmt}.render", get, setup=lambda: services.export_engine.cache.invalidate(transcription_id),
+                 segments=segments)
+        run.case(f"export.{fmt}.cached", get, segments=segments)
+
+
+def bench_auth(run, services, client, headers):
+    from routes import token_required
+
+    protected = token_required(lambda current_user_id: current_user_id)
+
+    def check_token():
+        with client.application.test_request_context(headers=headers["auth"]):
+            protected()
+
+    run.case("auth.token_required", check_token)
+    run.case("auth.verify_token", lambda: _ok(client.post("/verify-token", json={"token": headers["token"]})))
+    rounds = services.password_hasher.rounds
+    hashed = services.password_hasher.hash("benchmark-password")
+    run.case("auth.bcrypt.hash", lambda: services.password_hasher.hash("benchmark-password"), rounds=rounds)
+    run.case("auth.bcrypt.verify", lambda: services.password_hasher.verify("benchmark-password", hashed), rounds=rounds)
+    run.case("auth.login", lambda: _ok(client.post("/login", json=headers["credentials"])), rounds=rounds)
+
+
+def _ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.path} answered "
+                           f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+# ===========================
+# HARNESS
+# ===========================
+
+def run_benchmarks(args):
+    sys.path.insert(0, BACKEND)
+    os.makedirs("uploads", exist_ok=True)
+    if args.backend == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--backend mongomock needs the mongomock package (pip install mongomock)")
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        os.environ["STORAGE_BACKEND"] = "mongo"
+    else:
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+
+    import models
+    if args.models == "stub":
+        models.registry.register("summarizer", lambda name: StubSummarizer(), "stub")
+        models.registry.register("spacy", _stub_spacy, "blank-en")
+
+    import jwt
+
+    import services
+    from app import create_app
+
+    client = create_app().test_client()
+    credentials = {"email": "bench@example.com", "password": "benchmark-password"}
+    client.post("/register", json=dict(credentials, name="Bench"))
+    token = _ok(client.post("/login", json=credentials)).get_json()["token"]
+    user_id = jwt.decode(token, client.application.config["SECRET_KEY"], algorithms=["HS256"])["user_id"]
+    headers = {"auth": {"Authorization": f"Bearer {token}"}, "token": token, "user_id": user_id,
+               "credentials": credentials}
+
+    run = Runner(args.repeats, args.only)
+    try:
+        print("startup")
+        over_budget = bench_startup(run)
+        print("audio")
+        bench_audio(run, args.quick)
+        print("nlp")
+        bench_nlp(run, args.quick, services, client, headers)
+        print("search")
+        bench_search(run, args.quick, services, client, headers)
+        print("export")
+        bench_export(run, args.quick, services, client, headers)
+        print("auth")
+        bench_auth(run, services, client, headers)
+    finally:
+        services.event_pipeline.stop()
+    return run.results, over_budget
+
+
+def compare(results, baseline, threshold):
+    """Annotate results with the change against the baseline; returns the regressed case names"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name, {})
+        if "median_s" not in result or not before.get("median_s"):
+            continue
+        change = result["median_s"] / before["median_s"] - 1
+        result["baseline_median_s"] = before["median_s"]
+        result["change"] = round(change, 4)
+        marker = ""
+        if change > threshold:
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(f"  {name:<40} {_ms(before['median_s']):>12} -> {_ms(result['median_s']):>12}  {change:+.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the MinuteMinds hot paths")
+    parser.add_argument("--quick", action="store_true", help="Smaller fixtures, for CI and quick checks")
+    parser.add_argument("--only", help="Comma-separated case name prefixes, e.g. denoise,search")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--backend", choices=("sqlite", "mongomock"), default="sqlite")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=None, help=f"Results to compare against (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown of a case's median as a fraction (default: BENCH_THRESHOLD or 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to --baseline")
+    args = parser.parse_args()
+    args.only = [p.strip() for p in args.only.split(",") if p.strip()] if args.only else None
+    baseline_path = args.baseline or DEFAULT_BASELINE
+
+    baseline = None
+    if args.baseline and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    meta = {
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": args.quick,
+        "backend": args.backend,
+        "models": args.models,
+        "repeats": args.repeats
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="minuteminds-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            results, over_budget = run_benchmarks(args)
+        finally:
+            os.chdir(cwd)
+
+    regressions = []
+    if baseline is not None:
+        differs = [key for key in ("quick", "backend", "models") if baseline.get("meta", {}).get(key) != meta[key]]
+        if differs:
+            print(f"Warning: the baseline was recorded with different settings ({', '.join(differs)})")
+        print(f"compared with {args.baseline} (threshold {args.threshold:.0%})")
+        regressions = compare(results, baseline, args.threshold)
+
+    output = {"meta": meta, "results": results, "regressions": regressions, "over_budget": over_budget}
+    for path in [args.output] + ([baseline_path] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Wrote {path}")
+
+    for problem in over_budget:
+        print(problem)
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+    if regressions or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
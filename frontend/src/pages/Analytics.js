@@ -19,7 +19,7 @@ function Analytics() {
       }
 
       try {
-        const resp = await axios.get('/admin/analytics');
+        const resp = await axios.get('/admin/analytics', { params: { granularity: 'day' } });
         setMetrics(resp.data);
       } catch (err) {
         setError('Failed to load analytics');
@@ -37,12 +37,13 @@ function Analytics() {
   // Prepare top users data
   const topUsers = (metrics.top_users || []).map((u) => ({ name: u._id, count: u.count }));
 
-  // Prepare recent metrics grouped by day
-  const recent = metrics.recent_metrics || [];
+  // Daily rollups per metric type; sum the types into events per day
   const byDay = {};
-  recent.forEach((m) => {
-    const d = new Date(m.timestamp).toISOString().split('T')[0];
-    byDay[d] = (byDay[d] || 0) + 1;
+  Object.values(metrics.series || {}).forEach((points) => {
+    points.forEach((p) => {
+      const d = p.bucket.split('T')[0];
+      byDay[d] = (byDay[d] || 0) + p.count;
+    });
   });
   const recentData = Object.keys(byDay).sort().map((k) => ({ date: k, count: byDay[k] }));
 
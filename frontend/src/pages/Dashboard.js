@@ -14,12 +14,14 @@ function Dashboard() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [transcriptions, setTranscriptions] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
   const [showHistory, setShowHistory] = useState(false);
   const [summary, setSummary] = useState('');
   const [bulletPoints, setBulletPoints] = useState([]);
   const [keyItems, setKeyItems] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState([]);
+  const [searchTotal, setSearchTotal] = useState(0);
   const [showSearch, setShowSearch] = useState(false);
   const [currentTranscriptionId, setCurrentTranscriptionId] = useState('');
   const [summarizing, setSummarizing] = useState(false);
@@ -30,6 +32,19 @@ function Dashboard() {
     setError('');
   };
 
+  // Transcription runs as a background job; poll until it finishes
+  const waitForJob = async (jobId) => {
+    for (;;) {
+      const response = await axios.get(`/jobs/${jobId}/result`, {
+        validateStatus: (status) => status === 200 || status === 202,
+      });
+      if (response.status === 200) {
+        return response.data;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  };
+
   const handleTranscribe = async () => {
     if (!file) {
       setError('Please select an audio file');
@@ -50,8 +65,11 @@ function Dashboard() {
         },
       });
 
-      setTranscription(response.data.transcription);
-      setCurrentTranscriptionId(response.data.transcription_id);
+      // Duplicate uploads are answered from the cache without a job
+      const result = response.data.job_id ? await waitForJob(response.data.job_id) : response.data;
+
+      setTranscription(result.transcription);
+      setCurrentTranscriptionId(result.transcription_id);
       setFile(null);
       setTranslatedText('');
       setSummary('');
@@ -130,10 +148,10 @@ function Dashboard() {
     setError('');
 
     try {
-      const response = await axios.post('/translate', {
-        text: transcription,
-        target: targetLanguage,
-      });
+      // Saved transcriptions are translated segment by segment on the server
+      const response = currentTranscriptionId
+        ? await axios.post(`/transcriptions/${currentTranscriptionId}/translate`, { target: targetLanguage })
+        : await axios.post('/translate', { text: transcription, target: targetLanguage });
 
       setTranslatedText(response.data.translatedText);
     } catch (err) {
@@ -174,7 +192,7 @@ function Dashboard() {
     }
   };
 
-  const handleSearch = async () => {
+  const handleSearch = async (offset = 0) => {
     if (!searchQuery.trim()) {
       setError('Please enter a search query');
       return;
@@ -184,8 +202,11 @@ function Dashboard() {
     setError('');
 
     try {
-      const response = await axios.get(`/transcriptions/search?q=${encodeURIComponent(searchQuery)}`);
-      setSearchResults(response.data.results);
+      const response = await axios.get('/transcriptions/search', {
+        params: { q: searchQuery, limit: 20, offset },
+      });
+      setSearchResults(offset ? [...searchResults, ...response.data.results] : response.data.results);
+      setSearchTotal(response.data.count);
       setShowSearch(true);
     } catch (err) {
       setError('Error searching: ' + (err.response?.data?.error || err.message));
@@ -194,16 +215,33 @@ function Dashboard() {
     }
   };
 
+  // Snippets mark matches with <mark>…</mark>; render them without injecting HTML
+  const renderSnippet = (snippet) =>
+    snippet.split(/(<mark>.*?<\/mark>)/g).map((part, idx) =>
+      part.startsWith('<mark>') ? <mark key={idx}>{part.slice(6, -7)}</mark> : part
+    );
+
   const handleFetchTranscriptions = async () => {
     try {
       const response = await axios.get('/transcriptions');
       setTranscriptions(response.data.transcriptions);
+      setHistoryCursor(response.data.next_cursor);
       setShowHistory(!showHistory);
     } catch (err) {
       setError('Error fetching transcriptions');
     }
   };
 
+  const handleLoadMoreTranscriptions = async () => {
+    try {
+      const response = await axios.get(`/transcriptions?cursor=${encodeURIComponent(historyCursor)}`);
+      setTranscriptions([...transcriptions, ...response.data.transcriptions]);
+      setHistoryCursor(response.data.next_cursor);
+    } catch (err) {
+      setError('Error fetching transcriptions');
+    }
+  };
+
   const handleLogout = () => {
     logout();
     navigate('/login');
@@ -419,10 +457,10 @@ function Dashboard() {
               placeholder="Enter keyword to search..."
               value={searchQuery}
               onChange={(e) => setSearchQuery(e.target.value)}
-              onKeyPress={(e) => e.key === 'Enter' && handleSearch()}
+              onKeyPress={(e) => e.key === 'Enter' && handleSearch(0)}
             />
             <button 
-              onClick={handleSearch}
+              onClick={() => handleSearch(0)}
               disabled={loading}
               className="secondary-btn"
             >
@@ -432,23 +470,21 @@ function Dashboard() {
 
           {showSearch && searchResults.length > 0 && (
             <div className="search-results">
-              <h3>Found {searchResults.length} result(s)</h3>
-              {searchResults.map((result) => (
-                <div key={result._id} className="search-result">
-                  <p><strong>File:</strong> {result.filename}</p>
-                  <p><strong>Date:</strong> {new Date(result.created_at).toLocaleDateString()}</p>
-                  {result.matching_segments.length > 0 && (
-                    <div className="matching-segments">
-                      <p><strong>Matching segments:</strong></p>
-                      {result.matching_segments.map((seg, idx) => (
-                        <p key={idx} className="segment">
-                          [{seg.start.toFixed(2)}s] {seg.text}
-                        </p>
-                      ))}
-                    </div>
-                  )}
+              <h3>Found {searchTotal} matching segment(s)</h3>
+              {searchResults.map((hit) => (
+                <div key={`${hit.transcription_id}-${hit.segment}`} className="search-result">
+                  <p><strong>File:</strong> {hit.filename}</p>
+                  <p><strong>Date:</strong> {new Date(hit.created_at).toLocaleDateString()}</p>
+                  <p className="segment">
+                    {hit.start != null && `[${hit.start.toFixed(2)}s] `}{renderSnippet(hit.snippet)}
+                  </p>
                 </div>
               ))}
+              {searchResults.length < searchTotal && (
+                <button onClick={() => handleSearch(searchResults.length)} disabled={loading} className="secondary-btn">
+                  Load more
+                </button>
+              )}
             </div>
           )}
         </section>
@@ -467,8 +503,14 @@ function Dashboard() {
                   <p><strong>📝 {t.filename}</strong></p>
                   <p className="date">📅 {new Date(t.created_at).toLocaleDateString()}</p>
                   {t.summary && <p className="summary-preview">✨ Summary: {t.summary.substring(0, 100)}...</p>}
+                  {!t.summary && t.preview && <p className="summary-preview">{t.preview}</p>}
                 </div>
               ))}
+              {historyCursor && (
+                <button onClick={handleLoadMoreTranscriptions} className="secondary-btn">
+                  Load more
+                </button>
+              )}
             </div>
           )}
         </section>